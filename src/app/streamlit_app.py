@@ -1,20 +1,21 @@
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
+import time, hashlib
+_t0 = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 
-from src.data.parser import parse_file
+from src.data.parser import parse_bytes
 from src.detectors.regex_detectors import (
-    load_profanity_list,
-    build_profanity_pattern,
+    default_profanity_matcher,
     detect_privacy_violations,
 )
-from src.detectors.ml_detector import load_model, predict_texts
-from src.detectors.llm_detector import classify_texts_with_llm
-from src.metrics.call_metrics import compute_silence_overtalk
+from src.detectors.ml_detector import predict_texts
+from src.detectors.registry import get_model, model_version
+
+# sklearn, matplotlib and the Gemini SDK are imported only by the branches that use them
 
 # Streamlit Config
 st.set_page_config(page_title="Compliance Tool", layout="wide")
@@ -25,8 +26,11 @@ uploaded = st.file_uploader(
     "Upload a call file (JSON or YAML)", type=["json", "yaml", "yml"]
 )
 approach = st.selectbox(
-    "Approach", ["Pattern Matching", "ML Baseline (TF-IDF)", "LLM Prompt System"]
+    "Approach", ["Pattern Matching", "ML Baseline (TF-IDF)", "LLM Prompt System", "Cascade (Pattern → ML → LLM)"]
 )
+low, high = None, None
+if approach.startswith("Cascade"):
+    low, high = st.slider("ML uncertainty band sent to the LLM", 0.0, 1.0, (0.2, 0.8), 0.05)
 entity = st.selectbox(
     "Entity",
     ["Profanity Detection", "Privacy & Compliance", "Call Metrics", "Comparative Analysis"],
@@ -34,21 +38,86 @@ entity = st.selectbox(
 
 #Load ML Model if Needed
 model = None
-if approach == "ML Baseline (TF-IDF)" or entity == "Comparative Analysis":
+if approach in ("ML Baseline (TF-IDF)", "Cascade (Pattern → ML → LLM)") or entity == "Comparative Analysis":
     try:
-        model = load_model("profanity_baseline")
+        model = get_model("profanity_baseline")
     except Exception:
         st.warning(
             "ML model not found. Run training (train_from_csv.py) to create models/profanity_baseline.pkl"
         )
 
+# Uploads and their results are memoized on the content hash, so reruns triggered by other
+# widgets (and switching back to an earlier approach/entity) skip the work entirely.
+@st.cache_data(show_spinner=False, max_entries=32)
+def parse_upload(digest, name, _data):
+    return parse_bytes(_data, name)
+
+class Uncached(Exception):
+    """Carries a result that must not be memoized (LLM items that failed and should be retried)."""
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def analyze_upload(digest, name, _data, approach, entity, band, model_key):
+    """Per-utterance results for one (upload, approach, entity); model_key invalidates ML results on retrain."""
+    df = parse_upload(digest, name, _data)
+    texts = df["text"].fillna("").tolist()
+
+    if entity == "metrics":
+        from src.metrics.call_metrics import compute_silence_overtalk
+        return compute_silence_overtalk(df)
+    if approach.startswith("Cascade"):
+        from src.detectors.cascade import cascade_classify
+        return cascade_classify(texts, model, entity=entity, low=band[0], high=band[1])
+    if approach == "LLM Prompt System":
+        from src.detectors.llm_detector import classify_texts_with_llm
+        labels = [r[0] for r in classify_texts_with_llm(texts, entity=entity)]
+        if None in labels: raise Uncached(labels)
+        return labels
+    if entity == "privacy":
+        return detect_privacy_violations(df)
+    if approach == "ML Baseline (TF-IDF)":
+        return predict_texts(texts, model)
+    matcher = default_profanity_matcher()
+    return [matcher.search(t) is not None for t in texts]
+
+@st.cache_data(show_spinner="Scoring the seed set (only changed detectors are recomputed)...", max_entries=4)
+def comparative(dataset, stamp):
+    """The evaluation harness report; pattern/ML are re-evaluated (from cached predictions) only
+    when it is stale. stamp changes with the dataset, the detector versions and the report file."""
+    from src.metrics import evaluate
+    report = evaluate.load_report()
+    if not evaluate.is_current(report, dataset):
+        report = evaluate.run(dataset, [n for n, v in evaluate.versions().items() if v])
+    return report
+
+def warn_unclassified(df):
+    n = int(df["pred"].isna().sum())
+    if n: st.warning(f"The LLM could not classify {n} utterance(s); they are not counted below and are retried on the next run.")
+
+def show_cascade(df, texts, entity):
+    with st.spinner("Running cascade (only uncertain utterances go to the LLM)..."):
+        res, stats = analyze(entity)
+
+    st.table(pd.DataFrame(stats).T.rename_axis("tier"))
+    df["pred"] = res["label"].values; df["prob"] = res["prob"].values; df["tier"] = res["tier"].values
+    flagged = df[df["pred"] == 1]
+    if flagged.empty:
+        st.success(f"No {entity} issues detected (Cascade).")
+    else:
+        st.error(f"Found {len(flagged)} {entity} utterance(s) (Cascade)")
+        st.table(flagged[["utterance_id", "stime", "etime", "speaker", "text", "prob", "tier"]])
+
 # Handle Uploaded File
 if uploaded and entity != "Comparative Analysis":
-    ext = uploaded.name.split(".")[-1]
-    tmp_path = f"tmp.{ext}"
-    with open(tmp_path, "wb") as f:
-        f.write(uploaded.getbuffer())
-    df = parse_file(tmp_path)
+    data = uploaded.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    df = parse_upload(digest, uploaded.name, data)
+    model_key = model_version("profanity_baseline") if model is not None else None
+
+    def analyze(kind):
+        try:
+            return analyze_upload(digest, uploaded.name, data, approach, kind, (low, high), model_key)
+        except Uncached as e:
+            return e.args[0]
 
     st.subheader("Call: " + str(df.call_id.iloc[0] if not df.empty else "unknown"))
 
@@ -57,9 +126,7 @@ if uploaded and entity != "Comparative Analysis":
         texts = df["text"].fillna("").tolist()
 
         if approach == "Pattern Matching":
-            prof = load_profanity_list()
-            pat = build_profanity_pattern(prof)
-            flagged = df[df["text"].fillna("").str.lower().apply(lambda t: bool(pat.search(t)))]
+            flagged = df[analyze("profanity")]
             if flagged.empty:
                 st.success("No profanity detected (Pattern Matching).")
             else:
@@ -70,7 +137,7 @@ if uploaded and entity != "Comparative Analysis":
             if model is None:
                 st.error("ML model missing.")
             else:
-                preds, probs = predict_texts(texts, model)
+                preds, probs = analyze("profanity")
                 df["pred"] = preds
                 df["prob"] = probs
                 flagged = df[df["pred"] == 1]
@@ -80,11 +147,14 @@ if uploaded and entity != "Comparative Analysis":
                     st.error(f"Found {len(flagged)} profanity utterance(s) (ML)")
                     st.table(flagged[["utterance_id", "stime", "etime", "speaker", "text", "prob"]])
 
+        elif approach.startswith("Cascade"):
+            show_cascade(df, texts, "profanity")
+
         else:  # LLM Prompt System
             with st.spinner("Profanity Detection with LLM... Please wait."):
-                results = classify_texts_with_llm(texts, entity="profanity")
+                df["pred"] = analyze("profanity")
 
-            df["pred"] = [r[0] for r in results]
+            warn_unclassified(df)
             flagged = df[df["pred"] == 1]
             if flagged.empty:
                 st.success("No profanity detected (LLM).")
@@ -97,18 +167,20 @@ if uploaded and entity != "Comparative Analysis":
         texts = df["text"].fillna("").tolist()
         if approach == "LLM Prompt System":
             with st.spinner("Privacy & Compliance issues with LLM... Please wait."):
-                results = classify_texts_with_llm(texts, entity="privacy")
-        
-            df["pred"] = [r[0] for r in results]
+                df["pred"] = analyze("privacy")
+
+            warn_unclassified(df)
             flagged = df[df["pred"] == 1]
             if flagged.empty:
                 st.success("No privacy issues detected (LLM).")
             else:
                 st.error(f"Found {len(flagged)} possible privacy issues (LLM)")
                 st.table(flagged[["utterance_id", "stime", "etime", "speaker", "text"]])
+        elif approach.startswith("Cascade"):
+            show_cascade(df, texts, "privacy")
         else:
             with st.spinner("Running Pattern Matching for privacy issues..."):
-                pv = detect_privacy_violations(df)
+                pv = analyze("privacy")
 
             if not pv:
                 st.success("No privacy issues detected (Pattern Matching).")
@@ -118,7 +190,8 @@ if uploaded and entity != "Comparative Analysis":
 
     # Call Metrics
     else:
-        metrics = compute_silence_overtalk(df)
+        import matplotlib.pyplot as plt
+        metrics = analyze("metrics")
         st.metric("Call duration (s)", f"{metrics['call_duration']:.2f}")
         st.metric("Overtalk %", f"{metrics['overtalk_pct']:.2f}%")
         st.metric("Silence %", f"{metrics['silence_pct']:.2f}%")
@@ -137,49 +210,39 @@ if uploaded and entity != "Comparative Analysis":
 # Comparative Analysis (Pattern vs ML vs LLM)
 elif entity == "Comparative Analysis":
     st.subheader("Comparative Analysis: Pattern vs ML vs LLM")
+    import matplotlib.pyplot as plt
+    from src.metrics import evaluate
     try:
-        df = pd.read_csv("dataset_seed.csv")
-        if "label" not in df.columns:
+        dataset = evaluate.default_dataset()
+        rp = evaluate.REPORT_PATH
+        stamp = repr((evaluate.dataset_fingerprint(dataset), evaluate.versions(), os.path.getmtime(rp) if rp.exists() else None))
+        try:
+            report = comparative(dataset, stamp)
+        except evaluate.LabelColumnMissing:
             st.error("dataset_seed.csv must have 'label' column.")
         else:
-            y_true = df["label"]
-
-            # Pattern predictions
-            prof = load_profanity_list()
-            pat = build_profanity_pattern(prof)
-            pattern_preds = df["text"].fillna("").apply(lambda t: int(bool(pat.search(t.lower()))))
-
-            # ML predictions
-            ml_preds = None
-            if model:
-                texts = df["text"].fillna("").tolist()
-                ml_preds, _ = predict_texts(texts, model)
-
-            # Metrics
-            results = []
-            def calc_metrics(name, preds):
-                acc = accuracy_score(y_true, preds)
-                prec = precision_score(y_true, preds, zero_division=0)
-                rec = recall_score(y_true, preds, zero_division=0)
-                f1 = f1_score(y_true, preds, zero_division=0)
-                return [name, acc, prec, rec, f1]
-
-            results.append(calc_metrics("Pattern Matching", pattern_preds))
-            if ml_preds is not None:
-                results.append(calc_metrics("ML Baseline", ml_preds))
-
-            st.dataframe(pd.DataFrame(results, columns=["Approach", "Accuracy", "Precision", "Recall", "F1"]))
+            results = pd.DataFrame(evaluate.table(report))
+            st.dataframe(results)
+            st.caption(f"{report['rows']} labelled utterances ({report['positives']} positive); "
+                       f"95% bootstrap intervals over {report['n_boot']} resamples")
 
             # Bar chart
-            f1_scores = [r[4] for r in results]
-            names = [r[0] for r in results]
-            fig, ax = plt.subplots()
-            ax.bar(names, f1_scores, color=["blue", "green"])
-            ax.set_ylabel("F1 Score")
-            ax.set_title("F1 Comparison (Profanity)")
-            st.pyplot(fig)
-
-            st.info("LLM can be evaluated manually (expensive to run on full dataset).")
+            det = evaluate.scored(report)
+            f1 = [d["metrics"]["f1"] for d in det.values()]
+            if f1:
+                fig, ax = plt.subplots()
+                ax.bar(results["Approach"], [m["value"] for m in f1], color=[("blue", "green", "orange")[i % 3] for i in range(len(f1))],
+                       yerr=[[m["value"]-m["lo"] for m in f1], [m["hi"]-m["value"] for m in f1]], capsize=6)
+                ax.set_ylabel("F1 Score")
+                ax.set_title("F1 Comparison (Profanity)")
+                st.pyplot(fig)
+            else:
+                st.warning("No detector has scored rows yet.")
+
+            if "llm" in det:
+                st.info(f"LLM scored on a stratified sample of {report['detectors']['llm']['rows']} utterances, weighted to the full label mix.")
+            else:
+                st.info("LLM not evaluated yet: python -m src.metrics.evaluate --detectors llm --llm-budget 200")
             st.success("Recommendation: Use ML or LLM for nuanced profanity detection. Pattern for privacy & metrics.")
 
     except FileNotFoundError:
@@ -187,3 +250,5 @@ elif entity == "Comparative Analysis":
 
 else:
     st.info("Upload a single-call file or choose Comparative Analysis.")
+
+st.caption(f"Rendered in {time.perf_counter()-_t0:.3f}s")
@@ -0,0 +1,111 @@
+"""Pipeline benchmarks over synthetic corpora, with scaling curves and regression checks.
+
+    python -m src.bench.run --sizes 100 1000 --wordlists 30 3000 --out bench.json
+    python -m src.bench.run --sizes 100 1000 --baseline bench.json   # exit 1 on regressions
+
+Each result is the best of `--repeat` timings; nothing touches the network and every file is
+written under a temporary directory.
+"""
+import argparse, json, os, platform, sys, tempfile, time
+import pandas as pd
+from src.bench.synth import write_corpus, make_wordlist
+from src.data.callbatch import CallBatch
+from src.data.parser import parse_file, load_folder, list_folder
+from src.detectors.regex_detectors import (build_profanity_pattern, build_profanity_matcher,
+                                           detect_privacy_violations, detect_privacy_violations_batch)
+from src.detectors.privacy_rules import RuleEngine, load_rule_pack, parse_rule_pack
+from src.metrics.call_metrics import compute_silence_overtalk, compute_call_metrics_batch
+import src.export_results as export_results
+
+def timeit(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter(); fn(); best = min(best, time.perf_counter()-t)
+    return best
+
+def _model():
+    try:
+        from src.detectors.registry import get_model
+        return get_model('profanity_baseline')
+    except Exception as e:
+        print("predict_texts skipped:", e); return None
+
+def bench_size(folder, n_calls, wordlists, repeat, model):
+    """Results for one corpus size: list of {'bench', 'calls', 'wordlist', 'items', 'seconds'}."""
+    paths = list_folder(folder)
+    df = load_folder(folder); batch = CallBatch.from_folder(folder)
+    texts = df['text'].tolist(); calls = [g for _, g in df.groupby('call_id')]
+    n = len(df); res = []
+
+    def add(name, fn, items, wordlist=None):
+        res.append({'bench': name, 'calls': n_calls, 'wordlist': wordlist, 'items': items, 'seconds': timeit(fn, repeat)})
+
+    add('parse_file', lambda: [parse_file(p) for p in paths], n)
+    add('load_folder', lambda: load_folder(folder), n)
+    add('callbatch_build', lambda: CallBatch.from_folder(folder), n)
+
+    for size in wordlists:
+        words = make_wordlist(size)
+        pat = build_profanity_pattern(words); matcher = build_profanity_matcher(words)
+        add('regex_build', lambda: build_profanity_pattern(words), size, size)
+        add('regex_match', lambda: [pat.search(t.lower()) for t in texts], n, size)
+        add('matcher_build', lambda: build_profanity_matcher(words), size, size)
+        add('matcher_match', lambda: [matcher.search(t) for t in texts], n, size)
+        # the default rule pack plus one term rule of `size` phrases: scan cost should stay flat
+        engine = RuleEngine(load_rule_pack() + parse_rule_pack([{'id': 'bench_terms', 'terms': words}], 'bench'))
+        add('rules_scan', lambda: [engine.scan(t) for t in texts], n, size)
+
+    add('privacy_per_call', lambda: [detect_privacy_violations(g) for g in calls], n)
+    add('privacy_batch', lambda: detect_privacy_violations_batch(df), n)
+    add('privacy_callbatch', lambda: detect_privacy_violations_batch(batch), n)
+    add('metrics_per_call', lambda: [compute_silence_overtalk(g) for g in calls], n)
+    add('metrics_batch', lambda: compute_call_metrics_batch(df), n)
+    add('metrics_callbatch', lambda: compute_call_metrics_batch(batch), n)
+
+    if model is not None:
+        from src.detectors.ml_detector import predict_texts
+        add('predict_texts', lambda: predict_texts(texts, model), n)
+
+    with tempfile.TemporaryDirectory() as out:
+        add('export_run', lambda: export_results.run(folder, os.path.join(out, 'r.csv'), metrics_out=os.path.join(out, 'm.csv'), quiet=True), n)
+
+    for r in res: r['items_per_sec'] = r['items']/r['seconds'] if r['seconds'] else None
+    return res
+
+def run(sizes=(100, 1000), wordlists=(30, 3000), repeat=3, seed=0, **synth):
+    model = _model(); results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_calls in sizes:
+            folder = os.path.join(tmp, f"c{n_calls}")
+            write_corpus(folder, n_calls, seed=seed, **synth)
+            results += bench_size(folder, n_calls, wordlists, repeat, model)
+            print(f"{n_calls} calls done")
+
+    meta = {'python': sys.version.split()[0], 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'sizes': list(sizes), 'wordlists': list(wordlists), 'seed': seed}
+    return {'meta': meta, 'results': results}
+
+def compare(current, baseline, tolerance=0.25):
+    """Rows present in both reports, with `regression` set where seconds grew by more than `tolerance`."""
+    key = ['bench', 'calls', 'wordlist']
+    cur = pd.DataFrame(current['results']); base = pd.DataFrame(baseline['results'])
+    m = cur.merge(base[key+['seconds']], on=key, how='inner', suffixes=('', '_baseline'))
+    m['ratio'] = m['seconds']/m['seconds_baseline']
+    m['regression'] = m['ratio'] > 1+tolerance
+    return m[key+['seconds_baseline', 'seconds', 'ratio', 'regression']]
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--sizes',type=int,nargs='+',default=[100,1000]); p.add_argument('--wordlists',type=int,nargs='+',default=[30,3000])
+    p.add_argument('--repeat',type=int,default=3); p.add_argument('--seed',type=int,default=0); p.add_argument('--out',default='bench.json')
+    p.add_argument('--baseline'); p.add_argument('--tolerance',type=float,default=0.25); args=p.parse_args()
+
+    report = run(args.sizes, args.wordlists, args.repeat, args.seed)
+    with open(args.out,'w',encoding='utf-8') as f: json.dump(report, f, indent=1)
+    print(pd.DataFrame(report['results'])[['bench','calls','wordlist','seconds','items_per_sec']].to_string(index=False))
+    print("saved",args.out)
+
+    if args.baseline:
+        with open(args.baseline,encoding='utf-8') as f: cmp = compare(report, json.load(f), args.tolerance)
+        print(cmp.to_string(index=False))
+        if cmp['regression'].any():
+            print("REGRESSIONS:", ', '.join(cmp[cmp.regression]['bench'].unique())); sys.exit(1)
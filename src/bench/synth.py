@@ -0,0 +1,74 @@
+"""Deterministic synthetic call corpus for benchmarks.
+
+    python -m src.bench.synth OUT_DIR --calls 1000
+
+Every call is written in one of the shapes parser._find_utterances accepts (bare list,
+{'utterances': [...]}, {'segments': [...]}, {'meta': ..., 'items': [...]}) with rotating
+key aliases (text/utterance/content, speaker/role, stime/start_time/start_ms, ...).
+"""
+import argparse, json, os, random
+
+FILLER = ("account payment call today thank you please help understand right number "
+          "sure time week month plan option question record update again before").split()
+PROFANITY = ['crap', 'damn', 'shit', 'idiot', 'stupid', 'bloody']
+PII = ["your balance is ${n}", "the account number is {d}", "your routing number ends {d}",
+       "the amount due is ${n} this month", "I see an outstanding balance of ${n}"]
+VERIFY = ["can you verify your date of birth", "please confirm your address", "what are the last 4 of your ssn"]
+
+SHAPES = [
+    lambda us: us,
+    lambda us: {'utterances': us},
+    lambda us: {'segments': us, 'call': {'channel': 'phone'}},
+    lambda us: {'meta': {'v': 1}, 'items': us},
+]
+# (text, speaker, start, end, scale, offset); ms timestamps are epoch-based so the parser's >1e6 rule applies
+KEYS = [('text', 'speaker', 'stime', 'etime', 1.0, 0.0), ('utterance', 'role', 'start_time', 'end_time', 1.0, 0.0),
+        ('content', 'participant', 'start_ms', 'end_ms', 1000.0, 1.7e12)]
+
+def make_call(rng, n_utts=12, words=12, overlap_rate=0.2, profanity_rate=0.02, pii_rate=0.1, verify_rate=0.05):
+    """One call as a list of {'speaker', 'text', 'stime', 'etime'} dicts."""
+    t = 0.0; out = []
+    for i in range(n_utts):
+        speaker = 'Agent' if i % 2 == 0 else 'Customer'
+        toks = [rng.choice(FILLER) for _ in range(max(1, int(rng.gauss(words, words/3))))]
+        r = rng.random()
+        if r < profanity_rate:
+            toks.insert(rng.randrange(len(toks)+1), rng.choice(PROFANITY))
+        elif speaker == 'Agent' and r < profanity_rate+pii_rate:
+            toks.append(rng.choice(PII).format(n=rng.randint(10, 9999), d=rng.randint(10**6, 10**9)))
+        elif r < profanity_rate+pii_rate+verify_rate:
+            toks.append(rng.choice(VERIFY))
+        dur = round(0.35*len(toks) + rng.random(), 2)
+        start = t - rng.uniform(0.2, 1.5) if (out and rng.random() < overlap_rate) else t + rng.uniform(0.0, 1.5)
+        start = round(max(0.0, start), 2)
+        out.append({'speaker': speaker, 'text': ' '.join(toks).capitalize() + '.', 'stime': start, 'etime': round(start+dur, 2)})
+        t = max(t, start+dur)
+    return out
+
+def _shaped(call, idx):
+    tk, sk, stk, etk, scale, off = KEYS[idx % len(KEYS)]
+    us = [{sk: u['speaker'], tk: u['text'], stk: round(off+u['stime']*scale, 3), etk: round(off+u['etime']*scale, 3)} for u in call]
+    return SHAPES[idx % len(SHAPES)](us)
+
+def write_corpus(out_dir, calls=100, seed=0, utts=12, **kwargs):
+    """Writes `calls` JSON files to out_dir and returns the number of utterances."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True); n = 0
+    for i in range(calls):
+        call = make_call(rng, n_utts=max(2, int(rng.gauss(utts, utts/4))), **kwargs)
+        with open(os.path.join(out_dir, f"call_{i:07d}.json"), 'w', encoding='utf-8') as f:
+            json.dump(_shaped(call, i), f)
+        n += len(call)
+    return n
+
+def make_wordlist(size, seed=0):
+    """The real-looking PROFANITY terms plus synthetic filler terms up to `size`."""
+    rng = random.Random(seed)
+    extra = {''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9))) for _ in range(size)}
+    return (PROFANITY + sorted(extra - set(FILLER)))[:max(size, len(PROFANITY))]
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('out'); p.add_argument('--calls',type=int,default=100); p.add_argument('--utts',type=int,default=12); p.add_argument('--seed',type=int,default=0)
+    p.add_argument('--overlap-rate',type=float,default=0.2); p.add_argument('--profanity-rate',type=float,default=0.02); p.add_argument('--pii-rate',type=float,default=0.1); args=p.parse_args()
+    n=write_corpus(args.out, args.calls, args.seed, args.utts, overlap_rate=args.overlap_rate, profanity_rate=args.profanity_rate, pii_rate=args.pii_rate)
+    print("wrote",args.calls,"calls,",n,"utterances ->",args.out)
@@ -1,36 +1,32 @@
-import os, csv
-from src.data.parser import parse_file
-INPUT='All_Conversations'; OUT='utterances_all.csv'
-def main():
-    files = sorted([f for f in os.listdir(INPUT) if f.lower().endswith('.json')])
+import argparse
+from src.data.parser import iter_files, list_folder
+from src.data.columnar import write_frames
+INPUT='All_Conversations'; OUT='utterances_all.csv'; OUT_PARQUET='utterances_all.parquet'
+
+def _frames(files):
+    written=0
+    for _,df in iter_files(files):
+        if df.empty: continue
+        written+=len(df)
+        if written//1000 != (written-len(df))//1000: print("written",written)
+        yield df
+
+def main(fmt='csv'):
+    files = list_folder(INPUT)
     if not files: 
         print("No JSON files in",INPUT); return
         
-    header=False; written=0
-    with open(OUT,'w',encoding='utf-8',newline='') as fout:
+    if fmt=='parquet':
+        written=write_frames(_frames(files), OUT_PARQUET)
+        print("done, written",written,"->",OUT_PARQUET); return
         
-        writer=None
-        for fn in files:
-            p=os.path.join(INPUT,fn)
-            
-            try:
-                df=parse_file(p)
-                
-            except Exception as e:
-                print(f"parse error {p}: {e}"); continue
-                
-            if df.empty: continue
-            
-            if not header:
-                writer=csv.DictWriter(fout, fieldnames=list(df.columns))
-                writer.writeheader(); header=True
-                
-            for _,r in df.iterrows():
-                writer.writerow({k:r[k] for k in df.columns})
-                written+=1
-                
-            if written%1000==0: print("written",written)
+    header=True; written=0
+    with open(OUT,'w',encoding='utf-8',newline='') as fout:
+        for df in _frames(files):
+            df.to_csv(fout, index=False, header=header, lineterminator='\r\n'); header=False
+            written+=len(df)
             
     print("done, written",written,"->",OUT)
 
-if __name__=='__main__': main()
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--format',choices=['csv','parquet'],default='csv'); args=p.parse_args(); main(args.format)
@@ -0,0 +1,215 @@
+"""Compact in-memory layout of many calls, shared by the detectors and metrics.
+
+    b = CallBatch.from_folder('All_Conversations')   # or from_files(paths), from_frame(df)
+    b.call(3)                                         # one call, column arrays are views
+    detect_privacy_violations_batch(b); compute_call_metrics_batch(b)
+
+Utterances are sorted by (call_id, stime) once, so every call is a contiguous row range
+offsets[c]:offsets[c+1] and nothing downstream groups or re-sorts. Per utterance only fixed
+width arrays are kept:
+
+    speaker       int32 code into `speakers` (the distinct speaker values)
+    agent         bool, 'agent' in str(speaker).lower(), worked out once per distinct speaker
+    utterance_id  int32
+    stime, etime  float64 (or time_dtype; float32 halves them but only suits call-relative times)
+    tpos, tlen    int32 span of the text inside its call's text buffer
+
+Texts are lowercased once when the batch is built: a call's texts are one lowercased str
+joined by '\\x00' (`lower[c]`), so a pattern runs with one finditer per call instead of once
+per utterance. The original casing is kept as a sparse patch (`case[c]`: positions and
+original chars where they differ, None if nothing does), so texts() gives back the exact
+originals without a second copy of every text.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional
+import numpy as np, pandas as pd
+# the parser (and the I/O stack behind it) is imported only by the constructors that read
+# files, so detectors and metrics can accept a CallBatch without depending on data loading
+
+SEP = '\x00'
+
+def _codepoints(s: str) -> np.ndarray:
+    return np.frombuffer(s.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+
+def _lower(buf: str):
+    """(lowercased buf, case patch restoring buf) with len(lowercased) == len(buf)."""
+    lo = buf.lower()
+    if lo == buf: return buf, None
+    if len(lo) != len(buf): lo = buf.replace('\u0130', 'i').lower()  # U+0130 is the one char whose lowercase is longer
+    
+    a = _codepoints(buf); pos = np.flatnonzero(a != _codepoints(lo)).astype(np.int32)
+    return lo, (pos, a[pos].tobytes().decode('utf-32-le', 'surrogatepass'))
+
+def _restore(lo: str, case, p: int = 0, q: Optional[int] = None) -> str:
+    """Original text of lo[p:q] given its call's case patch."""
+    q = len(lo) if q is None else q
+    if case is None: return lo[p:q]
+    
+    pos, chars = case
+    k0, k1 = np.searchsorted(pos, [p, q])
+    if k0 == k1: return lo[p:q]
+    
+    a = _codepoints(lo[p:q]).copy(); a[pos[k0:k1]-p] = _codepoints(chars[k0:k1])
+    return a.tobytes().decode('utf-32-le', 'surrogatepass')
+
+@lru_cache(maxsize=64)
+def _without_ignorecase(pattern):
+    """pattern minus re.I, which finds the same matches in ASCII lowercase text when the
+    pattern has no uppercase letters (re.I makes the engine case-fold every comparison)."""
+    if not pattern.flags & re.I or not isinstance(pattern.pattern, str) or pattern.pattern != pattern.pattern.lower(): return None
+    return re.compile(pattern.pattern, pattern.flags & ~re.I)
+
+class CallBatch:
+    def __init__(self, call_ids, offsets, speakers, speaker, agent, utterance_id, stime, etime, lower, case, tpos, tlen):
+        self.call_ids = call_ids; self.offsets = offsets
+        self.speakers = speakers; self.speaker = speaker; self.agent = agent
+        self.utterance_id = utterance_id; self.stime = stime; self.etime = etime
+        self.lower = lower; self.case = case; self.tpos = tpos; self.tlen = tlen
+
+    @classmethod
+    def from_rows(cls, call_id, speaker, text: List[str], stime, etime, utterance_id, time_dtype=np.float64) -> 'CallBatch':
+        """Build from per-row columns in any order; rows are stably sorted by (call_id, stime)."""
+        codes, call_ids = pd.factorize(np.asarray(call_id, dtype=object), sort=True)
+        spk, speakers = pd.factorize(np.asarray(speaker, dtype=object))
+        stime = np.asarray(stime, dtype=time_dtype); etime = np.asarray(etime, dtype=time_dtype)
+        uid = np.asarray(utterance_id, dtype=np.int32)
+
+        ordered = len(codes) < 2 or bool(np.all((codes[1:] > codes[:-1]) | ((codes[1:] == codes[:-1]) & (stime[1:] >= stime[:-1]))))
+        if not ordered:
+            order = np.lexsort((stime, codes))
+            codes, spk, stime, etime, uid = codes[order], spk[order], stime[order], etime[order], uid[order]
+            text = [text[i] for i in order]
+
+        offsets = np.zeros(len(call_ids)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(call_ids)))
+        tlen = np.fromiter(map(len, text), dtype=np.int32, count=len(text))
+
+        tpos = np.zeros(len(text), dtype=np.int32); lower = []; case = []
+        for a, b in zip(offsets[:-1], offsets[1:]):
+            # start of each text within its call buffer: lengths so far plus one separator each
+            tpos[a:b] = np.cumsum(tlen[a:b]+1) - (tlen[a:b]+1)
+            lo, patch = _lower(SEP.join(text[a:b])); lower.append(lo); case.append(patch)
+
+        agent = np.array(['agent' in str(s).lower() for s in speakers], dtype=bool)[spk] if len(speakers) else np.zeros(0, dtype=bool)
+        return cls(np.asarray(call_ids, dtype=object), offsets, np.asarray(speakers, dtype=object), spk.astype(np.int32),
+                   agent, uid, stime, etime, lower, case, tpos, tlen)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, time_dtype=np.float64) -> 'CallBatch':
+        return cls.from_rows(df['call_id'].to_numpy(dtype=object), df['speaker'].to_numpy(dtype=object), df['text'].astype(str).tolist(),
+                             df['stime'].to_numpy(dtype=float), df['etime'].to_numpy(dtype=float), df['utterance_id'].to_numpy(), time_dtype)
+
+    @classmethod
+    def from_parts(cls, parts: Iterable, time_dtype=np.float64) -> 'CallBatch':
+        """From (call_id, columns) pairs as returned by the parser's _file_columns."""
+        parts = [(c, cols) for c, cols in parts if cols]
+        if not parts: return cls.from_rows([], [], [], [], [], [], time_dtype)
+
+        cat = lambda k: [v for _, cols in parts for v in cols[k]]
+        arr = lambda k: np.concatenate([cols[k] for _, cols in parts])
+        return cls.from_rows(np.repeat(np.array([c for c, _ in parts], dtype=object), [len(cols['text']) for _, cols in parts]),
+                             cat('speaker'), cat('text'), arr('stime'), arr('etime'), arr('utterance_id'), time_dtype)
+
+    @classmethod
+    def from_files(cls, paths: Iterable[str], time_dtype=np.float64) -> 'CallBatch':
+        from src.data.parser import _file_columns, call_id_for
+        parts = []
+        for p in paths:
+            try:
+                parts.append((call_id_for(p), _file_columns(p)))
+            except Exception as e:
+                print(f"[parse error] {p}: {e}")
+        return cls.from_parts(parts, time_dtype)
+
+    @classmethod
+    def from_folder(cls, folder: str, time_dtype=np.float64) -> 'CallBatch':
+        from src.data.parser import list_folder
+        return cls.from_files(list_folder(folder), time_dtype)
+
+    def __len__(self):
+        return len(self.stime)
+
+    @property
+    def n_calls(self) -> int:
+        return len(self.call_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the arrays, text buffers and case patches."""
+        import sys
+        patches = [c for c in self.case if c is not None]
+        arrays = [self.offsets, self.speaker, self.agent, self.utterance_id, self.stime, self.etime, self.tpos, self.tlen] + [p for p, _ in patches]
+        strs = list(self.call_ids) + list(self.speakers) + self.lower + [c for _, c in patches]
+        return sum(a.nbytes for a in arrays) + sum(map(sys.getsizeof, strs))
+
+    def calls(self, lo: int, hi: Optional[int] = None) -> 'CallBatch':
+        """Calls lo..hi-1 as a batch whose columns are views into this one."""
+        hi = lo+1 if hi is None else hi
+        a, b = self.offsets[lo], self.offsets[hi]
+        return CallBatch(self.call_ids[lo:hi], self.offsets[lo:hi+1]-a, self.speakers, self.speaker[a:b], self.agent[a:b],
+                         self.utterance_id[a:b], self.stime[a:b], self.etime[a:b], self.lower[lo:hi], self.case[lo:hi], self.tpos[a:b], self.tlen[a:b])
+
+    def call(self, c: int) -> 'CallBatch':
+        return self.calls(c)
+
+    def call_codes(self) -> np.ndarray:
+        """Call index of every row."""
+        return np.repeat(np.arange(self.n_calls), np.diff(self.offsets))
+
+    def texts(self, lower: bool = False) -> List[str]:
+        out = []
+        for c, buf in enumerate(self.lower):
+            a, b = self.offsets[c], self.offsets[c+1]
+            if not lower: buf = _restore(buf, self.case[c])
+            out += [buf[p:p+n] for p, n in zip(self.tpos[a:b].tolist(), self.tlen[a:b].tolist())]
+        return out
+
+    def text_at(self, i: int, lower: bool = False) -> str:
+        c = int(np.searchsorted(self.offsets, i, 'right'))-1
+        p = int(self.tpos[i]); q = p+int(self.tlen[i])
+        return self.lower[c][p:q] if lower else _restore(self.lower[c], self.case[c], p, q)
+
+    def joined(self, lo: int, hi: int, sep: str = ' ') -> str:
+        """sep.join of the texts of rows lo..hi-1, which must belong to one call."""
+        if hi <= lo: return ''
+        c = int(np.searchsorted(self.offsets, lo, 'right'))-1
+        p = int(self.tpos[lo]); pos = self.tpos[lo:hi]-p
+        span = _restore(self.lower[c], self.case[c], p, p+int(pos[-1]+self.tlen[hi-1]))
+        return sep.join(span[a:a+n] for a, n in zip(pos.tolist(), self.tlen[lo:hi].tolist()))
+
+    def speaker_values(self) -> np.ndarray:
+        return self.speakers[self.speaker] if len(self.speakers) else np.zeros(0, dtype=object)
+
+    def roles(self) -> np.ndarray:
+        return np.where(self.agent, 'agent', 'borrower')
+
+    def hits(self, pattern) -> np.ndarray:
+        """Rows whose lowercased text pattern.search()es, with one finditer per call buffer. A
+        match running across a separator (patterns that can match '\\x00') sends the rows it
+        touches back to a per-text search, so the result equals searching each text."""
+        out = np.zeros(len(self), dtype=bool)
+        fast = _without_ignorecase(pattern)
+        for c, buf in enumerate(self.lower):
+            pat = fast if fast is not None and buf.isascii() else pattern
+            spans = [m.span() for m in pat.finditer(buf)]
+            if not spans: continue
+            
+            a, b = self.offsets[c], self.offsets[c+1]
+            pos = self.tpos[a:b]; end = pos + self.tlen[a:b]
+            m0, m1 = np.array(spans).T
+            i = np.searchsorted(pos, m0, 'right')-1
+            inside = m1 <= end[i]
+            out[a+i[inside]] = True
+            
+            for i0, e in zip(i[~inside], m1[~inside]):
+                for j in range(i0, np.searchsorted(pos, e, 'right')):
+                    out[a+j] = pat.search(buf[pos[j]:end[j]]) is not None
+        return out
+
+    def to_frame(self) -> pd.DataFrame:
+        from src.data.parser import COLUMNS
+        stime = self.stime.astype(float); etime = self.etime.astype(float)
+        return pd.DataFrame({'call_id': self.call_ids[self.call_codes()], 'utterance_id': self.utterance_id.astype(np.int64),
+                             'speaker': self.speaker_values(), 'text': self.texts(), 'stime': stime, 'etime': etime,
+                             'duration': np.maximum(0.0, etime-stime)}, columns=COLUMNS)
@@ -0,0 +1,99 @@
+"""Columnar (Parquet) storage for utterance and label tables.
+
+A dataset is a directory of hive-style partitions, one per ingest batch:
+
+    utterances_all.parquet/batch=20261018T101500-3fa2c1/part-0.parquet
+
+call_id and speaker are dictionary-encoded, times are float64 and files are zstd-compressed,
+so reading only `text` (column projection) or only some calls (call_id filter pushdown)
+touches a fraction of the bytes a CSV scan would.
+"""
+import os, time, uuid
+from typing import Iterable, Iterator, List, Optional
+import pandas as pd
+
+DICT_COLS = ['call_id','speaker']
+FLOAT_COLS = ['stime','etime','duration']
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.drop(columns=['batch'], errors='ignore')  # partition key, lives in the directory name
+    for c in DICT_COLS:
+        if c in df.columns: df[c] = df[c].astype(str).astype('category')
+    for c in FLOAT_COLS:
+        if c in df.columns: df[c] = df[c].astype('float64')
+    if 'text' in df.columns: df['text'] = df['text'].fillna('').astype(str)
+    if 'utterance_id' in df.columns: df['utterance_id'] = df['utterance_id'].astype('int32')
+    if 'label' in df.columns: df['label'] = df['label'].astype('int8')
+    return df
+
+def new_batch_id() -> str:
+    return time.strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:6]
+
+def write_dataset(df: pd.DataFrame, root: str, batch: Optional[str] = None, part: int = 0) -> str:
+    """Write one part file of an ingest batch; returns its path."""
+    import pyarrow as pa, pyarrow.parquet as pq
+
+    d = os.path.join(root, f"batch={batch or new_batch_id()}")
+    os.makedirs(d, exist_ok=True)
+    out = os.path.join(d, f"part-{part}.parquet")
+    pq.write_table(pa.Table.from_pandas(_typed(df), preserve_index=False), out, compression='zstd')
+    return out
+
+def write_frames(frames: Iterable[pd.DataFrame], root: str, batch: Optional[str] = None, rows_per_part: int = 500000) -> int:
+    """Bulk writer: buffers frames into parts of ~rows_per_part rows under one batch."""
+    batch = batch or new_batch_id()
+    buf=[]; n=0; part=0; total=0
+
+    for df in frames:
+        if df.empty: continue
+        buf.append(df); n += len(df)
+        if n >= rows_per_part:
+            write_dataset(pd.concat(buf, ignore_index=True), root, batch, part)
+            part += 1; total += n; buf=[]; n=0
+
+    if buf:
+        write_dataset(pd.concat(buf, ignore_index=True), root, batch, part); total += n
+
+    return total
+
+def _dataset(root):
+    import pyarrow.dataset as ds
+    return ds.dataset(root, format='parquet', partitioning='hive')
+
+def _filter(call_ids):
+    import pyarrow.dataset as ds
+    return None if call_ids is None else ds.field('call_id').isin(list(call_ids))
+
+def _plain(df, categorical):
+    if not categorical:
+        for c in DICT_COLS:
+            if c in df.columns and isinstance(df[c].dtype, pd.CategoricalDtype): df[c] = df[c].astype(str)
+    return df
+
+def read_dataset(root: str, columns: Optional[List[str]] = None, call_ids: Optional[Iterable[str]] = None,
+                 categorical: bool = False) -> pd.DataFrame:
+    """Only the requested columns and calls are read. call_id/speaker come back as plain
+    strings unless categorical=True."""
+    return _plain(_dataset(root).to_table(columns=columns, filter=_filter(call_ids)).to_pandas(), categorical)
+
+def iter_dataset(root: str, columns: Optional[List[str]] = None, call_ids: Optional[Iterable[str]] = None,
+                 batch_size: int = 100000) -> Iterator[pd.DataFrame]:
+    for b in _dataset(root).to_batches(columns=columns, filter=_filter(call_ids), batch_size=batch_size):
+        if b.num_rows: yield _plain(b.to_pandas(), False)
+
+def table_columns(path: str) -> List[str]:
+    """Column names of a Parquet dataset directory or a CSV file; no rows are read."""
+    if os.path.isdir(path): return _dataset(path).schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def load_table(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """A Parquet dataset directory or a CSV file, whichever `path` is."""
+    if os.path.isdir(path): return read_dataset(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+def iter_table(path: str, columns: Optional[List[str]] = None, chunksize: int = 100000) -> Iterator[pd.DataFrame]:
+    if os.path.isdir(path): return iter_dataset(path, columns=columns, batch_size=chunksize)
+    return iter(pd.read_csv(path, usecols=columns, chunksize=chunksize))
+
+def csv_to_dataset(csv: str, root: str, chunksize: int = 500000) -> int:
+    return write_frames(pd.read_csv(csv, chunksize=chunksize), root, rows_per_part=chunksize)
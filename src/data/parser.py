@@ -1,10 +1,19 @@
-import os, json, pandas as pd
-from typing import Any, Dict, List
+import os, json, time, argparse
+import numpy as np, pandas as pd
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.utils.instrument import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_UTTERANCE_KEYS = ('utterances','conversation','transcript','segments','items','results')
 
 def _find_utterances(obj: Any) -> List[Dict]:
     if isinstance(obj, list):
         return obj
-    for key in ('utterances','conversation','transcript','segments','items','results'):
+    for key in _UTTERANCE_KEYS:
         if isinstance(obj, dict) and key in obj and isinstance(obj[key], list):
             return obj[key]
         
@@ -15,66 +24,272 @@ def _find_utterances(obj: Any) -> List[Dict]:
             
     return []
 
+TEXT_KEYS = ['text','utterance','transcript','content']
+SPEAKER_KEYS = ['speaker','role','participant']
+ST_KEYS = ['stime','start_time','start','start_time_ms','time_start','begin','start_ms']
+ET_KEYS = ['etime','end_time','end','end_time_ms','time_end','finish','end_ms']
+COLUMNS = ['call_id','utterance_id','speaker','text','stime','etime','duration']
+
+def _to_float(val):
+    try:
+        if val is None: return 0.0
+        fv = float(val)
+        return fv/1000.0 if fv>1e6 else fv
+    
+    except:
+        return 0.0
+
 def _normalize_utt(u: Dict, idx: int) -> Dict:
     text = u.get('text') or u.get('utterance') or u.get('transcript') or u.get('content') or ''
     speaker = u.get('speaker') or u.get('role') or u.get('participant') or 'unknown'
-    st_keys = ['stime','start_time','start','start_time_ms','time_start','begin','start_ms']
-    et_keys = ['etime','end_time','end','end_time_ms','time_end','finish','end_ms']
-    stime = next((u[k] for k in st_keys if k in u), None)
-    etime = next((u[k] for k in et_keys if k in u), None)
+    stime = next((u[k] for k in ST_KEYS if k in u), None)
+    etime = next((u[k] for k in ET_KEYS if k in u), None)
     
     if stime is None and isinstance(u.get('time'), dict):
         stime = u['time'].get('start') or u['time'].get('stime')
         etime = etime or u['time'].get('end') or u['time'].get('etime')
         
-    def _to_float(val):
-        try:
-            if val is None: return 0.0
-            fv = float(val)
-            return fv/1000.0 if fv>1e6 else fv
-        
-        except:
-            return 0.0
-        
     stime_f = _to_float(stime)
     etime_f = _to_float(etime) if etime is not None else stime_f
     
     return {'call_id': None, 'utterance_id': idx, 'speaker': speaker, 'text': (text or '').strip(),
             'stime': stime_f, 'etime': etime_f, 'duration': max(0.0, etime_f-stime_f)}
 
+_SCHEMAS: Dict[frozenset, Optional[Tuple]] = {}
+
+def _schema_for(u: Dict) -> Optional[Tuple]:
+    """(text, speaker, stime, etime) keys for utterances with exactly u's key set, or None when
+    the mapping depends on values (several text/speaker aliases, nested 'time') and
+    _normalize_utt has to decide per utterance. Cached per key set, so a folder with a
+    uniform schema resolves it once."""
+    keys = frozenset(u)
+    if keys in _SCHEMAS: return _SCHEMAS[keys]
+    
+    found = [[k for k in aliases if k in keys] for aliases in (TEXT_KEYS, SPEAKER_KEYS, ST_KEYS, ET_KEYS)]
+    tx, sp, st, et = found
+    schema = None if len(tx)>1 or len(sp)>1 or 'time' in keys else tuple(f[0] if f else None for f in found)
+    
+    if len(_SCHEMAS) > 1024: _SCHEMAS.clear()
+    _SCHEMAS[keys] = schema
+    return schema
+
+def _floats(vals) -> np.ndarray:
+    try:
+        a = np.fromiter(map(float, vals), dtype=float, count=len(vals))
+    except (TypeError, ValueError):
+        return np.array([_to_float(v) for v in vals], dtype=float)
+    return np.where(a>1e6, a/1000.0, a)
 
-def parse_file(path: str) -> pd.DataFrame:
-    with open(path,'r',encoding='utf-8') as f:
-        data = json.load(f)
+def _columns(utterances: Iterable[Dict]) -> Optional[Dict[str, Any]]:
+    """Column-wise equivalent of _normalize_utt over all utterances (None if there are none)."""
+    text=[]; speaker=[]; st=[]; et=[]
+    done = []  # rows _normalize_utt handled: their times are already in seconds
+    last = None; schema = None
+    
+    for u in utterances:
+        if last is None or u.keys() != last:
+            last = u.keys(); schema = _schema_for(u)
+            
+        if schema is None:
+            n = _normalize_utt(u, 0); done.append(len(text))
+            text.append(n['text']); speaker.append(n['speaker']); st.append(n['stime']); et.append(n['etime'])
+        else:
+            tk, sk, sek, eek = schema
+            text.append(u[tk] if tk else None); speaker.append(u[sk] if sk else None)
+            st.append(u[sek] if sek else None); et.append(u[eek] if eek else None)
+            
+    if not text: return None
+    
+    stime = _floats(st)
+    no_end = np.fromiter((v is None for v in et), dtype=bool, count=len(et))
+    etime = np.where(no_end, stime, _floats([0.0 if v is None else v for v in et]))
+    if done:
+        stime[done] = [st[i] for i in done]; etime[done] = [et[i] for i in done]
+    
+    return {'utterance_id': np.arange(len(text)), 'speaker': [s or 'unknown' for s in speaker],
+            'text': [(t or '').strip() for t in text], 'stime': stime, 'etime': etime,
+            'duration': np.maximum(0.0, etime-stime)}
+
+# utterances whose key sets exercise every branch of _columns / _normalize_utt
+PARITY_CASES = [
+    {'text': 'plain', 'speaker': 'Agent', 'stime': 1.5, 'etime': 2.0},
+    {'text': 'epoch ms', 'speaker': 'Agent', 'stime': 1700000000000, 'etime': 1700000001000},
+    {'text': '', 'utterance': 'several text aliases', 'stime': 5e9},
+    {'text': 'nested time', 'time': {'start': 1700000000000, 'end': 1700000002000}},
+    {'utterance': 'nested stime only', 'time': {'stime': 2.5}},
+    {'text': None, 'content': 'text and speaker aliases', 'role': 'Customer', 'speaker': '', 'start_ms': 3000.0},
+    {'text': 'no times', 'participant': 'agent_2'},
+    {'transcript': '  strings  ', 'start': '12.5', 'end': 'n/a'},
+]
+
+def check_parity(utterances: Optional[List[Dict]] = None) -> List[Tuple[int, str, Any, Any]]:
+    """(row, column, _columns value, _normalize_utt value) wherever the column-wise parser
+    disagrees with the row-wise one; empty when they agree. Defaults to PARITY_CASES."""
+    utterances = PARITY_CASES if utterances is None else utterances
+    cols = _columns(utterances) or {}; out = []
+    for i, u in enumerate(utterances):
+        ref = _normalize_utt(u, i)
+        for k in COLUMNS[1:]:
+            a, b = cols[k][i], ref[k]
+            if a != b and not (a != a and b != b): out.append((i, k, a, b))  # NaN == NaN here
+    return out
+
+def _sorted(cols: Dict[str, Any]) -> Dict[str, Any]:
+    # same ordering as DataFrame.sort_values('stime')
+    order = np.argsort(cols['stime'], kind='quicksort')
+    return {k: (v[order] if isinstance(v, np.ndarray) else [v[i] for i in order]) for k, v in cols.items()}
+
+def _load(path: str) -> Any:
+    with open(path,'rb') as f:
+        return _decode(f.read(), os.path.splitext(path)[1].lower())
+
+def _decode(raw: bytes, ext: str) -> Any:
+    if ext in ('.yaml', '.yml'):
+        import yaml
+        return yaml.load(raw, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        
+    if orjson is not None:
+        try: return orjson.loads(raw)
+        except orjson.JSONDecodeError: pass  # NaN/Infinity literals, huge ints: let json decide
+        
+    return json.loads(raw.decode('utf-8'))
+
+def _array_items(events, ijson) -> Iterator[Any]:
+    """Items of the array whose start_array was just consumed from the ijson event stream."""
+    depth = 0; builder = None
+    for _, event, value in events:
+        if depth == 0:
+            if event == 'end_array': return
+            if event not in ('start_map', 'start_array'):
+                yield value; continue
+            builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'): depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0: yield builder.value
+
+def _iter_utterances(path: str, ijson) -> Iterator[Dict]:
+    other = {}  # top-level lists under other keys, kept in case no known key turns up
+    with open(path,'rb') as f:
+        events = ijson.parse(f, use_float=True)
+        for prefix, event, _ in events:
+            if event != 'start_array' or '.' in prefix: continue
+            if prefix == '' or prefix in _UTTERANCE_KEYS:
+                yield from _array_items(events, ijson); return
+            other[prefix] = list(_array_items(events, ijson))
+            
+    for v in other.values():
+        if all(isinstance(it, dict) for it in v):
+            yield from v; return
+            
+    data = _load(path)  # no utterance list: the document itself is the one utterance
+    if isinstance(data, dict): yield data
+
+def _stream_utterances(path: str) -> Optional[Iterator[Dict]]:
+    """Utterances of a JSON file read incrementally with ijson in one pass, never
+    materialising the whole document (None if ijson is missing). Picks the list
+    _find_utterances would, except that of several top-level lists under known keys the
+    first one in the file is used rather than the highest-priority key."""
+    try:
+        import ijson
+    except ImportError:
+        return None
+    return _iter_utterances(path, ijson)
+
+def call_id_for(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+def _object_columns(data: Any) -> Optional[Dict[str, Any]]:
     utterances = _find_utterances(data)
-    rows = []
-    call_id = os.path.splitext(os.path.basename(path))[0]
     
     if not utterances and isinstance(data, dict):
         utterances = [data]
         
-    for i,u in enumerate(utterances):
-        norm = _normalize_utt(u, i)
-        norm['call_id'] = call_id
-        rows.append(norm)
-        
-    df = pd.DataFrame(rows, columns=['call_id','utterance_id','speaker','text','stime','etime','duration'])
+    cols = _columns(utterances)
+    return _sorted(cols) if cols else None
+
+def _file_columns(path: str, stream: bool = False) -> Optional[Dict[str, Any]]:
+    utterances = _stream_utterances(path) if stream and path.lower().endswith('.json') else None
+    
+    if utterances is None: return _object_columns(_load(path))
+    
+    cols = _columns(utterances)
+    return _sorted(cols) if cols else None
+
+@timed('parse.file', items=lambda a, out: len(out))
+def parse_file(path: str, stream: bool = False) -> pd.DataFrame:
+    """stream=True reads very large JSON transcripts incrementally (needs ijson)."""
+    cols = _file_columns(path, stream)
     
-    if df.empty: return df
+    if cols is None: return pd.DataFrame(columns=COLUMNS)
     
-    return df.sort_values('stime').reset_index(drop=True)
+    return pd.DataFrame({'call_id': call_id_for(path), **cols}, columns=COLUMNS)
 
+def parse_object(data: Any, call_id: str) -> pd.DataFrame:
+    """parse_file for an already-decoded transcript (a list of utterances or any container
+    _find_utterances understands)."""
+    cols = _object_columns(data)
+    
+    if cols is None: return pd.DataFrame(columns=COLUMNS)
+    
+    return pd.DataFrame({'call_id': call_id, **cols}, columns=COLUMNS)
+
+@timed('parse.bytes', items=lambda a, out: len(out))
+def parse_bytes(data: bytes, name: str) -> pd.DataFrame:
+    """parse_file for content already in memory (e.g. an upload); `name` supplies the
+    extension and the call_id."""
+    return parse_object(_decode(bytes(data), os.path.splitext(name)[1].lower()), call_id_for(name))
+
+def list_folder(folder: str) -> List[str]:
+    return [os.path.join(folder,fn) for fn in sorted(os.listdir(folder)) if fn.lower().endswith('.json')]
+
+def iter_files(paths: Iterable[str]) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Parse one file at a time; only the current call is held in memory."""
+    for p in paths:
+        try:
+            d = parse_file(p)
+        except Exception as e:
+            print(f"[parse error] {p}: {e}"); continue
+        yield p, d
+
+@timed('parse.folder', items=lambda a, out: len(out))
 def load_folder(folder: str) -> pd.DataFrame:
-    dfs = []
-    for fn in sorted(os.listdir(folder)):
-        if fn.lower().endswith('.json'):
-            p = os.path.join(folder,fn)
-            try:
-                d = parse_file(p)
-                if not d.empty: dfs.append(d)
-            except Exception as e:
-                print(f"[parse error] {p}: {e}")
+    """Same frame as concatenating parse_file over the folder, but columns of all files are
+    gathered first and the DataFrame is built once."""
+    parts = []
+    for p in list_folder(folder):
+        try:
+            cols = _file_columns(p)
+        except Exception as e:
+            print(f"[parse error] {p}: {e}"); continue
+        if cols: parts.append((call_id_for(p), cols))
                 
-    if not dfs: return pd.DataFrame(columns=['call_id','utterance_id','speaker','text','stime','etime','duration'])
+    if not parts: return pd.DataFrame(columns=COLUMNS)
     
-    return pd.concat(dfs, ignore_index=True)
+    out = {'call_id': [c for c, cols in parts for _ in cols['text']]}
+    for k in COLUMNS[1:]:
+        vals = [cols[k] for _, cols in parts]
+        out[k] = np.concatenate(vals) if isinstance(vals[0], np.ndarray) else [v for part in vals for v in part]
+        
+    return pd.DataFrame(out, columns=COLUMNS)
+
+def throughput(folder: str, stream: bool = False) -> Dict[str, float]:
+    files = list_folder(folder); n = 0
+    t = time.perf_counter()
+    for p in files:
+        try: n += len(parse_file(p, stream=stream))
+        except Exception as e: print(f"[parse error] {p}: {e}")
+    dt = max(1e-9, time.perf_counter()-t)
+    return {'files': len(files), 'utterances': n, 'seconds': dt, 'files_per_sec': len(files)/dt, 'utterances_per_sec': n/dt}
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('folder'); p.add_argument('--stream',action='store_true')
+    p.add_argument('--check',action='store_true',help='compare the column-wise parser with _normalize_utt first'); args=p.parse_args()
+    if args.check:
+        bad = check_parity() + [d for f in list_folder(args.folder) for d in check_parity(_find_utterances(_load(f)))]
+        for d in bad[:20]: print("[parity]", *d)
+        print(f"parity: {len(bad)} differences")
+        if bad: raise SystemExit(1)
+    r=throughput(args.folder, args.stream)
+    print(f"{r['files']} files, {r['utterances']} utterances in {r['seconds']:.2f}s: {r['files_per_sec']:.1f} files/s, {r['utterances_per_sec']:.0f} utterances/s")
@@ -0,0 +1,118 @@
+"""Tiered detector: pattern -> ML -> LLM, where only uncertain utterances reach the LLM.
+
+Profanity: a profanity-matcher hit is flagged outright; everything else is scored by the ML
+model and decided locally when its probability is below `low` (clean) or at least `high`
+(flagged). Only the band in between is sent to the LLM.
+Privacy: the ML model is profanity-only, so the privacy rule pack acts as the screen.
+Utterances with no sensitive, PII (card, SSN, email, phone) or verification hit are clean.
+Sensitive/PII hits are flagged and go to the LLM for confirmation; verification-only hits
+("can you verify your date of birth") are asked about but not pre-flagged.
+Whenever the LLM fails on an item, the local verdict stands: flagged for a sensitive/PII hit,
+clean for a verification-only one, prob >= 0.5 for the profanity band.
+
+    python -m src.detectors.cascade --csv hand_labelled.csv --max-llm 0.05
+tunes (low, high) against independently labelled utterances. Not dataset_seed.csv: its
+labels are the profanity matcher's own output, so any band would look perfect.
+"""
+import argparse, time
+import numpy as np, pandas as pd
+from src.detectors.privacy_rules import PII, SENSITIVE, VERIFICATION, default_privacy_rules
+from src.detectors.regex_detectors import default_profanity_matcher
+from src.detectors.ml_detector import predict_texts
+
+TIERS = ['pattern', 'ml', 'llm']
+
+def cascade_classify(texts, model=None, entity='profanity', low=0.2, high=0.8, matcher=None, llm=None, rules=None, **llm_kwargs):
+    """
+    Returns (DataFrame[label, prob, tier], stats) where stats is
+    {tier: {'count': n decided there, 'seconds': wall time of the tier}}.
+    llm defaults to classify_texts_with_llm; extra kwargs are passed to it. rules is the
+    privacy RuleEngine (default: data/privacy_rules.yaml).
+    """
+    texts = ['' if t is None else str(t) for t in texts]
+    n = len(texts)
+    label = np.zeros(n, dtype=int); prob = np.full(n, np.nan); tier = np.array(['pattern']*n, dtype=object)
+    undecided = np.ones(n, dtype=bool); uncertain = np.zeros(n, dtype=bool)
+    stats = {t: {'count': 0, 'seconds': 0.0} for t in TIERS}
+
+    t0 = time.perf_counter()
+    if entity == 'privacy':
+        rules = (rules or default_privacy_rules()).only((SENSITIVE, VERIFICATION, *PII))
+        cats = [rules.categories(t) for t in texts]
+        flag = np.array([bool(c - {VERIFICATION}) for c in cats], dtype=bool)
+        label[flag] = 1; undecided[:] = False  # stands if the LLM fails; verification-only stays 0
+        uncertain = np.array([bool(c) for c in cats], dtype=bool)
+    else:
+        matcher = matcher or default_profanity_matcher()
+        hit = np.array([matcher.search(t) is not None for t in texts], dtype=bool)
+        label[hit] = 1; undecided &= ~hit
+    stats['pattern']['seconds'] = time.perf_counter()-t0
+
+    if entity != 'privacy' and undecided.any():
+        t0 = time.perf_counter()
+        idx = np.flatnonzero(undecided)
+        if model is None:
+            uncertain[idx] = True
+        else:
+            _, p = predict_texts([texts[i] for i in idx], model)
+            prob[idx] = p
+            band = (p >= low) & (p < high)
+            label[idx[(p >= high) | (band & (p >= 0.5))]] = 1  # the band's label stands if the LLM fails
+            uncertain[idx[band]] = True
+            tier[idx] = 'ml'
+        stats['ml']['seconds'] = time.perf_counter()-t0
+
+    if uncertain.any():
+        if llm is None: from src.detectors.llm_detector import classify_texts_with_llm as llm
+        t0 = time.perf_counter()
+        idx = np.flatnonzero(uncertain)
+        res = llm([texts[i] for i in idx], entity=entity, **llm_kwargs)
+        # an item the LLM could not classify keeps the local verdict
+        for i, (l, _) in zip(idx, res):
+            if l is not None: label[i] = l; tier[i] = 'llm'
+        stats['llm']['seconds'] = time.perf_counter()-t0
+
+    for t in TIERS: stats[t]['count'] = int((tier == t).sum())
+    return pd.DataFrame({'label': label, 'prob': prob, 'tier': tier}), stats
+
+def _f1(y, pred):
+    tp = int(((pred==1)&(y==1)).sum()); fp = int(((pred==1)&(y==0)).sum()); fn = int(((pred==0)&(y==1)).sum())
+    return 2*tp/(2*tp+fp+fn) if tp else 0.0
+
+def tune_thresholds(texts, y, model, max_llm=0.05, grid=None, matcher=None):
+    """
+    Grid-search (low, high) on labelled data, treating the LLM as an oracle on the band it
+    receives (an upper bound on cascade F1). Returns one row per band sorted by F1, keeping
+    only bands that send at most `max_llm` of the utterances to the LLM.
+
+    y must be labelled independently of the pattern tier (by hand or by a trusted LLM run).
+    Labels seeded by the matcher itself, like dataset_seed.csv, have no positives outside its
+    hits, so every band looks equally good; they are rejected with ValueError.
+    """
+    texts = ['' if t is None else str(t) for t in texts]; y = np.asarray(y, dtype=int)
+    matcher = matcher or default_profanity_matcher()
+    hit = np.array([matcher.search(t) is not None for t in texts], dtype=bool)
+    if not y[~hit].any():
+        raise ValueError("no positive label outside the pattern matcher's hits (matcher-seeded labels?); tune on independently labelled data")
+    _, p = predict_texts(texts, model)
+    grid = grid if grid is not None else np.round(np.linspace(0.0, 1.0, 21), 2)
+
+    rows = []
+    for low in grid:
+        for high in grid:
+            if high < low: continue
+            band = ~hit & (p >= low) & (p < high)
+            pred = (hit | (p >= high)).astype(int)
+            pred[band] = y[band]
+            rows.append({'low': low, 'high': high, 'llm_frac': band.mean(), 'f1': _f1(y, pred)})
+
+    out = pd.DataFrame(rows)
+    return out[out.llm_frac <= max_llm].sort_values(['f1', 'llm_frac'], ascending=[False, True]).reset_index(drop=True)
+
+if __name__=='__main__':
+    from src.detectors.registry import get_model
+    p=argparse.ArgumentParser(); p.add_argument('--csv',required=True,help='independently labelled utterances (text,label), not the matcher-seeded dataset_seed.csv'); p.add_argument('--max-llm',type=float,default=0.05); args=p.parse_args()
+    df=pd.read_csv(args.csv); model=get_model('profanity_baseline')
+    _, p0 = predict_texts(df['text'].fillna('').tolist(), model)
+    print("ML alone F1:", _f1(df['label'].to_numpy(), (p0 >= 0.5).astype(int)))
+    print(tune_thresholds(df['text'].fillna('').tolist(), df['label'], model, args.max_llm).head(10).to_string(index=False))
@@ -0,0 +1,135 @@
+"""Compiled form of a TF-IDF + logistic-regression pipeline for low-latency scoring.
+
+    python -m src.detectors.linear_scorer --model profanity_baseline --prune 1e-4 --float32
+writes models/profanity_baseline_linear.npz, which get_model('profanity_baseline_linear')
+loads as a LinearScorer (a drop-in for the pipeline in predict_texts).
+
+For an l2-normalised TF-IDF vector x of a text with n-gram counts c_t,
+
+    decision = w.x + b = sum_t tf(c_t)*idf_t*w_t / sqrt(sum_t (tf(c_t)*idf_t)^2) + b
+
+so per n-gram only idf_t*w_t and idf_t are needed, and one tokenize-and-sum pass over the
+text gives the probability without sparse matrices or the Pipeline machinery. --prune drops
+n-grams whose |idf_t*w_t| is below the threshold; they then no longer count towards the
+norm either, which export reports as the largest probability change on the check texts.
+"""
+import argparse, json, math, re, time
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from src.detectors.ml_detector import MODEL_DIR, load_model
+
+FORMAT = 1
+
+def _parts(model):
+    steps = getattr(model, 'steps', None)
+    if not steps or len(steps) != 2: raise ValueError("expected a Pipeline of TfidfVectorizer + linear classifier")
+    vec, clf = steps[0][1], steps[1][1]
+
+    if type(vec).__name__ != 'TfidfVectorizer' or not hasattr(vec, 'vocabulary_'):
+        raise ValueError(f"only a fitted TfidfVectorizer can be compiled, not {type(vec).__name__}")
+    if vec.analyzer != 'word' or vec.tokenizer or vec.preprocessor or vec.stop_words or vec.strip_accents or vec.norm not in ('l2', None):
+        raise ValueError("unsupported TfidfVectorizer options (analyzer/tokenizer/preprocessor/stop_words/strip_accents/norm)")
+    if getattr(clf, 'coef_', None) is None or clf.coef_.shape[0] != 1:
+        raise ValueError("expected a fitted binary linear classifier")
+    return vec, clf
+
+def compile_pipeline(model, prune=0.0, dtype=np.float64):
+    """(meta, terms, weight, idf) for a fitted pipeline; weight = idf*coef per n-gram."""
+    vec, clf = _parts(model)
+    terms = sorted(vec.vocabulary_, key=vec.vocabulary_.get)
+    idf = vec.idf_ if vec.use_idf else np.ones(len(terms))
+    weight = idf * clf.coef_[0]
+
+    keep = np.abs(weight) >= prune if prune else np.ones(len(terms), dtype=bool)
+    meta = {'format': FORMAT, 'token_pattern': vec.token_pattern, 'lowercase': vec.lowercase, 'ngram_range': list(vec.ngram_range),
+            'binary': vec.binary, 'sublinear_tf': vec.sublinear_tf, 'norm': vec.norm, 'intercept': float(clf.intercept_[0]),
+            'classes': [int(c) for c in clf.classes_], 'prune': prune, 'n_terms': int(keep.sum()), 'n_source_terms': len(terms)}
+    return meta, [t for t, k in zip(terms, keep) if k], weight[keep].astype(dtype), idf[keep].astype(dtype)
+
+def export(model_name='profanity_baseline', out=None, prune=0.0, float32=False):
+    model = load_model(model_name)
+    meta, terms, weight, idf = compile_pipeline(model, prune, np.float32 if float32 else np.float64)
+    meta['source'] = f"{model_name}.pkl"
+
+    out = Path(out) if out else MODEL_DIR / f"{model_name}_linear.npz"
+    blob = np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8)
+    with out.open('wb') as f:
+        np.savez(f, meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8), terms=blob, weight=weight, idf=idf)
+    return out, model
+
+class LinearScorer:
+    """Scores texts like the source pipeline's predict/predict_proba, one text at a time."""
+
+    def __init__(self, meta, terms, weight, idf):
+        self.meta = meta
+        self.classes_ = np.array(meta['classes'])
+        self.intercept = meta['intercept']
+        self.lo, self.hi = meta['ngram_range']
+        self._tokens = re.compile(meta['token_pattern']).findall
+        self._lower = meta['lowercase']; self._binary = meta['binary']; self._sublinear = meta['sublinear_tf']
+        self._norm = meta['norm'] == 'l2'
+        self._table = dict(zip(terms, zip(weight.tolist(), idf.tolist())))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(z['meta'].tobytes().decode('utf-8'))
+            if meta.get('format') != FORMAT: raise ValueError(f"{path}: unknown format {meta.get('format')}")
+            text = z['terms'].tobytes().decode('utf-8')
+            return cls(meta, text.split('\n') if text else [], z['weight'], z['idf'])
+
+    def _grams(self, tokens):
+        if self.lo == 1 and self.hi == 1: return tokens
+        out = list(tokens) if self.lo == 1 else []
+        for n in range(max(2, self.lo), self.hi+1):
+            out += [' '.join(tokens[i:i+n]) for i in range(len(tokens)-n+1)]
+        return out
+
+    def decision(self, text):
+        tokens = self._tokens(text.lower() if self._lower else text)
+        table = self._table; num = 0.0; den = 0.0
+        for g, c in Counter(self._grams(tokens)).items():
+            wi = table.get(g)
+            if wi is None: continue
+            tf = 1.0 if self._binary else (1.0 + math.log(c) if self._sublinear else float(c))
+            num += tf*wi[0]; den += (tf*wi[1])**2
+        if self._norm and den: num /= den**0.5
+        return num + self.intercept
+
+    def score(self, text):
+        """Probability of the positive class for one text."""
+        d = self.decision(text)
+        if d >= 0: return 1.0/(1.0 + math.exp(-d))
+        e = math.exp(d); return e/(1.0 + e)
+
+    def predict_proba(self, texts):
+        p = np.array([self.score(str(t)) for t in texts], dtype=float).reshape(-1)
+        return np.column_stack([1.0-p, p])
+
+    def predict(self, texts):
+        return self.classes_[(self.predict_proba(texts)[:, 1] > 0.5).astype(int)]
+
+def check(scorer, model, texts):
+    """Largest |probability difference| and label agreement against the source pipeline, plus
+    per-text latency of both when scoring one text at a time."""
+    ref = model.predict_proba(texts)[:, 1]; got = scorer.predict_proba(texts)[:, 1]
+    sample = texts[:200]
+    t = time.perf_counter(); [model.predict_proba([x]) for x in sample]; t_ref = (time.perf_counter()-t)/max(1, len(sample))
+    t = time.perf_counter(); [scorer.score(x) for x in sample]; t_new = (time.perf_counter()-t)/max(1, len(sample))
+    return {'texts': len(texts), 'max_abs_diff': float(np.abs(ref-got).max()) if len(texts) else 0.0,
+            'label_agreement': float(((ref > 0.5) == (got > 0.5)).mean()) if len(texts) else 1.0,
+            'pipeline_us_per_text': t_ref*1e6, 'scorer_us_per_text': t_new*1e6}
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--model',default='profanity_baseline'); p.add_argument('--out'); p.add_argument('--prune',type=float,default=0.0,help='drop n-grams with |idf*coef| below this')
+    p.add_argument('--float32',action='store_true'); p.add_argument('--csv',default='dataset_seed.csv',help='texts to check the compiled scorer against'); args=p.parse_args()
+
+    out, model = export(args.model, args.out, args.prune, args.float32)
+    t = time.perf_counter(); scorer = LinearScorer.load(out); load_ms = (time.perf_counter()-t)*1000
+    print(f"{out}: {scorer.meta['n_terms']}/{scorer.meta['n_source_terms']} n-grams, {out.stat().st_size/1024:.0f} KiB, loads in {load_ms:.1f} ms")
+
+    if Path(args.csv).exists():
+        from src.data.columnar import load_table
+        texts = load_table(args.csv, columns=['text'])['text'].dropna().astype(str).tolist()
+        for k, v in check(scorer, model, texts).items(): print(f"{k:>22}: {v:.6g}" if isinstance(v, float) else f"{k:>22}: {v}")
@@ -0,0 +1,76 @@
+import hashlib, os, sqlite3, threading, time
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[2]
+CACHE_PATH = BASE / 'models' / 'llm_cache.sqlite'
+
+def normalize_for_cache(text):
+    return ' '.join(str(text or '').lower().split())
+
+def cache_key(text, entity, prompt_version, model):
+    raw = '\x1f'.join([normalize_for_cache(text), entity, prompt_version, model])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class LLMCache:
+    """SQLite store of LLM verdicts keyed by cache_key(text, entity, prompt version, model).
+
+    max_entries trims least-recently-used rows and max_age (seconds) drops old verdicts;
+    both are applied by evict(), which put_many() calls after each write.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=1_000_000, max_age=None):
+        self.path = str(path); self.max_entries = max_entries; self.max_age = max_age
+        self.hits = 0; self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, label INTEGER NOT NULL, created REAL NOT NULL, used REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS verdicts_used ON verdicts(used)')
+        self._db.commit()
+
+    def get_many(self, keys):
+        """{key: label} for the cached subset of keys; counts hits/misses per requested key."""
+        keys = list(keys); found = {}; now = time.time()
+        oldest = now - self.max_age if self.max_age else 0.0
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i+500]
+                q = f"SELECT key, label FROM verdicts WHERE created >= ? AND key IN ({','.join('?'*len(part))})"
+                found.update(self._db.execute(q, [oldest, *part]).fetchall())
+            if found:
+                self._db.executemany('UPDATE verdicts SET used=? WHERE key=?', [(now, k) for k in found])
+                self._db.commit()
+        self.hits += sum(k in found for k in keys); self.misses += sum(k not in found for k in keys)
+        return found
+
+    def put_many(self, items):
+        now = time.time()
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO verdicts VALUES (?,?,?,?)', [(k, int(l), now, now) for k, l in items])
+            self._db.commit()
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            if self.max_age:
+                self._db.execute('DELETE FROM verdicts WHERE created < ?', (time.time()-self.max_age,))
+            if self.max_entries:
+                self._db.execute('DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM verdicts').fetchone()[0]
+        total = self.hits + self.misses
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits/total if total else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM verdicts'); self._db.commit()
+
+_default = None
+
+def default_cache():
+    global _default
+    if _default is None: _default = LLMCache(os.getenv('LLM_CACHE_PATH') or CACHE_PATH)
+    return _default
@@ -1,25 +1,17 @@
-import os
-import google.generativeai as genai
+import os, re, json, time, random, asyncio, urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from src.detectors.llm_cache import cache_key, default_cache
+from src.utils import instrument
 
 load_dotenv()
 
-# Gemini API KEY
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+MODEL_NAME = "gemini-2.5-flash"
+PROMPT_VERSION = "batch-v1"  # bump whenever INSTRUCTIONS/BATCH_FORMAT change; part of the cache key
 
-def classify_texts_with_llm(texts, entity="profanity"):
-    """
-    Use Gemini to classify a list of texts.
-    entity: 'profanity' or 'privacy'
-    Returns list of (label, None) tuples.
-    """
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    labels = []
-
-    for text in texts:
-        if entity == "privacy":
-            prompt = f"""
-You are a strict compliance auditor. 
+INSTRUCTIONS = {
+    "privacy": """
+You are a strict compliance auditor.
 Decide if this text contains **sensitive personal data** or **compliance violations**.
 
 Flag ONLY if it contains:
@@ -34,26 +26,185 @@ Flag ONLY if it contains:
 - HIPAA or medical details
 
 Normal greetings, first names, or company names are SAFE and should NOT be flagged.
-
-Text: "{text}"
-
-Respond ONLY with "1" if it contains sensitive data or violation, otherwise "0".
-            """
-        else:
-            prompt = f"""
+""",
+    "profanity": """
 You are a strict language filter.
 Does this text contain profanity or offensive language?
-Text: "{text}"
-Respond ONLY "1" if profanity present, else "0".
-            """
-
-        try:
-            response = model.generate_content(prompt)
-            output = response.text.strip()
-            label = 1 if "1" in output else 0
-            labels.append((label, None))
-        except Exception as e:
-            print(f"Gemini error: {e}")
-            labels.append((0, None))
+""",
+}
+
+BATCH_FORMAT = """
+Classify each numbered text below independently.
+
+{items}
+
+Respond ONLY with a JSON array containing one object per text, in order:
+[{{"id": 0, "label": 1}}, {{"id": 1, "label": 0}}, ...]
+label is 1 if the text should be flagged, otherwise 0.
+"""
+
+def build_batch_prompt(texts, entity="profanity"):
+    items = "\n".join(f"[{i}] {json.dumps(t)}" for i, t in enumerate(texts))
+    return INSTRUCTIONS.get(entity, INSTRUCTIONS["profanity"]) + BATCH_FORMAT.format(items=items)
+
+def parse_batch_response(output, n):
+    """Labels from a batch response, None for every item it does not answer validly: a missing,
+    duplicate or out-of-range id (only 0 <= id < n; a negative id must not index from the end)
+    or a label that is not 0/1-like. Objects without an id, and bare labels, count by position
+    only when the array has exactly n entries. Raises ValueError if there is no JSON array."""
+    m = re.search(r"\[.*\]", output or "", flags=re.S)
+    if not m: raise ValueError(f"no JSON array in response: {(output or '')[:80]!r}")
+
+    items = json.loads(m.group(0))
+    if not isinstance(items, list): raise ValueError("response is not a JSON array")
+
+    labels = [None]*n
+    for pos, it in enumerate(items):
+        i, label = (it.get("id"), it.get("label")) if isinstance(it, dict) else (None, it)
+        if i is None and len(items) == n: i = pos
+        if isinstance(i, str) and i.strip().isdigit(): i = int(i)
+        if type(i) is not int or not 0 <= i < n or labels[i] is not None: continue
+        try: labels[i] = 1 if int(label) == 1 else 0
+        except (TypeError, ValueError): pass
 
     return labels
+
+class GeminiBackend:
+    """Google Gemini; the SDK is imported and configured on first use."""
+
+    def __init__(self, model_name=MODEL_NAME):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self.model = genai.GenerativeModel(model_name)
+        self.name = model_name
+
+    async def generate(self, prompt):
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+class HTTPBackend:
+    """POSTs {"prompt": ...} to a URL and reads {"text": ...}; see llm_stub for a local server."""
+
+    def __init__(self, url, timeout=60):
+        self.url = url; self.timeout = timeout
+        self.name = url
+
+    def _post(self, prompt):
+        req = urllib.request.Request(self.url, data=json.dumps({"prompt": prompt}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as r:
+            return json.loads(r.read().decode("utf-8"))["text"]
+
+    async def generate(self, prompt):
+        return await asyncio.to_thread(self._post, prompt)
+
+def default_backend():
+    url = os.getenv("LLM_BACKEND_URL")
+    return HTTPBackend(url) if url else GeminiBackend()
+
+def default_backend_name():
+    return os.getenv("LLM_BACKEND_URL") or MODEL_NAME
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate; self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity; self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now-self.updated)*self.rate); self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1; return
+                await asyncio.sleep((1-self.tokens)/self.rate)
+
+async def classify_texts_async(texts, entity="profanity", backend=None, batch_size=20, concurrency=4,
+                               rpm=60, retries=3, backoff=1.0):
+    """
+    Classify texts with batched prompts, at most `concurrency` requests in flight and
+    `rpm` requests per minute. Failed batches, and the items a response left unlabelled,
+    are retried with exponential backoff; items still unlabelled come back as (None, error).
+    Returns list of (label, error) tuples in input order.
+    """
+    backend = backend or default_backend()
+    texts = list(texts)
+    sem = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rpm/60.0)
+    results = [None]*len(texts)
+
+    async def run_batch(start):
+        idx = list(range(start, min(start+batch_size, len(texts))))  # items still without a label
+        last = idx[-1]; err = None
+        for attempt in range(retries+1):
+            if attempt: await asyncio.sleep(backoff * 2**(attempt-1) * (1 + random.random()))
+            await bucket.acquire()
+            try:
+                async with sem:
+                    t = time.perf_counter()  # after the semaphore wait: llm.request times the request alone
+                    output = await backend.generate(build_batch_prompt([texts[i] for i in idx], entity))
+                labels = parse_batch_response(output, len(idx))
+            except Exception as e:
+                instrument.observe("llm.request", time.perf_counter()-t, 0, error=True)
+                err = f"{type(e).__name__}: {e}"; continue
+
+            got = 0
+            for i, l in zip(idx, labels):
+                if l is not None: results[i] = (l, None); got += 1
+            instrument.observe("llm.request", time.perf_counter()-t, got)
+            # items the response skipped or answered with an invalid id go out again on their own
+            idx = [i for i, l in zip(idx, labels) if l is None]
+            if not idx: return
+            err = f"ValueError: no valid label for {len(idx)} item(s) in the response"
+
+        print(f"LLM batch {start}-{last}: {len(idx)} item(s) failed after {retries+1} attempts: {err}")
+        for i in idx: results[i] = (None, err)
+
+    await asyncio.gather(*(run_batch(i) for i in range(0, len(texts), batch_size)))
+    return results
+
+def _run(coro):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # already inside an event loop: run ours on a separate thread
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(asyncio.run, coro).result()
+
+@instrument.timed("llm.classify", items=lambda a, out: len(out))
+def classify_texts_with_llm(texts, entity="profanity", cache=True, **kwargs):
+    """
+    Use Gemini to classify a list of texts.
+    entity: 'profanity' or 'privacy'
+    Returns list of (label, error) tuples; error is None unless the item could not be
+    classified, in which case label is None. (Before batching, a failed item came back as
+    (0, None), indistinguishable from a clean verdict.) Every caller handles the None: the
+    cascade keeps its local verdict, evaluate leaves the item out of the scores and retries it
+    next run, and the app reports it as unclassified without memoizing the result.
+    Identical texts (after lowercasing/whitespace folding) are sent once, and verdicts are
+    read from / written to `cache` (an LLMCache; True = default_cache(), None/False = off).
+    Extra kwargs go to classify_texts_async (backend, batch_size, concurrency, rpm, retries).
+    """
+    texts = list(texts)
+    if cache is True: cache = default_cache()
+    name = kwargs["backend"].name if kwargs.get("backend") else default_backend_name()
+    keys = [cache_key(t, entity, PROMPT_VERSION, name) for t in texts]
+
+    known = cache.get_many(set(keys)) if cache else {}
+    todo = {}
+    for k, t in zip(keys, texts):
+        if k not in known and k not in todo: todo[k] = t
+
+    if todo:
+        fresh = _run(classify_texts_async(list(todo.values()), entity=entity, **kwargs))
+        done = {k: r for k, r in zip(todo, fresh)}
+        if cache: cache.put_many((k, r[0]) for k, r in done.items() if r[0] is not None)
+    else:
+        done = {}
+
+    return [(known[k], None) if k in known else done[k] for k in keys]
@@ -0,0 +1,47 @@
+"""Offline stand-in for the Gemini API, for tests and benchmarks of the LLM engine.
+
+    python -m src.detectors.llm_stub --port 8765 --latency 0.5
+    LLM_BACKEND_URL=http://127.0.0.1:8765 streamlit run src/app/streamlit_app.py
+
+Answers batch prompts from llm_detector with the pattern detectors' verdicts.
+"""
+import argparse, json, random, re, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.detectors.privacy_rules import SENSITIVE, VERIFICATION, default_privacy_rules
+from src.detectors.regex_detectors import default_profanity_matcher
+
+ITEM_RE = re.compile(r'^\[(\d+)\] (".*")$', flags=re.M)
+
+def answer(prompt):
+    privacy = 'compliance auditor' in prompt
+    out = []
+    for m in ITEM_RE.finditer(prompt):
+        t = json.loads(m.group(2))
+        hit = default_privacy_rules().only((SENSITIVE, VERIFICATION)).categories(t) if privacy else default_profanity_matcher().search(t)
+        out.append({'id': int(m.group(1)), 'label': int(bool(hit))})
+    return json.dumps(out)
+
+def make_handler(latency=0.0, error_rate=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            time.sleep(latency)
+            if random.random() < error_rate:
+                self.send_response(503); self.end_headers(); return
+            data = json.dumps({'text': answer(body['prompt'])}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(data)))
+            self.end_headers(); self.wfile.write(data)
+
+        def log_message(self, *args): pass
+
+    return Handler
+
+def serve(port=8765, latency=0.0, error_rate=0.0):
+    srv = ThreadingHTTPServer(('127.0.0.1', port), make_handler(latency, error_rate))
+    print(f"LLM stub on http://127.0.0.1:{srv.server_port}")
+    return srv
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--port',type=int,default=8765); p.add_argument('--latency',type=float,default=0.0); p.add_argument('--error-rate',type=float,default=0.0); args=p.parse_args()
+    serve(args.port, args.latency, args.error_rate).serve_forever()
@@ -1,13 +1,17 @@
-import pickle
+import pickle, zlib
+import numpy as np
 from pathlib import Path
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import Pipeline
+from concurrent.futures import ProcessPoolExecutor
+from src.utils.instrument import timed
 
 MODEL_DIR = Path(__file__).resolve().parents[2] / 'models'
 MODEL_DIR.mkdir(exist_ok=True)
 
 def train_baseline(df, text_col='text', label_col='label', model_name='profanity_baseline'):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    
     X = df[text_col].fillna('')
     y = df[label_col].astype(int)
     
@@ -19,12 +23,82 @@ def train_baseline(df, text_col='text', label_col='label', model_name='profanity
     with out.open('wb') as f: pickle.dump(pipe, f)
     return out
 
+def _holdout_mask(texts, holdout):
+    # hash of the text, so duplicates always land on the same side of the split
+    return np.array([zlib.crc32(t.encode('utf-8')) % 1000 < holdout*1000 for t in texts], dtype=bool)
+
+def _transform(vec, texts, ex, workers):
+    if ex is None or len(texts) < 2*workers: return vec.transform(texts)
+    
+    from scipy.sparse import vstack
+    step = -(-len(texts)//workers)
+    return vstack(list(ex.map(vec.transform, [texts[i:i+step] for i in range(0, len(texts), step)])))
+
+def _scores(tp, fp, fn, tn):
+    prec = tp/(tp+fp) if tp+fp else 0.0; rec = tp/(tp+fn) if tp+fn else 0.0
+    return {'accuracy': (tp+tn)/max(1, tp+fp+fn+tn), 'precision': prec, 'recall': rec,
+            'f1': 2*prec*rec/(prec+rec) if prec+rec else 0.0, 'n': tp+fp+fn+tn}
+
+def train_streaming(make_chunks, model_name='profanity_baseline', epochs=3, holdout=0.1, workers=1,
+                    n_features=2**20, alpha=1e-5, seed=0):
+    """
+    Out-of-core alternative to train_baseline. make_chunks() must return a fresh iterator of
+    (texts, labels) pairs on every call, e.g. pd.read_csv(..., chunksize=...) wrapped per epoch.
+    Features come from a stateless HashingVectorizer (word 1-2 grams, split over `workers`
+    processes) and an SGD logistic regression is fitted with partial_fit, so memory is bounded
+    by one chunk. A text-hash `holdout` fraction is scored after every epoch.
+    Writes the same kind of Pipeline as train_baseline, usable by load_model/predict_texts.
+    """
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import Pipeline
+    
+    vec = HashingVectorizer(n_features=n_features, ngram_range=(1,2), alternate_sign=False)
+    clf = SGDClassifier(loss='log_loss', alpha=alpha, random_state=seed)
+    rng = np.random.default_rng(seed)
+    history = []
+    ex = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    
+    try:
+        for epoch in range(epochs):
+            for texts, labels in make_chunks():
+                texts = [str(t) for t in texts]; y = np.asarray(labels, dtype=int)
+                train = ~_holdout_mask(texts, holdout)
+                if not train.any(): continue
+                
+                idx = rng.permutation(np.flatnonzero(train))
+                clf.partial_fit(_transform(vec, [texts[i] for i in idx], ex, workers), y[idx], classes=[0,1])
+                
+            tp=fp=fn=tn=0
+            for texts, labels in make_chunks():
+                texts = [str(t) for t in texts]; y = np.asarray(labels, dtype=int)
+                held = _holdout_mask(texts, holdout)
+                if not held.any(): continue
+                
+                pred = clf.predict(_transform(vec, [t for t, h in zip(texts, held) if h], ex, workers)); yh = y[held]
+                tp += int(((pred==1)&(yh==1)).sum()); fp += int(((pred==1)&(yh==0)).sum())
+                fn += int(((pred==0)&(yh==1)).sum()); tn += int(((pred==0)&(yh==0)).sum())
+                
+            history.append(dict(epoch=epoch+1, **_scores(tp, fp, fn, tn)))
+            print("epoch", epoch+1, history[-1])
+    finally:
+        if ex: ex.shutdown()
+        
+    pipe = Pipeline([('hash', vec), ('clf', clf)])
+    out = MODEL_DIR / f"{model_name}.pkl"
+    
+    with out.open('wb') as f: pickle.dump(pipe, f)
+    return out, history
+
 def load_model(name='profanity_baseline'):
     p = MODEL_DIR / f"{name}.pkl"
     if not p.exists(): raise FileNotFoundError(p)
     with p.open('rb') as f: return pickle.load(f)
 
+@timed('ml.predict', items=lambda a, out: len(out[0]))
 def predict_texts(texts, model):
-    preds = model.predict(texts)
-    probs = model.predict_proba(texts)[:,1] if hasattr(model,'predict_proba') else None
-    return preds, probs
+    if not hasattr(model,'predict_proba'): return model.predict(texts), None
+    
+    # one transform: the label is the likelier class, as in predict()
+    proba = model.predict_proba(texts)
+    return model.classes_[proba.argmax(axis=1)], proba[:,1]
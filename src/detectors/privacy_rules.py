@@ -0,0 +1,298 @@
+"""Privacy rule packs compiled into one matcher.
+
+    rules = default_privacy_rules()              # data/privacy_rules.yaml
+    rules.scan("my card is 4111 1111 1111 1111") # [(11, 30, 'card_number', 'card_number')]
+    rules.categories(text)                       # {'card_number'}
+
+    python -m src.detectors.privacy_rules --folder All_Conversations --out rule_hits.csv
+
+A pack is a YAML (or JSON) file with a `rules` list; see data/privacy_rules.yaml for the
+format. The phrases of all term rules are merged into one trie-shaped regex, so a position
+costs one branch on its first character however many phrases there are. Regex rules are
+grouped by a character they cannot match without (a digit, '@', '$'), and each group's
+alternation only runs on utterances containing it. ASCII text is lowercased once and
+scanned without re.I.
+
+After a match at position s, each alternative of the group is tried with .match() at s,
+and the search resumes at s+1. So every (rule, start) pair that matches is reported,
+including overlapping hits of different rules. Validators (Luhn for card numbers, SSN and
+NANP number plans) run only on those candidate matches.
+"""
+import argparse, json, re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+
+BASE = Path(__file__).resolve().parents[2]
+RULES_PATH = BASE/'data'/'privacy_rules.yaml'
+
+SENSITIVE = 'sensitive'
+VERIFICATION = 'verification'
+PII = ('card_number', 'ssn', 'email', 'phone')  # categories of personal data in the default pack
+
+Hit = Tuple[int, int, str, str]  # (start, end, rule id, category); span indexes the text
+
+def _digits(s):
+    return [int(c) for c in s if c.isdigit()]
+
+def luhn(s: str) -> bool:
+    d = _digits(s)
+    if not 13 <= len(d) <= 19: return False
+    total = sum(d[-1::-2]) + sum(x*2-9 if x > 4 else x*2 for x in d[-2::-2])
+    return total % 10 == 0
+
+def ssn(s: str) -> bool:
+    d = ''.join(map(str, _digits(s)))
+    return len(d) == 9 and d[:3] not in ('000', '666') and d[0] != '9' and d[3:5] != '00' and d[5:] != '0000'
+
+def nanp(s: str) -> bool:
+    """North American number plan: area code and exchange start with 2-9."""
+    d = _digits(s)
+    if len(d) == 11 and d[0] == 1: d = d[1:]
+    return len(d) == 10 and d[0] >= 2 and d[3] >= 2
+
+VALIDATORS = {'luhn': luhn, 'ssn': ssn, 'nanp': nanp}
+
+class Rule(NamedTuple):
+    id: str
+    category: str
+    terms: Tuple[str, ...] = ()
+    regex: Optional[str] = None
+    ignore_case: bool = True
+    validate: Optional[str] = None
+
+def _rule(d: Dict, where: str) -> Rule:
+    if not isinstance(d, dict) or not d.get('id'): raise ValueError(f"{where}: every rule needs an id")
+    rid = str(d['id'])
+    terms = tuple(' '.join(str(t).split()) for t in d.get('terms') or () if str(t).strip())
+    regex = d.get('regex')
+    if bool(terms) == bool(regex): raise ValueError(f"{where}: rule {rid!r} needs exactly one of terms/regex")
+
+    if regex:
+        try: rx = re.compile(regex)
+        except re.error as e: raise ValueError(f"{where}: rule {rid!r}: {e}")
+        if rx.groupindex or re.search(r'\\[1-9]|\(\?P=', regex): raise ValueError(f"{where}: rule {rid!r}: named groups and backreferences are not allowed")
+        if rx.fullmatch(''): raise ValueError(f"{where}: rule {rid!r} matches the empty string")
+
+    validate = d.get('validate')
+    if validate and validate not in VALIDATORS: raise ValueError(f"{where}: rule {rid!r}: unknown validator {validate!r} (have {', '.join(VALIDATORS)})")
+    ignore_case = bool(d.get('ignore_case', True))
+    if ignore_case: terms = tuple(t.lower() for t in terms)
+    return Rule(rid, str(d.get('category') or rid), terms, regex, ignore_case, validate)
+
+def load_rule_pack(path=None) -> List[Rule]:
+    p = Path(path) if path else RULES_PATH
+    raw = p.read_bytes()
+    if p.suffix.lower() in ('.yaml', '.yml'):
+        import yaml
+        data = yaml.load(raw, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    else:
+        data = json.loads(raw.decode('utf-8'))
+
+    return parse_rule_pack(data, str(p))
+
+def parse_rule_pack(data, source: str = '<pack>') -> List[Rule]:
+    """Rules of an already-decoded pack: {'rules': [...]} or the list itself. source names
+    the pack in error messages."""
+    rules = (data or {}).get('rules') if isinstance(data, dict) else data
+    if not isinstance(rules, list): raise ValueError(f"{source}: expected a 'rules' list")
+    return [_rule(d, source) for d in rules if not (isinstance(d, dict) and d.get('enabled') is False)]
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """Alternation of words nested by common prefix, e.g. 'a(?:ccount number|ddress)'."""
+    trie = {}
+    for w in words:
+        node = trie
+        for c in w: node = node.setdefault(c, {})
+        node[''] = {}
+
+    def emit(node):
+        end = '' in node
+        alts = [re.escape(c) + emit(node[c]) for c in sorted(node) if c]
+        if not alts: return ''
+        body = alts[0] if len(alts) == 1 and not end else '(?:' + '|'.join(alts) + ')'
+        return body + '?' if end else body
+
+    return emit(trie)
+
+def _trigger(regex: str) -> Optional[str]:
+    """A cheap test every match of regex must pass: 'digit' if it needs a digit, or a
+    non-letter character it must contain (e.g. '@'); None when there is no such requirement."""
+    try:
+        from re import _parser as sre_parse, _constants as sc
+    except ImportError:  # Python < 3.11
+        import sre_parse, sre_constants as sc
+    repeats = tuple(getattr(sc, n) for n in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') if hasattr(sc, n))
+    digit = ([(sc.CATEGORY, sc.CATEGORY_DIGIT)], [(sc.RANGE, (48, 57))])
+
+    def walk(sub):
+        found = None
+        for op, av in sub:
+            t = None
+            if op is sc.LITERAL and not chr(av).isalpha(): return chr(av)
+            if op is sc.IN and av in digit: t = 'digit'
+            elif op in repeats and av[0] >= 1: t = walk(av[2])
+            elif op is sc.SUBPATTERN: t = walk(av[-1])
+            if t and t != 'digit': return t
+            found = found or t
+        return found
+
+    try: return walk(sre_parse.parse(regex))
+    except Exception: return None
+
+_BOUNDARY = re.compile(r'\b')
+_DIGIT = re.compile(r'\d')
+
+class RuleEngine:
+    """All rules of the given packs, scanned as:
+
+    - one trie regex of every term (per case mode), run on every text;
+    - the regex rules grouped by _trigger, one alternation per group, run only on texts that
+      contain the trigger (most need a digit, '@' or '$', which most utterances lack).
+    """
+
+    def __init__(self, rules: Sequence[Rule]):
+        ids = [r.id for r in rules]
+        dup = {i for i in ids if ids.count(i) > 1}
+        if dup: raise ValueError(f"duplicate rule ids: {', '.join(sorted(dup))}")
+
+        self.rules = list(rules)
+        self.categories_all = sorted({r.category for r in rules})
+        self._only = {}
+        # alternatives: ('terms', {term: [rule idx]}, ignore_case) or ('regex', rule idx)
+        self._alts = []
+        for ic in (True, False):
+            table = {}
+            for i, r in enumerate(rules):
+                if r.terms and r.ignore_case == ic:
+                    for t in r.terms: table.setdefault(t, []).append(i)
+            if table: self._alts.append(('terms', table, ic))
+        self._alts += [('regex', i) for i, r in enumerate(rules) if r.regex]
+
+        # for every term, the shorter terms of the same alternative it starts with
+        self._prefixes = [{t: [t[:j] for j in range(1, len(t)) if t[:j] in a[1]] for t in a[1]} if a[0] == 'terms' else None for a in self._alts]
+
+        groups = {}
+        for k, a in enumerate(self._alts):
+            key = ('terms', k) if a[0] == 'terms' else _trigger(self.rules[a[1]].regex)
+            groups.setdefault(key, []).append(k)
+
+        self._fast = all(r.ignore_case and (r.regex or '') == (r.regex or '').lower() for r in rules)
+        modes = (False, True) if self._fast else (False,)
+        self._singles = {cb: [re.compile(self._source(a, cb)) for a in self._alts] for cb in modes}
+        # (trigger, alternative indexes, {case_blind: combined pattern})
+        self._scanners = [(None if isinstance(key, tuple) else key, ks, {cb: re.compile('|'.join(self._source(self._alts[k], cb) for k in ks)) for cb in modes})
+                          for key, ks in groups.items()]
+
+    def _source(self, alt, case_blind):
+        """Regex source of one alternative; case_blind: for already-lowercased ASCII text."""
+        if alt[0] == 'terms':
+            src = r'\b(?:' + _trie_regex(alt[1]) + r')\b'
+            ic = alt[2]
+        else:
+            r = self.rules[alt[1]]; src = r.regex; ic = r.ignore_case
+        return src if case_blind else ('(?i:' if ic else '(?-i:') + src + ')'
+
+    def _report(self, k, m, hits, ends):
+        """Append alternative k's hits for match m; a rule's hit starting inside its previous
+        hit is dropped, so each rule reports non-overlapping spans like finditer."""
+        alt = self._alts[k]; s, e = m.span()
+        if alt[0] == 'regex':
+            r = self.rules[alt[1]]
+            if s >= ends.get(r.id, 0) and (r.validate is None or VALIDATORS[r.validate](m.group())):
+                hits.append((s, e, r.id, r.category)); ends[r.id] = e
+            return
+
+        table = alt[1]; found = m.group().lower() if alt[2] else m.group()
+        if found not in table:  # re.I case-folded something .lower() does not map back
+            found = next((t for t in table if len(t) == e-s and re.fullmatch(re.escape(t), m.group(), re.I)), None)
+            if found is None: return
+        # longest first, so a rule with several terms matching here reports its longest, as its own finditer would
+        spans = [(e, found)] + [(s+len(p), p) for p in reversed(self._prefixes[k][found]) if _BOUNDARY.match(m.string, s+len(p))]
+        for end, t in spans:
+            for i in table[t]:
+                r = self.rules[i]
+                if s >= ends.get(r.id, 0): hits.append((s, end, r.id, r.category)); ends[r.id] = end
+
+    def scan(self, text: str) -> List[Hit]:
+        """Every rule hit in text, by start position."""
+        if not text: return []
+        cb = self._fast and text.isascii()
+        subject = text.lower() if cb else text
+        singles = self._singles[cb]
+        hits = []; ends = {}; digit = None
+
+        for trigger, ks, patterns in self._scanners:
+            if trigger == 'digit':
+                if digit is None: digit = _DIGIT.search(subject) is not None
+                if not digit: continue
+            elif trigger is not None and trigger not in subject: continue
+
+            pattern = patterns[cb]; pos = 0
+            while True:
+                m = pattern.search(subject, pos)
+                if m is None: break
+                s = m.start()
+                if len(ks) == 1: self._report(ks[0], m, hits, ends)
+                else:
+                    # which alternatives match here: the one the alternation took and any later ones
+                    for k in ks:
+                        mk = singles[k].match(subject, s)
+                        if mk: self._report(k, mk, hits, ends)
+                pos = s+1
+
+        if len(self._scanners) > 1: hits.sort(key=lambda h: h[0])
+        return hits
+
+    def categories(self, text: str) -> Set[str]:
+        return {h[3] for h in self.scan(text)}
+
+    def only(self, categories: Iterable[str]) -> 'RuleEngine':
+        """Engine over just the rules of these categories (built once), so a caller that needs
+        two categories does not pay for scanning the others."""
+        key = frozenset(categories)
+        if key >= set(self.categories_all): return self
+        if key not in self._only: self._only[key] = RuleEngine([r for r in self.rules if r.category in key])
+        return self._only[key]
+
+    def masks(self, texts: Iterable[str], categories: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """{category: bool array over texts} of the categories that fired, one scan per text."""
+        texts = list(texts); cats = list(categories) if categories is not None else self.categories_all
+        out = {c: np.zeros(len(texts), dtype=bool) for c in cats}; engine = self.only(cats)
+        for i, t in enumerate(texts):
+            for c in engine.categories(t):
+                if c in out: out[c][i] = True
+        return out
+
+@lru_cache(maxsize=8)
+def _engine(paths: Tuple[str, ...]) -> RuleEngine:
+    return RuleEngine([r for p in paths for r in load_rule_pack(p)])
+
+def default_privacy_rules(paths: Optional[Sequence[str]] = None) -> RuleEngine:
+    """Engine over the given packs (default: data/privacy_rules.yaml), built once per process."""
+    return _engine(tuple(str(p) for p in (paths or [RULES_PATH])))
+
+def scan_frame(df, rules: Optional[RuleEngine] = None):
+    """One row per rule hit in a DataFrame or CallBatch of utterances."""
+    import pandas as pd
+    from src.data.callbatch import CallBatch
+
+    rules = rules or default_privacy_rules()
+    b = df if isinstance(df, CallBatch) else CallBatch.from_frame(df)
+    codes = b.call_codes(); rows = []
+    for i, text in enumerate(b.texts()):
+        for s, e, rid, cat in rules.scan(text):
+            rows.append({'call_id': b.call_ids[codes[i]], 'utterance_id': int(b.utterance_id[i]), 'speaker': b.speakers[b.speaker[i]],
+                         'role': 'agent' if b.agent[i] else 'borrower', 'rule': rid, 'category': cat, 'start': s, 'end': e,
+                         'match': text[s:e], 'text': text})
+    return pd.DataFrame(rows, columns=['call_id','utterance_id','speaker','role','rule','category','start','end','match','text'])
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--folder',default='All_Conversations'); p.add_argument('--out',default='rule_hits.csv')
+    p.add_argument('--rules',nargs='+',help='rule pack files (default data/privacy_rules.yaml)'); args=p.parse_args()
+    from src.data.callbatch import CallBatch
+
+    hits = scan_frame(CallBatch.from_folder(args.folder), default_privacy_rules(args.rules))
+    hits.to_csv(args.out, index=False)
+    print(hits.groupby('category').size().to_string() if len(hits) else "no hits"); print("saved", args.out)
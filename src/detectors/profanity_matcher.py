@@ -0,0 +1,123 @@
+import re
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+
+from src.utils.text_preprocess import LEET, normalize_with_offsets
+
+Match = Tuple[int, int, str]  # (start, end, term); span indexes the original text
+
+PREFILTER_MAX_TERMS = 200  # above this the regex alternation costs more than it saves
+
+def _squeeze(s, offs):
+    """s with every run of one char reduced to that char: (chars, run lengths, start and end
+    in the original text of each run) from s and the original index of each of its chars."""
+    chars=[]; runs=[]; starts=[]; ends=[]
+    for c, o in zip(s, offs):
+        if chars and chars[-1] == c: runs[-1] += 1; ends[-1] = o+1
+        else: chars.append(c); runs.append(1); starts.append(o); ends.append(o+1)
+    return ''.join(chars), runs, starts, ends
+
+def _loose(key):
+    """Regex over lowercased text matching every raw form that normalizes to (a superset of)
+    squeezed `key`: a char also matches the digits LEET maps onto it and longer runs, a space
+    any run of chars normalization turns into a space."""
+    out = []
+    for c in key:
+        if c == ' ': out.append(r'[^a-z0-9@#$./\-]+')
+        else: out.append('[' + re.escape(c + ''.join(d for d, l in LEET.items() if l == c)) + ']+')
+    return ''.join(out)
+
+class ProfanityMatcher:
+    """Aho-Corasick automaton over the word list.
+
+    Built once, then every text is scanned in a single left-to-right pass whose cost
+    does not depend on the number of terms. With normalize=True texts (and terms) go
+    through the same leetspeak normalization as normalize_text, and a letter matches any
+    longer run of it, so 'sh1t', 'shiiit' or 'fuuuck' are caught while 'ashole' does not
+    match 'asshole'; spans still point into the original text. Like the \\b(...)\\b regex, only
+    whole-word matches are reported.
+
+    Normalizing costs several times the scan itself, so with at most PREFILTER_MAX_TERMS terms
+    a compiled regex that is a superset of the matches (loose runs and leetspeak) runs on the
+    lowercased text first, and only texts it hits are normalized and
+    scanned. On the 31-word list that is within 1.5x of the old \\b(...)\\b regex (6x without it);
+    past a few hundred terms the automaton alone is faster.
+    """
+
+    def __init__(self, words: Iterable[str], normalize: bool = True):
+        self.normalize = normalize
+        self._goto = [{}]; self._fail = [0]; self._out = [[]]
+        keys = set()
+
+        for w in words:
+            if normalize: key, runs, _, _ = _squeeze(*normalize_with_offsets(w or ''))
+            else: key, runs = (w or '').lower().strip(), None
+            if key: self._add(key, w, runs); keys.add(key)
+
+        self._build()
+        self._pre = None
+        if keys and len(keys) <= PREFILTER_MAX_TERMS:
+            alt = '|'.join((_loose if normalize else re.escape)(k) for k in sorted(keys, key=len, reverse=True))
+            # an ASCII letter/digit next to the match survives normalization, so it rules out a word boundary
+            word = '[a-z0-9]' if normalize else r'[^\W_]'
+            self._pre = re.compile(f"(?<!{word})(?:{alt})(?!{word})")
+
+    def _add(self, key, term, runs=None):
+        node = 0
+        for c in key:
+            nxt = self._goto[node].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][c] = nxt
+                self._goto.append({}); self._fail.append(0); self._out.append([])
+            node = nxt
+        self._out[node].append((len(key), term, runs))
+
+    def _build(self):
+        q = deque(self._goto[0].values())
+        while q:
+            node = q.popleft()
+            for c, nxt in self._goto[node].items():
+                f = self._fail[node]
+                while f and c not in self._goto[f]: f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(c, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+                q.append(nxt)
+
+    def _prepare(self, text):
+        """(chars, run lengths or None, start and end in text of each char)."""
+        if self.normalize: return _squeeze(*normalize_with_offsets(text))
+        t = text.lower()
+        if len(t) == len(text): return t, None, range(len(t)), range(1, len(t)+1)
+        offs = [i for i, ch in enumerate(text) for _ in ch.lower()]  # 'İ' lowercases to two chars
+        return t, None, offs, [o+1 for o in offs]
+
+    def _scan(self, text, first=False) -> List[Match]:
+        if not text or len(self._goto) == 1: return []
+        if self._pre is not None and not self._pre.search(text.lower()): return []
+
+        s, runs, starts, ends = self._prepare(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        n = len(s); node = 0; found = []
+
+        for i, c in enumerate(s):
+            while node and c not in goto[node]: node = fail[node]
+            node = goto[node].get(c, 0)
+
+            for ln, term, kruns in out[node]:
+                a = i - ln + 1
+                # whole words only, same as \b on both sides
+                if (a == 0 or not s[a-1].isalnum()) and (i+1 == n or not s[i+1].isalnum()):
+                    if kruns and any(r < k for r, k in zip(runs[a:i+1], kruns)): continue
+                    found.append((starts[a], ends[i], term))
+                    if first: return found
+
+        return found
+
+    def finditer(self, text: str) -> List[Match]:
+        return self._scan(text)
+
+    def search(self, text: str) -> Optional[Match]:
+        """First match or None, so it can stand in for a compiled pattern's .search()."""
+        m = self._scan(text, first=True)
+        return m[0] if m else None
@@ -1,6 +1,12 @@
 import re
+import numpy as np
+from functools import lru_cache
 from typing import List
 from pathlib import Path
+from src.data.callbatch import CallBatch
+from src.detectors.profanity_matcher import ProfanityMatcher
+from src.detectors.privacy_rules import SENSITIVE, VERIFICATION, default_privacy_rules
+from src.utils.instrument import timed
 
 BASE = Path(__file__).resolve().parents[2]
 
@@ -17,29 +23,39 @@ def build_profanity_pattern(words:List[str]):
     
     return re.compile(r'\b('+'|'.join(escaped)+r')\b', flags=re.I)
 
-SENSITIVE_PAT = re.compile(r"\b(balance|available balance|amount due|outstanding|account number|acct no|card number|payment due|routing number|bank account)\b|\$\s*\d+|\b\d{6,}\b", flags=re.I)
+@timed('profanity.build', items=lambda a, out: len(a[0]))
+def build_profanity_matcher(words:List[str], normalize=True)->ProfanityMatcher:
+    """Automaton alternative to build_profanity_pattern: one pass per text regardless of list size,
+    behind a regex prefilter for short lists (see ProfanityMatcher)."""
+    return ProfanityMatcher(words, normalize=normalize)
 
-VERIF_PAT = re.compile(r"\b(date of birth|dob|ssn|social security|last 4|verify|confirm|address|pin|cvv)\b", flags=re.I)
+@lru_cache(maxsize=1)
+def _default_words():
+    return tuple(load_profanity_list())
+
+@lru_cache(maxsize=1)
+def default_profanity_matcher()->ProfanityMatcher:
+    return build_profanity_matcher(_default_words())
 
 def contains_profanity(text: str, pat=None, wordlist=None)->bool:
+    """pat: a compiled pattern or ProfanityMatcher; default the matcher over wordlist (or the
+    default list), whose normalization covers the obfuscations the old substring scan chased."""
     if text is None: return False
     
-    t = text.lower()
-    
     if pat is None:
-        if wordlist is None: wordlist = load_profanity_list()
-        pat = build_profanity_pattern(wordlist)
+        pat = default_profanity_matcher() if wordlist is None else build_profanity_matcher(wordlist)
         
-    if pat.search(t): return True
-    
-    cleaned = re.sub(r'[^a-z]','',t)
-    
-    for w in (wordlist or []):
-        if w and w in cleaned: return True
-        
-    return False
+    return pat.search(text) is not None
+
+VERIF_WINDOW = 6  # prior utterances searched for verification
 
-def detect_privacy_violations(df_call):
+@timed('privacy.per_call', items=lambda a, out: len(a[0]))
+def detect_privacy_violations(df_call, window=VERIF_WINDOW, rules=None):
+    """Agent utterances with a `sensitive` rule hit and no `verification` hit in the prior
+    `window` utterances; rules is a RuleEngine (default: data/privacy_rules.yaml)."""
+    if isinstance(df_call, CallBatch): return detect_privacy_violations_batch(df_call, window, rules)
+    
+    rules = (rules or default_privacy_rules()).only((SENSITIVE, VERIFICATION))
     violations=[]
     df = df_call.sort_values('stime').reset_index(drop=True)
     for i,row in df.iterrows():
@@ -47,9 +63,41 @@ def detect_privacy_violations(df_call):
         text = str(row.text)
         
         if 'agent' in sp:
-            if SENSITIVE_PAT.search(text):
-                prev = ' '.join(df.loc[max(0,i-6):i-1,'text'].astype(str).tolist())
-                if not VERIF_PAT.search(prev):
+            if SENSITIVE in rules.categories(text):
+                prev = ' '.join(df.loc[max(0,i-window):i-1,'text'].astype(str).tolist())
+                if VERIFICATION not in rules.categories(prev):
                     violations.append({'call_id': row.call_id, 'utterance_id': int(row.utterance_id), 'speaker': row.speaker, 'text': row.text, 'stime': row.stime})
                     
     return violations
+
+@timed('privacy.batch', items=lambda a, out: len(a[0]))
+def detect_privacy_violations_batch(df, window=VERIF_WINDOW, rules=None):
+    """detect_privacy_violations over a multi-call DataFrame or CallBatch in one go.
+
+    Sensitive/verification hits are computed as columns (one rule-engine scan per text); "no
+    verification in the prior `window` utterances of the same call" is a difference of
+    verification cumsums. Only
+    candidates with no per-utterance hit re-check the joined window text, which catches
+    phrases split across utterances exactly like the per-call version.
+    """
+    rules = (rules or default_privacy_rules()).only((SENSITIVE, VERIFICATION))
+    b = df if isinstance(df, CallBatch) else CallBatch.from_frame(df)
+    if not len(b): return []
+    
+    hit = rules.masks(b.texts())
+    sens = b.agent & hit[SENSITIVE]
+    
+    if not sens.any(): return []
+    
+    verif = hit[VERIFICATION]
+    cum = np.concatenate([[0], np.cumsum(verif)])
+    idx = np.arange(len(b))
+    codes = b.call_codes()
+    pos = idx - b.offsets[codes]  # index within the call
+    lo = idx - np.minimum(window, pos)
+    
+    hits = [i for i in np.flatnonzero(sens & (cum[idx] == cum[lo]))
+            if not (i-lo[i] > 1 and VERIFICATION in rules.categories(b.joined(lo[i], i)))]
+    
+    return [{'call_id': b.call_ids[codes[i]], 'utterance_id': int(b.utterance_id[i]), 'speaker': b.speakers[b.speaker[i]],
+             'text': b.text_at(i), 'stime': float(b.stime[i])} for i in hits]
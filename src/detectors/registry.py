@@ -0,0 +1,53 @@
+"""Process-wide model registry.
+
+get_model() unpickles a model once per process and hands the same object to every caller
+(every Streamlit rerun, every request). The file's mtime is checked on each call, so a
+retrained model is picked up without a restart. A `<name>.npz` is a table compiled by
+src.detectors.linear_scorer and loads as a LinearScorer; when both `<name>.pkl` and
+`<name>.npz` exist, the newer file wins, so a stale one never shadows a fresh one.
+"""
+import pickle, threading, time
+from src.detectors.ml_detector import MODEL_DIR
+
+_models = {}
+_lock = threading.Lock()
+
+def model_path(name):
+    found = [p for p in (MODEL_DIR / f"{name}.pkl", MODEL_DIR / f"{name}.npz") if p.exists()]
+    if not found: raise FileNotFoundError(MODEL_DIR / f"{name}.pkl")
+    return max(found, key=lambda p: p.stat().st_mtime_ns)
+
+def model_version(name='profanity_baseline'):
+    """(file name, mtime_ns) of the model get_model() would load; None if there is none.
+    Changes whenever the model is retrained, so it can key caches of model outputs."""
+    try: p = model_path(name)
+    except FileNotFoundError: return None
+    return (p.name, p.stat().st_mtime_ns)
+
+def _load(p):
+    if p.suffix == '.npz':
+        from src.detectors.linear_scorer import LinearScorer
+        return LinearScorer.load(p)
+    with p.open('rb') as f: return pickle.load(f)
+
+def get_model(name='profanity_baseline'):
+    p = model_path(name)
+    mtime = p.stat().st_mtime_ns
+    
+    with _lock:
+        entry = _models.get(name)
+        if entry and entry['path'] == p and entry['mtime'] == mtime: return entry['model']
+        
+        t = time.perf_counter()
+        model = _load(p)
+        _models[name] = {'path': p, 'mtime': mtime, 'model': model, 'load_seconds': time.perf_counter()-t,
+                         'loads': (entry['loads'] if entry else 0) + 1}
+        return model
+
+def stats():
+    """{name: {'path', 'load_seconds', 'loads'}} for every model loaded so far."""
+    with _lock:
+        return {n: {k: e[k] for k in ('path', 'load_seconds', 'loads')} for n, e in _models.items()}
+
+def clear():
+    with _lock: _models.clear()
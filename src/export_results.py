@@ -1,32 +1,201 @@
-import argparse, pandas as pd
-from src.data.parser import load_folder
-from src.detectors.regex_detectors import load_profanity_list, build_profanity_pattern, detect_privacy_violations
-from src.metrics.call_metrics import compute_silence_overtalk
-
-def run(folder='All_Conversations', out='results.csv'):
-    df = load_folder(folder)
-    prof = load_profanity_list(); pat = build_profanity_pattern(prof)
+import argparse, csv, hashlib, json, os, pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from src.data.callbatch import CallBatch
+from src.data.parser import list_folder, iter_files, call_id_for
+from src.detectors.regex_detectors import load_profanity_list, build_profanity_matcher, detect_privacy_violations, detect_privacy_violations_batch
+from src.metrics.call_metrics import compute_silence_overtalk, compute_call_metrics_batch
+from src.utils import instrument
+from src.utils.instrument import stage
+
+FLAG_COLS = ['call_id','utterance_id','speaker','role','text','issue']
+CALL_COLS = ['call_id','call_duration','overtalk_pct','silence_pct']
+
+_PAT = None  # per-worker profanity matcher
+
+def analyze_call(call_id, g, pat, pv=None, metrics=None):
+    """g is one call of a CallBatch (rows already in stime order)."""
+    flagged=[]
+    
+    with stage('profanity.match', items=len(g)):
+        for i, text in enumerate(g.texts()):
+            if pat.search(text):
+                flagged.append({'call_id':call_id,'utterance_id':int(g.utterance_id[i]),'speaker':g.speakers[g.speaker[i]],'role':'agent' if g.agent[i] else 'borrower','text':text,'issue':'profanity'})
+            
+    if pv is None: pv = detect_privacy_violations(g)
+    
+    for v in pv: flagged.append({'call_id':call_id,'utterance_id':v['utterance_id'],'speaker':v['speaker'],'role':'agent','text':v['text'],'issue':'privacy'})
+    
+    if metrics is None: metrics = compute_silence_overtalk(g)
+    call = {'call_id':call_id,'call_duration':metrics['call_duration'],'overtalk_pct':metrics['overtalk_pct'],'silence_pct':metrics['silence_pct']}
+    
+    return flagged, call
+
+def analyze_batch(b, pat):
+    """Per-call results for a CallBatch; privacy rules and metrics run once over the whole batch."""
+    pv = {}
+    for v in detect_privacy_violations_batch(b): pv.setdefault(v['call_id'], []).append(v)
+    metrics = compute_call_metrics_batch(b).set_index('call_id').to_dict('index')
+    
+    return [(call_id,)+analyze_call(call_id, b.call(c), pat, pv.get(call_id, []), metrics[call_id]) for c, call_id in enumerate(b.call_ids)]
+
+def analyze_frame(df, pat):
+    return analyze_batch(CallBatch.from_frame(df), pat)
+
+def _init_worker(words, metrics=False):
+    global _PAT
+    instrument.reset()  # a forked worker starts with a copy of the parent's stages
+    if metrics: instrument.enable()
+    _PAT = build_profanity_matcher(words)
+
+def _analyze_shard(paths):
+    """(results, stage stats recorded for this shard) for the parent to merge."""
+    res = analyze_batch(CallBatch.from_files(paths), _PAT)
+    return res, instrument.snapshot(clear=True)
+
+def _shards(paths, n):
+    size = max(1, -(-len(paths)//n))
+    return [paths[i:i+size] for i in range(0, len(paths), size)]
+
+def run(folder='All_Conversations', out='results.csv', workers=1, shards_per_worker=4, metrics_out='call_metrics.csv', quiet=False):
+    """workers=1 runs in-process; workers>1 shards call files over a process pool, 0 uses every core."""
+    prof = load_profanity_list()
     flagged=[]; calls=[]
     
-    for call_id, g in df.groupby('call_id'):
-        g = g.sort_values('stime')
+    if workers == 1:
+        b = CallBatch.from_folder(folder)
+        pat = build_profanity_matcher(prof)
+        for _, f, c in analyze_batch(b, pat):
+            flagged.extend(f); calls.append(c)
+    else:
+        workers = workers or os.cpu_count() or 1
+        shards = _shards(list_folder(folder), workers*shards_per_worker)
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(prof, instrument.enabled())) as ex:
+            for part, stats in ex.map(_analyze_shard, shards):
+                results += part; instrument.merge(stats)
+            
+        # same call_id order as the single-process groupby
+        for _, f, c in sorted(results, key=lambda r: r[0]):
+            flagged.extend(f); calls.append(c)
         
-        for _,r in g.iterrows():
-            role = 'agent' if 'agent' in str(r.speaker).lower() else 'borrower'
-            if pat.search(str(r.text).lower()):
-                flagged.append({'call_id':call_id,'utterance_id':int(r.utterance_id),'speaker':r.speaker,'role':role,'text':r.text,'issue':'profanity'})
-                
-        pv = detect_privacy_violations(g)
+    with stage('export.write', items=len(flagged)+len(calls)):
+        pd.DataFrame(flagged).to_csv(out,index=False)
+        pd.DataFrame(calls).to_csv(metrics_out,index=False)
+    
+    if not quiet: print("exported",out,"and",metrics_out)
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path,'rb') as f:
+        for b in iter(lambda: f.read(1<<20), b''): h.update(b)
+    return h.hexdigest()
+
+def load_manifest(path):
+    """Last record per file path wins; deleted files are dropped."""
+    seen = {}
+    if not os.path.exists(path): return seen
+    
+    with open(path,'r',encoding='utf-8') as f:
+        for ln in f:
+            try: rec = json.loads(ln)
+            except ValueError: continue  # torn line from an interrupted run
+            if rec.get('deleted'): seen.pop(rec['path'], None)
+            else: seen[rec['path']] = rec
+            
+    return seen
+
+def _repair_manifest(path):
+    """Cut a torn last line (no trailing newline) left by an interrupted run, so the next
+    record is appended on a line of its own instead of being glued onto it."""
+    with open(path,'rb+') as f:
+        size = f.seek(0, 2)
+        if not size: return
+        f.seek(size-1)
+        if f.read(1) == b'\n': return
         
-        for v in pv: flagged.append({'call_id':call_id,'utterance_id':v['utterance_id'],'speaker':v['speaker'],'role':'agent','text':v['text'],'issue':'privacy'})
+        pos = size
+        while pos > 0:
+            step = min(1<<16, pos); pos -= step
+            f.seek(pos); i = f.read(step).rfind(b'\n')
+            if i >= 0: f.truncate(pos+i+1); return
+        f.truncate(0)
+
+def _pending(paths, seen):
+    todo=[]; touched=[]
+    for p in paths:
+        st = os.stat(p); old = seen.get(p)
+        rec = {'path':p,'size':st.st_size,'mtime':st.st_mtime}
+        if old and old['size']==rec['size'] and old['mtime']==rec['mtime']: continue
         
-        metrics = compute_silence_overtalk(g)
-        calls.append({'call_id':call_id,'call_duration':metrics['call_duration'],'overtalk_pct':metrics['overtalk_pct'],'silence_pct':metrics['silence_pct']})
+        rec['sha256'] = _file_hash(p)
+        if old and old.get('sha256')==rec['sha256']: touched.append(rec)
+        else: todo.append(rec)
         
-    pd.DataFrame(flagged).to_csv(out,index=False)
-    pd.DataFrame(calls).to_csv('call_metrics.csv',index=False)
+    return todo, touched
+
+def _purge(path, call_ids):
+    """Drop rows for call_ids that are about to be re-written, chunk by chunk."""
+    if not call_ids or not os.path.exists(path) or os.path.getsize(path)==0: return
     
-    print("exported",out,"and call_metrics.csv")
+    tmp = path+'.tmp'; first = True
+    for chunk in pd.read_csv(path, chunksize=20000, dtype=str, keep_default_na=False):
+        chunk[~chunk['call_id'].isin(call_ids)].to_csv(tmp, index=False, mode='w' if first else 'a', header=first)
+        first = False
+        
+    os.replace(tmp, path)
+
+def _writer(fout, cols):
+    w = csv.DictWriter(fout, fieldnames=cols, lineterminator='\n')
+    if fout.tell()==0: w.writeheader()
+    return w
+
+def run_stream(folder='All_Conversations', out='results.csv', metrics_out='call_metrics.csv', manifest=None):
+    """Parse, analyze and append one call at a time. Files recorded in the manifest with an
+    unchanged size/mtime (or content hash) are skipped, so an interrupted run resumes where it stopped."""
+    manifest = manifest or out+'.manifest.jsonl'
+    fresh = not os.path.exists(manifest)
+    if not fresh: _repair_manifest(manifest)
+    seen = {} if fresh else load_manifest(manifest)
+    
+    paths = list_folder(folder)
+    todo, touched = _pending(paths, seen)
+    gone = set(seen) - set(paths)
+    
+    if fresh:
+        for fp in (out, metrics_out):
+            if os.path.exists(fp): os.remove(fp)
+    else:
+        stale = {call_id_for(r['path']) for r in todo} | {call_id_for(p) for p in gone}
+        _purge(out, stale); _purge(metrics_out, stale)
+        
+    pat = build_profanity_matcher(load_profanity_list())
+    recs = {r['path']:r for r in todo}; done = 0
+    
+    with open(out,'a',encoding='utf-8',newline='') as fo, open(metrics_out,'a',encoding='utf-8',newline='') as fm, open(manifest,'a',encoding='utf-8') as fman:
+        wf = _writer(fo, FLAG_COLS); wm = _writer(fm, CALL_COLS)
+        
+        for p in gone: fman.write(json.dumps({'path':p,'deleted':True})+'\n')
+        for rec in touched: fman.write(json.dumps(rec)+'\n')
+        
+        for p, d in iter_files(recs):
+            for _, f, c in analyze_frame(d, pat):
+                with stage('export.write', items=len(f)+1):
+                    wf.writerows(f); wm.writerow(c)
+                
+            fo.flush(); fm.flush()
+            fman.write(json.dumps(recs[p])+'\n'); fman.flush()
+            done += 1
+            
+    print("processed",done,"skipped",len(paths)-len(todo),"->",out,"and",metrics_out)
 
 if __name__=='__main__':
-    p=argparse.ArgumentParser(); p.add_argument('--folder',default='All_Conversations'); p.add_argument('--out',default='results.csv'); args=p.parse_args(); run(args.folder,args.out)
+    p=argparse.ArgumentParser(); p.add_argument('--folder',default='All_Conversations'); p.add_argument('--out',default='results.csv'); p.add_argument('--workers',type=int,default=1,help='process pool size (0 = all cores)'); p.add_argument('--stream',action='store_true',help='bounded-memory, resumable mode')
+    p.add_argument('--report',help='write a per-stage timing report (JSON) here'); p.add_argument('--prom',help='write Prometheus text metrics here'); args=p.parse_args()
+    if args.report or args.prom: instrument.enable()
+
+    with stage('export.total'):
+        if args.stream: run_stream(args.folder,args.out)
+        else: run(args.folder,args.out,args.workers)
+
+    if args.report: instrument.write_report(args.report); print("report ->",args.report)
+    if args.prom: instrument.write_prometheus(args.prom)
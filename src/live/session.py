@@ -0,0 +1,125 @@
+"""Incremental analysis of a call that is still in progress.
+
+    s = CallSession('call-42')
+    for utt in asr_stream:          # dicts with any key aliases parse_file accepts
+        for alert in s.add(utt): notify_supervisor(alert)
+    s.metrics()                     # same keys as compute_silence_overtalk
+
+Each add() costs a bounded amount of work regardless of call length:
+- profanity: one pass of the profanity matcher over the new text;
+- privacy: the agent-disclosure rule of detect_privacy_violations, with the last `window`
+  utterances kept in a deque as verification evidence (in arrival order);
+- metrics: an online sweep-line. Coverage of the timeline is a short list of (start, end,
+  level) segments; a new utterance only splits/raises the segments it overlaps, which are
+  at the tail unless ASR delivers it late. Segments older than `horizon` seconds behind the
+  latest end are dropped; a later utterance reaching back past that point is clipped there.
+
+    python -m src.live.session path/to/call.json --speed 10
+replays a transcript in (scaled) real time and prints alerts as they fire.
+"""
+import argparse, time
+from collections import deque
+from src.data.parser import _normalize_utt, _load, _find_utterances, call_id_for
+from src.detectors.privacy_rules import SENSITIVE, VERIFICATION, default_privacy_rules
+from src.detectors.regex_detectors import default_profanity_matcher, VERIF_WINDOW
+
+class CallSession:
+    def __init__(self, call_id='live', matcher=None, window=VERIF_WINDOW, horizon=300.0, rules=None):
+        self.call_id = call_id; self.window = window; self.horizon = horizon
+        self.matcher = matcher or default_profanity_matcher()
+        self.rules = (rules or default_privacy_rules()).only((SENSITIVE, VERIFICATION))
+        self.recent = deque(maxlen=window)  # texts of the last `window` utterances
+        self.segs = []                      # [start, end, level], contiguous, sorted
+        self.floor = None                   # nothing before this time is tracked any more
+        self.start = None; self.end = None
+        self.speaking = 0.0; self.overtalk = 0.0
+        self.n = 0; self.alerts = []
+
+    def add(self, utt):
+        """Ingest one utterance; returns the alerts it raised (also appended to self.alerts)."""
+        u = _normalize_utt(utt, self.n); self.n += 1
+        text = u['text']; speaker = u['speaker']
+        agent = 'agent' in str(speaker).lower()
+        base = {'call_id': self.call_id, 'utterance_id': u['utterance_id'], 'speaker': speaker,
+                'role': 'agent' if agent else 'borrower', 'text': text, 'stime': u['stime']}
+        out = []
+
+        hit = self.matcher.search(text)
+        if hit: out.append(dict(base, issue='profanity', term=hit[2]))
+
+        if agent and SENSITIVE in self.rules.categories(text) and VERIFICATION not in self.rules.categories(' '.join(self.recent)):
+            out.append(dict(base, issue='privacy'))
+        self.recent.append(text)
+
+        self._cover(u['stime'], u['etime'])
+        self.alerts += out
+        return out
+
+    def _cover(self, s, e):
+        self.start = s if self.start is None else min(self.start, s)
+        self.end = e if self.end is None else max(self.end, e)
+        if self.floor is not None and s < self.floor: s = self.floor
+        if e <= s: return
+
+        segs = self.segs
+        if not segs: segs.append([s, s, 0])
+        if s < segs[0][0]: segs.insert(0, [s, segs[0][0], 0])
+        if e > segs[-1][1]: segs.append([segs[-1][1], e, 0])
+
+        i = len(segs)-1
+        while segs[i][0] >= e: i -= 1
+        if segs[i][1] > e:  # split so segs[i] ends at e
+            segs.insert(i+1, [e, segs[i][1], segs[i][2]]); segs[i][1] = e
+        while i >= 0 and segs[i][1] > s:
+            seg = segs[i]
+            if seg[0] < s:  # split so the raised part starts at s
+                segs.insert(i, [seg[0], s, seg[2]]); seg[0] = s; i += 1
+            d = seg[1]-seg[0]
+            if seg[2] == 0: self.speaking += d
+            elif seg[2] == 1: self.overtalk += d
+            seg[2] += 1; i -= 1
+
+        self._compact(max(i, 0))
+
+    def _compact(self, lo):
+        """Merge equal-level neighbours from index lo on and drop segments past the horizon."""
+        segs = self.segs; out = []
+        for seg in segs[lo:]:
+            if seg[1] <= seg[0]: continue
+            if out and out[-1][2] == seg[2]: out[-1][1] = seg[1]
+            elif lo and not out and segs[lo-1][2] == seg[2]: segs[lo-1][1] = seg[1]
+            else: out.append(seg)
+        segs[lo:] = out
+
+        cut = segs[-1][1] - self.horizon
+        if segs[0][1] < cut:
+            k = next(j for j, seg in enumerate(segs) if seg[1] >= cut)
+            del segs[:k]; self.floor = segs[0][0]
+
+    def metrics(self):
+        if self.start is None:
+            return {'call_duration':0.0,'overtalk_seconds':0.0,'silence_seconds':0.0,'overtalk_pct':0.0,'silence_pct':0.0}
+        dur = max(1e-9, self.end-self.start)
+        silence = max(0.0, dur-self.speaking)
+        return {'call_duration':dur,'overtalk_seconds':self.overtalk,'silence_seconds':silence,
+                'overtalk_pct':100.0*self.overtalk/dur,'silence_pct':100.0*silence/dur}
+
+def replay(path, speed=0.0):
+    """Feed a finished transcript to a CallSession in end-time order (when ASR would emit each
+    utterance), sleeping between utterances at `speed`x real time (0 = no sleeping)."""
+    utts = _find_utterances(_load(path))
+    s = CallSession(call_id_for(path))
+    norm = sorted(((_normalize_utt(u, i)['etime'], i, u) for i, u in enumerate(utts)), key=lambda x: x[:2])
+    last = None; worst = 0.0
+    for t, _, u in norm:
+        if speed and last is not None: time.sleep(max(0.0, t-last)/speed)
+        last = t
+        t0 = time.perf_counter()
+        for a in s.add(u): print(f"[{a['stime']:8.2f}s] {a['issue']:9} {a['speaker']}: {a['text']}")
+        worst = max(worst, time.perf_counter()-t0)
+    return s, worst
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('path'); p.add_argument('--speed',type=float,default=0.0,help='replay speed-up, 0 = as fast as possible'); args=p.parse_args()
+    s, worst = replay(args.path, args.speed)
+    print(s.metrics()); print(f"{s.n} utterances, {len(s.alerts)} alerts, slowest add() {worst*1000:.2f} ms")
@@ -1,5 +1,11 @@
+import numpy as np, pandas as pd
+from src.data.callbatch import CallBatch
+from src.utils.instrument import timed
+
+@timed('metrics.per_call', items=lambda a, out: len(a[0]))
 def compute_silence_overtalk(df_call):
-    intervals=[(float(r.stime), float(r.etime)) for _,r in df_call.iterrows()]
+    if isinstance(df_call, CallBatch): intervals=list(zip(df_call.stime.astype(float).tolist(), df_call.etime.astype(float).tolist()))
+    else: intervals=[(float(r.stime), float(r.etime)) for _,r in df_call.iterrows()]
     
     if not intervals: 
         return {'call_duration':0.0,'overtalk_seconds':0.0,'silence_seconds':0.0,'overtalk_pct':0.0,'silence_pct':0.0}
@@ -22,3 +28,67 @@ def compute_silence_overtalk(df_call):
     silence=max(0.0,dur-speaking)
     
     return {'call_duration':dur,'overtalk_seconds':overtalk,'silence_seconds':silence,'overtalk_pct':100.0*overtalk/dur,'silence_pct':100.0*silence/dur}
+
+BATCH_COLS = ['call_id','call_duration','overtalk_seconds','silence_seconds','overtalk_pct','silence_pct',
+              'agent_talk_seconds','borrower_talk_seconds','speaker_talk_seconds','longest_silence_seconds']
+
+@timed('metrics.batch', items=lambda a, out: len(a[0]))
+def compute_call_metrics_batch(df):
+    """compute_silence_overtalk for every call of a multi-call frame (or CallBatch) in one vectorized sweep.
+
+    Start/end events of all calls are lexsorted on (key, time, delta); the level before each
+    event is a cumsum of +1/-1 deltas and per-key totals are bincount reductions. The same
+    sweep runs over (call, role) and (call, speaker) keys to give talk time (union of the
+    utterances) per role, agent/borrower as in export_results, and per speaker label as
+    speaker_talk_seconds = {speaker: seconds}.
+    """
+    if isinstance(df, CallBatch):
+        if not len(df): return pd.DataFrame(columns=BATCH_COLS)
+        codes, calls = df.call_codes(), df.call_ids
+        s = np.asarray(df.stime, dtype=float); e = np.asarray(df.etime, dtype=float); borrower = ~df.agent
+        spk, names = np.asarray(df.speaker, dtype=np.int64), df.speakers
+    else:
+        if df.empty: return pd.DataFrame(columns=BATCH_COLS)
+        codes, calls = pd.factorize(df['call_id'], sort=True)
+        s = df['stime'].to_numpy(dtype=float); e = df['etime'].to_numpy(dtype=float)
+        borrower = ~df['speaker'].astype(str).str.lower().str.contains('agent', regex=False).to_numpy()
+        spk, names = pd.factorize(df['speaker'].astype(str))
+    
+    n = len(calls)
+    
+    pairs, pair_code = np.unique(codes.astype(np.int64)*max(1, len(names)) + spk, return_inverse=True)
+    role_key = n + 2*codes + borrower
+    spk_key = 3*n + pair_code
+    key = np.concatenate([codes, codes, role_key, role_key, spk_key, spk_key])
+    t = np.concatenate([s, e, s, e, s, e])
+    ones = np.ones(len(s), dtype=np.int64)
+    delta = np.concatenate([ones, -ones, ones, -ones, ones, -ones])
+    
+    order = np.lexsort((delta, t, key))
+    key, t, delta = key[order], t[order], delta[order]
+    level = np.cumsum(delta) - delta  # every key's deltas sum to 0, so this is the per-key level
+    d = np.zeros(len(t))
+    same = key[1:] == key[:-1]
+    d[1:][same] = (t[1:] - t[:-1])[same]
+    
+    speaking = np.bincount(key, weights=d*(level>0), minlength=3*n+len(pairs))
+    overtalk = np.bincount(key, weights=d*(level>1), minlength=3*n)[:n]
+    
+    gap = np.zeros(n)
+    quiet = (key < n) & (level == 0)
+    np.maximum.at(gap, key[quiet], d[quiet])
+    
+    start = np.full(n, np.inf); end = np.full(n, -np.inf)
+    np.minimum.at(start, codes, s); np.maximum.at(end, codes, e)
+    dur = np.maximum(1e-9, end-start)
+    silence = np.maximum(0.0, dur-speaking[:n])
+    
+    by_speaker = [{} for _ in range(n)]
+    for c, sp, v in zip((pairs // max(1, len(names))).tolist(), names[pairs % max(1, len(names))], speaking[3*n:].tolist()):
+        by_speaker[c][sp] = v
+    
+    return pd.DataFrame({'call_id': calls, 'call_duration': dur, 'overtalk_seconds': overtalk, 'silence_seconds': silence,
+                         'overtalk_pct': 100.0*overtalk/dur, 'silence_pct': 100.0*silence/dur,
+                         'agent_talk_seconds': speaking[n:3*n:2], 'borrower_talk_seconds': speaking[n+1:3*n:2],
+                         'speaker_talk_seconds': by_speaker,
+                         'longest_silence_seconds': gap}, columns=BATCH_COLS)
@@ -0,0 +1,276 @@
+"""Offline evaluation of the detectors on the labelled seed set.
+
+    python -m src.metrics.evaluate --detectors pattern ml --workers 4
+    python -m src.metrics.evaluate --detectors llm --llm-budget 200
+
+Predictions are stored per (detector, version, text) in models/eval_preds.sqlite, so a rerun
+only computes what changed: retraining the model recomputes `ml`, editing the profanity list
+recomputes `pattern`, new seed rows are scored by every detector, and nothing else is redone.
+Pattern and ML predictions are computed in parallel shards over a process pool.
+
+The LLM is run on a stratified sample of at most --llm-budget rows (positives are
+oversampled); its metrics are weighted back to the full label distribution.
+
+Accuracy, precision, recall and F1 get bootstrap confidence intervals: B multinomial
+resampling weight vectors are drawn at once and every metric is a matrix-vector product.
+The report (models/eval_report.json) is what the app's Comparative Analysis shows.
+"""
+import argparse, hashlib, json, os, sqlite3, time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.detectors.ml_detector import MODEL_DIR
+from src.detectors.regex_detectors import load_profanity_list, build_profanity_matcher
+
+PREDS_PATH = MODEL_DIR / 'eval_preds.sqlite'
+REPORT_PATH = MODEL_DIR / 'eval_report.json'
+METRICS = ['accuracy', 'precision', 'recall', 'f1']
+LABELS = {'pattern': 'Pattern Matching', 'ml': 'ML Baseline', 'llm': 'LLM Prompt System'}
+MODEL_NAME = 'profanity_baseline'
+
+class LabelColumnMissing(ValueError):
+    """The dataset has no 'label' column to score against."""
+
+def default_dataset():
+    return 'dataset_seed.parquet' if os.path.isdir('dataset_seed.parquet') else 'dataset_seed.csv'
+
+def dataset_fingerprint(path):
+    """size + mtime of a CSV file, or of every part file under a Parquet dataset directory."""
+    if not os.path.isdir(path):
+        st = os.stat(path); return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+    files = sorted(os.path.join(d, fn) for d, _, fns in os.walk(path) for fn in fns)
+    return [os.path.abspath(path)] + [[os.path.relpath(f, path), os.stat(f).st_size, os.stat(f).st_mtime_ns] for f in files]
+
+# --- detectors: version() changes whenever predict() would give different answers
+
+def _sha1(s): return hashlib.sha1(s.encode('utf-8')).hexdigest()[:16]
+
+def _pattern_version():
+    return 'aho-' + _sha1('\n'.join(load_profanity_list()))
+
+def _ml_version():
+    from src.detectors.registry import model_version
+    mv = model_version(MODEL_NAME)
+    if mv is None: raise FileNotFoundError(f"no model {MODEL_NAME} in {MODEL_DIR}")
+    return f"{mv[0]}-{mv[1]}"
+
+def _llm_version():
+    from src.detectors.llm_detector import PROMPT_VERSION, default_backend_name
+    return f"{PROMPT_VERSION}-{default_backend_name()}"
+
+def _pattern_predict(texts):
+    m = build_profanity_matcher(load_profanity_list())
+    return [int(m.search(t) is not None) for t in texts], [None]*len(texts)
+
+def _ml_predict(texts):
+    from src.detectors.registry import get_model
+    from src.detectors.ml_detector import predict_texts
+    preds, probs = predict_texts(texts, get_model(MODEL_NAME))
+    return [int(p) for p in preds], [None]*len(texts) if probs is None else [float(p) for p in probs]
+
+def _llm_predict(texts, **kwargs):
+    from src.detectors.llm_detector import classify_texts_with_llm
+    return [r[0] for r in classify_texts_with_llm(texts, entity='profanity', **kwargs)], [None]*len(texts)
+
+DETECTORS = {'pattern': (_pattern_version, _pattern_predict, True),   # name: (version, predict, shardable)
+             'ml': (_ml_version, _ml_predict, True),
+             'llm': (_llm_version, _llm_predict, False)}
+
+# --- prediction store
+
+class PredictionStore:
+    def __init__(self, path=PREDS_PATH):
+        self.db = sqlite3.connect(str(path))
+        self.db.execute("CREATE TABLE IF NOT EXISTS preds (detector TEXT, version TEXT, key TEXT, pred INTEGER, prob REAL, "
+                        "created REAL, PRIMARY KEY (detector, version, key))")
+
+    def get_many(self, detector, version, keys):
+        out = {}; keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i+500]
+            q = f"SELECT key, pred, prob FROM preds WHERE detector=? AND version=? AND key IN ({','.join('?'*len(chunk))})"
+            out.update((k, (p, pr)) for k, p, pr in self.db.execute(q, [detector, version, *chunk]))
+        return out
+
+    def put_many(self, detector, version, rows):
+        now = time.time()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO preds VALUES (?,?,?,?,?,?)",
+                                [(detector, version, k, p, pr, now) for k, p, pr in rows])
+
+    def close(self): self.db.close()
+
+# --- metrics
+
+def _weighted_counts(W, y, p):
+    """tp, fp, fn, tn for each row of the weight matrix W (B x n); y, p are 0/1 floats."""
+    return W @ (y*p), W @ ((1-y)*p), W @ (y*(1-p)), W @ ((1-y)*(1-p))
+
+def _scores(tp, fp, fn, tn):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        acc = (tp+tn)/(tp+fp+fn+tn)
+        prec = np.where(tp+fp > 0, tp/(tp+fp), 0.0)
+        rec = np.where(tp+fn > 0, tp/(tp+fn), 0.0)
+        f1 = np.where(prec+rec > 0, 2*prec*rec/(prec+rec), 0.0)
+    return {'accuracy': acc, 'precision': prec, 'recall': rec, 'f1': f1}
+
+def bootstrap_metrics(y, pred, weights=None, n_boot=1000, alpha=0.05, seed=0, chunk=250):
+    """{metric: {'value', 'lo', 'hi'}} with percentile bootstrap CIs; `weights` reweights rows
+    (e.g. inverse sampling rates of a stratified sample)."""
+    y = (np.asarray(y) == 1).astype(float); p = (np.asarray(pred) == 1).astype(float); n = len(y)
+    w = np.ones(n) if weights is None else np.asarray(weights, dtype=float)
+    if n == 0: return {m: {'value': None, 'lo': None, 'hi': None} for m in METRICS}
+
+    point = _scores(*_weighted_counts(w[None, :], y, p))
+    rng = np.random.default_rng(seed); boot = {m: [] for m in METRICS}
+    for b in range(0, n_boot, chunk):
+        W = rng.multinomial(n, np.full(n, 1.0/n), size=min(chunk, n_boot-b)) * w
+        for m, v in _scores(*_weighted_counts(W, y, p)).items(): boot[m].append(v)
+
+    out = {}
+    for m in METRICS:
+        v = np.concatenate(boot[m])
+        out[m] = {'value': float(point[m][0]), 'lo': float(np.quantile(v, alpha/2)), 'hi': float(np.quantile(v, 1-alpha/2))}
+    return out
+
+def stratified_sample(y, budget, seed=0):
+    """(row indices, weights): up to `budget` rows split evenly across label values (capped at
+    what each class has), each row weighted by class size / rows sampled from that class."""
+    y = np.asarray(y); n = len(y)
+    if budget >= n: return np.arange(n), np.ones(n)
+
+    rng = np.random.default_rng(seed)
+    classes, counts = np.unique(y, return_counts=True)
+    quota = np.zeros(len(classes), dtype=int); left = budget
+    for k, ci in enumerate(np.argsort(counts)):  # smallest class first; leftovers go to the larger ones
+        quota[ci] = min(counts[ci], left // (len(classes) - k))
+        left -= quota[ci]
+
+    idx = []; w = []
+    for c, cnt, q in zip(classes, counts, quota):
+        rows = rng.choice(np.flatnonzero(y == c), size=q, replace=False)
+        idx.append(rows); w.append(np.full(q, cnt/q if q else 0.0))
+    idx = np.concatenate(idx); w = np.concatenate(w); order = np.argsort(idx)
+    return idx[order], w[order]
+
+# --- harness
+
+def _predict_shard(args):
+    name, texts = args
+    return DETECTORS[name][1](texts)
+
+def _compute(name, texts, workers, shard_size, **llm_kwargs):
+    _, predict, shardable = DETECTORS[name]
+    if not shardable: return predict(texts, **llm_kwargs)
+    if workers == 1 or len(texts) <= shard_size: return predict(texts)
+
+    shards = [(name, texts[i:i+shard_size]) for i in range(0, len(texts), shard_size)]
+    preds, probs = [], []
+    with ProcessPoolExecutor(max_workers=workers or None) as ex:
+        for p, pr in ex.map(_predict_shard, shards): preds += p; probs += pr
+    return preds, probs
+
+def evaluate_detector(name, texts, y, keys, store, workers=1, shard_size=2000, llm_budget=200, seed=0, n_boot=1000, **llm_kwargs):
+    t0 = time.perf_counter()
+    version = DETECTORS[name][0]()
+
+    if name == 'llm': rows, weights = stratified_sample(y, llm_budget, seed)
+    else: rows, weights = np.arange(len(texts)), None
+
+    known = store.get_many(name, version, {keys[i] for i in rows})
+    todo = {}
+    for i in rows:
+        if keys[i] not in known and keys[i] not in todo: todo[keys[i]] = texts[i]
+
+    if todo:
+        preds, probs = _compute(name, list(todo.values()), workers, shard_size, **llm_kwargs)
+        fresh = [(k, p, pr) for k, p, pr in zip(todo, preds, probs) if p is not None]  # failed LLM items are retried next run
+        store.put_many(name, version, fresh)
+        known.update((k, (p, pr)) for k, p, pr in fresh)
+
+    ok = np.array([keys[i] in known for i in rows], dtype=bool)
+    pred = np.array([known[keys[i]][0] if o else 0 for i, o in zip(rows, ok)], dtype=int)
+    w = None if weights is None else weights[ok]
+    res = {'version': version, 'rows': int(ok.sum()), 'failed': int((~ok).sum()), 'computed': len(todo),
+           'sampled': name == 'llm' and len(rows) < len(texts),
+           'metrics': bootstrap_metrics(y[rows][ok], pred[ok], w, n_boot, seed=seed)}
+    res['seconds'] = time.perf_counter()-t0
+    return res
+
+def run(dataset=None, detectors=('pattern', 'ml'), workers=1, llm_budget=200, seed=0, n_boot=1000,
+        report_path=REPORT_PATH, preds_path=PREDS_PATH, **llm_kwargs):
+    """Evaluate `detectors` and merge them into the report at report_path (entries of other
+    detectors are kept as long as the dataset is unchanged). A detector that scored no rows
+    (e.g. every LLM call failed) gets no entry. Returns the report; raises LabelColumnMissing
+    when the dataset has no 'label' column."""
+    from src.data.columnar import load_table, table_columns
+    dataset = dataset or default_dataset()
+    if 'label' not in table_columns(dataset): raise LabelColumnMissing(f"{dataset} has no 'label' column")
+    df = load_table(dataset, columns=['text', 'label'])
+    texts = df['text'].fillna('').astype(str).tolist(); y = df['label'].to_numpy(dtype=int)
+    keys = [_sha1(t) for t in texts]
+    fp = dataset_fingerprint(dataset)
+
+    report = load_report(report_path) or {}
+    if report.get('dataset') != fp: report = {'dataset': fp, 'detectors': {}}
+    report.update(rows=len(df), positives=int(y.sum()), n_boot=n_boot)
+
+    store = PredictionStore(preds_path)
+    try:
+        for name in detectors:
+            r = evaluate_detector(name, texts, y, keys, store, workers, llm_budget=llm_budget, seed=seed, n_boot=n_boot, **llm_kwargs)
+            report['detectors'].pop(name, None)
+            if r['rows']: report['detectors'][name] = dict(r, built=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    finally:
+        store.close()
+
+    tmp = f"{report_path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f: json.dump(report, f, indent=1)
+    os.replace(tmp, report_path)
+    return report
+
+def load_report(path=REPORT_PATH):
+    if not os.path.exists(path): return None
+    with open(path, encoding='utf-8') as f: return json.load(f)
+
+def versions(detectors=('pattern', 'ml')):
+    """{name: current version}, None for a detector that cannot run (e.g. no trained model)."""
+    out = {}
+    for name in detectors:
+        try: out[name] = DETECTORS[name][0]()
+        except FileNotFoundError: out[name] = None
+    return out
+
+def is_current(report, dataset, detectors=('pattern', 'ml')):
+    """True if `report` covers the runnable `detectors` at their current versions on this dataset."""
+    if not report or report.get('dataset') != dataset_fingerprint(dataset): return False
+    return all(report['detectors'].get(n, {}).get('version') == v for n, v in versions(detectors).items() if v)
+
+def scored(report):
+    """{name: entry} for the detectors in `report` that have metrics (reports written before
+    run() dropped empty entries can hold all-None metrics)."""
+    return {n: r for n, r in report['detectors'].items() if r['rows'] and r['metrics']['f1']['value'] is not None}
+
+def table(report):
+    """One row per scored detector: Approach, n, then each metric with its CI bounds."""
+    rows = []
+    for name, r in scored(report).items():
+        row = {'Approach': LABELS.get(name, name), 'n': r['rows']}
+        for m in METRICS:
+            v = r['metrics'][m]
+            row[m.capitalize()] = v['value']; row[f"{m.capitalize()} CI"] = None if v['lo'] is None else f"[{v['lo']:.3f}, {v['hi']:.3f}]"
+        rows.append(row)
+    return rows
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--dataset',default=None); p.add_argument('--detectors',nargs='+',default=['pattern','ml'],choices=list(DETECTORS))
+    p.add_argument('--workers',type=int,default=1,help='process pool size for pattern/ml (0 = all cores)'); p.add_argument('--llm-budget',type=int,default=200)
+    p.add_argument('--bootstrap',type=int,default=1000); p.add_argument('--seed',type=int,default=0); p.add_argument('--out',default=str(REPORT_PATH)); args=p.parse_args()
+
+    import pandas as pd
+    report = run(args.dataset, args.detectors, args.workers, args.llm_budget, args.seed, args.bootstrap, args.out)
+    for name in args.detectors:
+        r = report['detectors'].get(name)
+        if r is None: print(f"{name}: no rows scored, not reported"); continue
+        print(f"{name}: version {r['version']}, {r['rows']} rows ({r['computed']} computed, {r['failed']} failed), {r['seconds']:.2f}s")
+    print(pd.DataFrame(table(report)).to_string(index=False))
+    print("report ->",args.out)
@@ -0,0 +1,360 @@
+"""On-disk inverted index over utterances for ad hoc compliance search.
+
+    python -m src.search.index add --folder All_Conversations          # or --table utterances_all.csv
+    python -m src.search.index query '"routing number" AND NOT verify' --role agent
+    python -m src.search.index before '"routing number"' verify --within 3
+    python -m src.search.index without-prior '"routing number"' verify --role agent
+
+The index is one SQLite file (default corpus.idx). A call's utterances get consecutive doc
+ids in stime order, so "within N utterances" is a doc-id distance and the call of a doc is
+a searchsorted over call start ids. Each add() writes one segment: per term, a row with the
+packed (doc, position) postings of that batch. A query reads a term's few segment rows and
+works on numpy arrays from there, so lookups cost a handful of SQLite reads regardless of
+corpus size. `role:agent`, `role:borrower` and `speaker:<name>` are indexed as terms too.
+
+Re-adding a call that is already indexed replaces it (its old docs are dropped from the
+calls table and filtered out of postings); optimize() merges segments and purges them.
+
+Query syntax: words, "quoted phrases", role:/speaker: terms, AND / OR / NOT and parentheses;
+juxtaposition is AND.
+"""
+import argparse, os, re, sqlite3, time
+from collections import defaultdict
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+INDEX_PATH = 'corpus.idx'
+DOC_COLS = ['doc', 'call_id', 'utterance_id', 'speaker', 'role', 'stime', 'etime', 'text']
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+def role_of(speaker):
+    return 'agent' if 'agent' in str(speaker).lower() else 'borrower'
+
+# set operations on sorted arrays; postings come out of the index sorted, so these avoid the
+# re-sorting np.unique/np.intersect1d would do
+
+def _dedup(a):
+    return a[np.concatenate([[True], a[1:] != a[:-1]])] if len(a) else a
+
+def _member(a, b):
+    """Mask of the elements of a that occur in b (both sorted)."""
+    if not len(b): return np.zeros(len(a), dtype=bool)
+    i = np.minimum(np.searchsorted(b, a), len(b)-1)
+    return b[i] == a
+
+def _and(a, b): return a[_member(a, b)]
+def _minus(a, b): return a[~_member(a, b)]
+def _or(a, b): return _dedup(np.sort(np.concatenate([a, b]), kind='stable'))
+
+class Index:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE);
+            CREATE TABLE IF NOT EXISTS calls (call_id TEXT PRIMARY KEY, first_doc INTEGER, n_docs INTEGER);
+            CREATE TABLE IF NOT EXISTS docs (doc INTEGER PRIMARY KEY, call_id TEXT, utterance_id INTEGER, speaker TEXT,
+                                             role TEXT, stime REAL, etime REAL, text TEXT);
+            CREATE TABLE IF NOT EXISTS postings (term INTEGER, seg INTEGER, docs BLOB, pos BLOB, PRIMARY KEY (term, seg)) WITHOUT ROWID;
+        """)
+        self._terms = dict(self.db.execute("SELECT term, id FROM terms"))
+        self._calls = None
+
+    def close(self): self.db.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *_): self.close()
+
+    # --- building
+
+    def add_frame(self, df: pd.DataFrame) -> int:
+        """Index every call of a parser-shaped frame (call_id, utterance_id, speaker, text, stime,
+        etime) as one segment; returns the number of utterances added."""
+        if df.empty: return 0
+        seg = next_doc = (self.db.execute("SELECT MAX(doc) FROM docs").fetchone()[0] or -1) + 1
+        post = defaultdict(lambda: ([], []))
+        docs = []; calls = []
+
+        d = df.sort_values(['call_id', 'stime'], kind='stable')
+        for call_id, g in d.groupby('call_id', sort=False):
+            calls.append((str(call_id), next_doc, len(g)))
+            for u, sp, tx, st, et in zip(g.utterance_id, g.speaker, g.text, g.stime, g.etime):
+                doc = next_doc; next_doc += 1
+                role = role_of(sp)
+                docs.append((doc, str(call_id), int(u), str(sp), role, float(st), float(et), '' if tx is None else str(tx)))
+                for p, t in enumerate(tokenize(tx)):
+                    l = post[t]; l[0].append(doc); l[1].append(p)
+                for t in (f"role:{role}", f"speaker:{str(sp).lower()}"):
+                    l = post[t]; l[0].append(doc); l[1].append(0)
+
+        with self.db:
+            for call_id, _, _ in calls: self.db.execute("DELETE FROM calls WHERE call_id=?", (call_id,))
+            self.db.executemany("INSERT INTO docs VALUES (?,?,?,?,?,?,?,?)", docs)
+            self.db.executemany("INSERT INTO calls VALUES (?,?,?)", calls)
+            self.db.executemany("INSERT INTO postings VALUES (?,?,?,?)",
+                                [(self._term_id(t), seg, np.array(ds, np.int64).tobytes(), np.array(ps, np.int32).tobytes())
+                                 for t, (ds, ps) in post.items()])
+        self._calls = None
+        return len(docs)
+
+    def add_files(self, paths: Iterable[str], skip_indexed=True, batch_calls=1000) -> int:
+        """Parse and index transcript files, `batch_calls` calls per segment; files whose call_id
+        is already indexed are skipped unless skip_indexed=False."""
+        from src.data.parser import iter_files, call_id_for
+        paths = list(paths)
+        if skip_indexed:
+            have = self.call_ids()
+            paths = [p for p in paths if call_id_for(p) not in have]
+
+        n = 0
+        for i in range(0, len(paths), batch_calls):
+            frames = [d for _, d in iter_files(paths[i:i+batch_calls]) if not d.empty]
+            if frames: n += self.add_frame(pd.concat(frames, ignore_index=True))
+        return n
+
+    def _term_id(self, term):
+        tid = self._terms.get(term)
+        if tid is None:
+            tid = self._terms[term] = self.db.execute("INSERT INTO terms (term) VALUES (?)", (term,)).lastrowid
+        return tid
+
+    def optimize(self):
+        """Merge every term's segments into one and drop postings/docs of replaced calls."""
+        starts, ends = self._call_ranges()
+        live_docs = lambda docs: self._live(docs, starts, ends)
+        with self.db:
+            for term, tid in self._terms.items():
+                docs, pos = self._read(tid)
+                keep = live_docs(docs)
+                self.db.execute("DELETE FROM postings WHERE term=?", (tid,))
+                if keep.any():
+                    self.db.execute("INSERT INTO postings VALUES (?,?,?,?)", (tid, 0, docs[keep].tobytes(), pos[keep].astype(np.int32).tobytes()))
+            self.db.execute("DELETE FROM docs WHERE NOT EXISTS (SELECT 1 FROM calls c WHERE docs.doc >= c.first_doc AND docs.doc < c.first_doc + c.n_docs)")
+        self.db.execute("VACUUM")
+
+    def call_ids(self):
+        return {r[0] for r in self.db.execute("SELECT call_id FROM calls")}
+
+    def stats(self):
+        q = lambda sql: self.db.execute(sql).fetchone()[0]
+        return {'calls': q("SELECT COUNT(*) FROM calls"), 'utterances': q("SELECT COALESCE(SUM(n_docs), 0) FROM calls"),
+                'terms': len(self._terms), 'segments': q("SELECT COUNT(DISTINCT seg) FROM postings"),
+                'bytes': sum(os.path.getsize(p) for p in (self.path, self.path+'-wal') if os.path.exists(p))}
+
+    # --- postings
+
+    def _call_ranges(self):
+        if self._calls is None:
+            a = np.array(self.db.execute("SELECT first_doc, n_docs FROM calls ORDER BY first_doc").fetchall(), dtype=np.int64).reshape(-1, 2)
+            self._calls = (a[:, 0], a[:, 0] + a[:, 1])
+            # no replaced calls and no gaps: every indexed doc is live and postings need no filtering
+            self._all_live = bool(len(a) == 0 or (a[0, 0] == 0 and (self._calls[0][1:] == self._calls[1][:-1]).all()))
+        return self._calls
+
+    def _live(self, docs, starts=None, ends=None):
+        if starts is None: starts, ends = self._call_ranges()
+        if not len(starts): return np.zeros(len(docs), dtype=bool)
+        c = np.searchsorted(starts, docs, side='right') - 1
+        return (c >= 0) & (docs < ends[np.maximum(c, 0)])
+
+    def _read(self, tid):
+        rows = self.db.execute("SELECT docs, pos FROM postings WHERE term=? ORDER BY seg", (tid,)).fetchall()
+        if not rows: return np.empty(0, np.int64), np.empty(0, np.int64)
+        return (np.concatenate([np.frombuffer(r[0], np.int64) for r in rows]),
+                np.concatenate([np.frombuffer(r[1], np.int32) for r in rows]).astype(np.int64))
+
+    def postings(self, term):
+        """(docs, positions) of one term over live calls, sorted by doc then position."""
+        tid = self._terms.get(term.lower())
+        if tid is None: return np.empty(0, np.int64), np.empty(0, np.int64)
+        docs, pos = self._read(tid)
+        self._call_ranges()
+        if self._all_live: return docs, pos
+        keep = self._live(docs)
+        return docs[keep], pos[keep]
+
+    def term_docs(self, term):
+        return _dedup(self.postings(term)[0])
+
+    def phrase(self, text):
+        """Docs containing the tokens of `text` at consecutive positions."""
+        toks = tokenize(text)
+        if not toks: return np.empty(0, np.int64)
+        docs, pos = self.postings(toks[0])
+        keys = docs << 20 | pos  # sorted; positions within an utterance stay far below 2**20
+        for k, t in enumerate(toks[1:], 1):
+            d, p = self.postings(t)
+            keys = _and(keys, (d << 20 | p) - k)
+        return _dedup(keys >> 20)
+
+    def all_docs(self):
+        starts, ends = self._call_ranges()
+        docs = np.arange(ends.max() if len(ends) else 0)
+        return docs[self._live(docs)]
+
+    def call_of(self, docs):
+        """Position of each doc's call in call-start order."""
+        return np.searchsorted(self._call_ranges()[0], docs, side='right') - 1
+
+    # --- queries
+
+    def search(self, query: str, speaker=None, role=None, call_ids=None) -> np.ndarray:
+        """Sorted doc ids matching a boolean query, optionally restricted to speakers whose name
+        contains `speaker`, a role ('agent'/'borrower') or some calls."""
+        docs = _Parser(self, query).parse()
+        if role is not None: docs = _and(docs, self.term_docs(f"role:{role}"))
+        if speaker is not None:
+            names = [t for t in self._terms if t.startswith('speaker:') and speaker.lower() in t[8:]]
+            hits = np.empty(0, np.int64)
+            for t in names: hits = _or(hits, self.term_docs(t))
+            docs = _and(docs, hits)
+        if call_ids is not None:
+            ids = list(call_ids)
+            rng = self.db.execute(f"SELECT first_doc, n_docs FROM calls WHERE call_id IN ({','.join('?'*len(ids))})", ids).fetchall()
+            starts = np.array(sorted(r[0] for r in rng), dtype=np.int64); ends = starts + np.array([n for _, n in sorted(rng)], dtype=np.int64)
+            docs = docs[self._live(docs, starts, ends)]
+        return docs
+
+    def before(self, a: str, b: str, within: int = 1, role_a=None, role_b=None) -> pd.DataFrame:
+        """Pairs (doc_a, doc_b) where query b matches 1..within utterances after query a in the same call."""
+        da = self.search(a, role=role_a); db = self.search(b, role=role_b)
+        lo = np.searchsorted(db, da, side='right'); hi = np.searchsorted(db, da+within, side='right')
+        cnt = hi - lo
+        doc_a = np.repeat(da, cnt)
+        doc_b = db[np.repeat(lo, cnt) + np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt)-cnt, cnt)]
+        same = self.call_of(doc_a) == self.call_of(doc_b)
+        return pd.DataFrame({'doc_a': doc_a[same], 'doc_b': doc_b[same]})
+
+    def without_prior(self, a: str, b: str, within: Optional[int] = None, role_a=None, role_b=None) -> np.ndarray:
+        """Docs matching a with no b match in the preceding `within` utterances of the same call
+        (None = anywhere earlier in the call), e.g. an account detail disclosed before any
+        verification."""
+        da = self.search(a, role=role_a); db = self.search(b, role=role_b)
+        if not len(db) or not len(da): return da
+        k = np.searchsorted(db, da, side='left') - 1  # last b strictly before each a
+        prev = np.where(k >= 0, db[np.maximum(k, 0)], -1)
+        floor = self._call_ranges()[0][self.call_of(da)]
+        if within is not None: floor = np.maximum(floor, da - within)
+        return da[prev < floor]
+
+    def docs(self, docs, limit=None) -> pd.DataFrame:
+        """Rows of the docs table for doc ids (in doc order)."""
+        docs = [int(d) for d in (np.asarray(docs)[:limit] if limit else np.asarray(docs))]
+        rows = []
+        for i in range(0, len(docs), 500):
+            chunk = docs[i:i+500]
+            rows += self.db.execute(f"SELECT * FROM docs WHERE doc IN ({','.join('?'*len(chunk))}) ORDER BY doc", chunk).fetchall()
+        return pd.DataFrame(rows, columns=DOC_COLS)
+
+class _Not:
+    """A negated operand; AND resolves it as a set difference."""
+    def __init__(self, docs): self.docs = docs
+
+class _Parser:
+    """or := and (OR and)* ; and := not (AND? not)* ; not := NOT not | atom ; atom := word | "phrase" | ( or )"""
+    TOKENS = re.compile(r'"([^"]*)"|([()])|([^\s()"]+)')
+
+    def __init__(self, index, query):
+        self.index = index; self.toks = []; self.i = 0
+        for phrase, paren, word in self.TOKENS.findall(query):
+            if paren: self.toks.append(paren)
+            elif word.upper() in ('AND', 'OR', 'NOT'): self.toks.append(word.upper())
+            else: self.toks.append(('T', phrase if not word else word))
+
+    def peek(self): return self.toks[self.i] if self.i < len(self.toks) else None
+
+    def take(self):
+        if self.i >= len(self.toks): raise ValueError("unexpected end of query")
+        self.i += 1; return self.toks[self.i-1]
+
+    def parse(self):
+        if not self.toks: return np.empty(0, np.int64)
+        out = self.or_()
+        if self.peek() is not None: raise ValueError(f"unexpected {self.peek()!r} in query")
+        return out
+
+    def or_(self):
+        out = self.and_()
+        while self.peek() == 'OR': self.take(); out = _or(out, self.and_())
+        return out
+
+    def and_(self):
+        ops = [self.not_()]
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND': self.take()
+            ops.append(self.not_())
+        pos = sorted((o for o in ops if not isinstance(o, _Not)), key=len)  # smallest first
+        out = pos[0] if pos else self.index.all_docs()
+        for o in pos[1:]: out = _and(out, o)
+        for o in ops:
+            if isinstance(o, _Not): out = _minus(out, o.docs)
+        return out
+
+    def not_(self):
+        if self.peek() == 'NOT':
+            self.take(); inner = self.not_()
+            return inner.docs if isinstance(inner, _Not) else _Not(inner)
+        return self.atom()
+
+    def atom(self):
+        t = self.take()
+        if t == '(':
+            out = self.or_()
+            if self.take() != ')': raise ValueError("missing ')' in query")
+            return out
+        if isinstance(t, tuple):
+            if t[1].lower().startswith(('role:', 'speaker:')): return self.index.term_docs(t[1].lower())
+            return self.index.phrase(t[1])
+        raise ValueError(f"unexpected {t!r} in query")
+
+def _show(index, docs, limit):
+    out = index.docs(docs, limit)
+    print(out[['call_id', 'utterance_id', 'speaker', 'stime', 'text']].to_string(index=False) if len(out) else "(no matches)")
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--index',default=INDEX_PATH); sub=p.add_subparsers(dest='cmd',required=True)
+    a=sub.add_parser('add'); a.add_argument('--folder'); a.add_argument('--table',help='utterances CSV or Parquet dataset'); a.add_argument('--reindex',action='store_true')
+    sub.add_parser('optimize'); sub.add_parser('stats')
+    q=sub.add_parser('query'); q.add_argument('q'); q.add_argument('--speaker'); q.add_argument('--role'); q.add_argument('--limit',type=int,default=20)
+    b=sub.add_parser('before'); b.add_argument('a'); b.add_argument('b'); b.add_argument('--within',type=int,default=1); b.add_argument('--limit',type=int,default=20)
+    w=sub.add_parser('without-prior'); w.add_argument('a'); w.add_argument('b'); w.add_argument('--within',type=int); w.add_argument('--role'); w.add_argument('--limit',type=int,default=20)
+    args=p.parse_args()
+
+    idx = Index(args.index); t = time.perf_counter()
+    if args.cmd == 'add':
+        n = 0
+        if args.folder:
+            from src.data.parser import list_folder
+            n += idx.add_files(list_folder(args.folder), skip_indexed=not args.reindex)
+        if args.table:
+            from src.data.columnar import iter_table
+            have = set() if args.reindex else idx.call_ids(); carry = None
+            for df in iter_table(args.table):
+                if carry is not None: df = pd.concat([carry, df], ignore_index=True)
+                last = df['call_id'].iloc[-1]  # a call may continue in the next chunk
+                carry = df[df['call_id'] == last]; df = df[df['call_id'] != last]
+                n += idx.add_frame(df[~df['call_id'].astype(str).isin(have)])
+            if carry is not None: n += idx.add_frame(carry[~carry['call_id'].astype(str).isin(have)])
+        print("indexed", n, "utterances;", idx.stats())
+    elif args.cmd == 'optimize':
+        idx.optimize(); print(idx.stats())
+    elif args.cmd == 'stats':
+        print(idx.stats())
+    elif args.cmd == 'query':
+        docs = idx.search(args.q, args.speaker, args.role)
+        print(f"{len(docs)} utterances in {len(_dedup(idx.call_of(docs)))} calls ({(time.perf_counter()-t)*1000:.1f} ms)")
+        _show(idx, docs, args.limit)
+    elif args.cmd == 'before':
+        pairs = idx.before(args.a, args.b, args.within)
+        print(f"{len(pairs)} pairs ({(time.perf_counter()-t)*1000:.1f} ms)")
+        _show(idx, _or(pairs.doc_a.to_numpy(), np.sort(pairs.doc_b.to_numpy())), args.limit)
+    else:
+        docs = idx.without_prior(args.a, args.b, args.within, role_a=args.role)
+        print(f"{len(docs)} utterances in {len(_dedup(idx.call_of(docs)))} calls ({(time.perf_counter()-t)*1000:.1f} ms)")
+        _show(idx, docs, args.limit)
+    idx.close()
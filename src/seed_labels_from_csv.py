@@ -1,21 +1,28 @@
-import pandas as pd
-from src.detectors.regex_detectors import load_profanity_list, build_profanity_pattern
+import argparse
+from src.data.columnar import iter_table, write_frames
+from src.detectors.regex_detectors import load_profanity_list, build_profanity_matcher
 
 
 IN='utterances_all.csv'; OUT='dataset_seed.csv'; 
+IN_PARQUET='utterances_all.parquet'; OUT_PARQUET='dataset_seed.parquet'
 CHUNKS=20000
 
 def seed_chunk(df, pat):
     df=df.copy()
     df['text']=df['text'].fillna('')
-    df['label']=df['text'].apply(lambda t: int(bool(pat.search(str(t).lower()))))
+    df['label']=df['text'].apply(lambda t: int(bool(pat.search(str(t)))))
     return df
 
-def main():
-    words=load_profanity_list(); pat=build_profanity_pattern(words)
+def main(fmt='csv'):
+    words=load_profanity_list(); pat=build_profanity_matcher(words)
+    
+    if fmt=='parquet':
+        total=write_frames((seed_chunk(c, pat) for c in iter_table(IN_PARQUET, chunksize=CHUNKS)), OUT_PARQUET)
+        print("saved",total,"rows ->",OUT_PARQUET); return
+        
     first=True; total=0
     
-    for chunk in pd.read_csv(IN, chunksize=CHUNKS):
+    for chunk in iter_table(IN, chunksize=CHUNKS):
         out=seed_chunk(chunk, pat)
         out.to_csv(OUT, index=False, mode='w' if first else 'a', header=first)
         first=False; total+=len(out); print("seeded",total)
@@ -23,4 +30,4 @@ def main():
     print("saved",OUT)
     
 if __name__=='__main__':
-    main()
+    p=argparse.ArgumentParser(); p.add_argument('--format',choices=['csv','parquet'],default='csv'); args=p.parse_args(); main(args.format)
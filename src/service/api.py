@@ -0,0 +1,166 @@
+"""Local HTTP detection service.
+
+    python -m src.service.api --port 8080 --max-batch 64 --max-wait-ms 5
+
+    POST /profanity/pattern  {"texts": [...]}                    -> {"labels": [...], "terms": [...]}
+    POST /profanity/ml       {"texts": [...]}                    -> {"labels": [...], "probs": [...]}
+    POST /privacy            {"utterances": [...], "call_id": ?} -> {"violations": [...]}
+    POST /call-metrics       {"utterances": [...]}               -> {"call_duration": ..., ...}
+    GET  /health, GET /metrics (Prometheus text, see src.utils.instrument)
+
+Utterances may use any key aliases parse_file accepts. The model is loaded once through the
+registry; concurrent /profanity/ml requests are coalesced by a MicroBatcher into a single
+predict_texts call, so the TF-IDF transform and predict_proba run vectorized over many
+requests' texts at once.
+"""
+import argparse, json, queue, threading, time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.data.parser import parse_object
+from src.detectors.regex_detectors import default_profanity_matcher, detect_privacy_violations
+from src.detectors.ml_detector import predict_texts
+from src.detectors.registry import get_model, model_version
+from src.metrics.call_metrics import compute_silence_overtalk
+from src.utils import instrument
+
+class MicroBatcher:
+    """
+    Runs fn(items) -> results (same length) on a worker thread. submit() blocks until its
+    items are scored; items submitted while a batch is being collected are scored together.
+    A batch closes at max_batch items or max_wait seconds after its first request arrived.
+    """
+
+    def __init__(self, fn, max_batch=64, max_wait=0.005, name='service.batch'):
+        self.fn = fn; self.max_batch = max_batch; self.max_wait = max_wait; self.name = name
+        self._q = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, items):
+        if not items: return []
+        fut = Future(); self._q.put((list(items), fut))
+        return fut.result()
+
+    def _collect(self):
+        jobs = [self._q.get()]; n = len(jobs[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0: break
+            try: job = self._q.get(timeout=timeout)
+            except queue.Empty: break
+            jobs.append(job); n += len(job[0])
+        return jobs
+
+    def _loop(self):
+        while True:
+            jobs = self._collect()
+            items = [it for its, _ in jobs for it in its]
+            try:
+                with instrument.stage(self.name, items=len(items)):
+                    out = self.fn(items)
+            except Exception as e:
+                for _, fut in jobs: fut.set_exception(e)
+                continue
+            i = 0
+            for its, fut in jobs:
+                fut.set_result(out[i:i+len(its)]); i += len(its)
+
+def _ml_batch(model_name):
+    def fn(texts):
+        preds, probs = predict_texts(texts, get_model(model_name))
+        if probs is None: probs = [None]*len(preds)
+        return [(int(p), None if q is None else float(q)) for p, q in zip(preds, probs)]
+    return fn
+
+def _texts(body):
+    texts = body.get('texts')
+    if not isinstance(texts, list): raise ValueError("'texts' must be a list of strings")
+    return ['' if t is None else str(t) for t in texts]
+
+def _utterances(body):
+    utts = body.get('utterances')
+    if not isinstance(utts, list): raise ValueError("'utterances' must be a list of objects")
+    return parse_object(utts, str(body.get('call_id', 'call')))
+
+def _jsonable(o):
+    return o.item() if hasattr(o, 'item') else str(o)
+
+def make_handler(batcher, model_name='profanity_baseline'):
+    def pattern(body):
+        matcher = default_profanity_matcher()
+        hits = [matcher.search(t) for t in _texts(body)]
+        return {'labels': [int(h is not None) for h in hits], 'terms': [h[2] if h else None for h in hits]}
+
+    def ml(body):
+        res = batcher.submit(_texts(body))
+        return {'labels': [l for l, _ in res], 'probs': [p for _, p in res]}
+
+    def privacy(body):
+        return {'violations': detect_privacy_violations(_utterances(body))}
+
+    def call_metrics(body):
+        return compute_silence_overtalk(_utterances(body))
+
+    routes = {'/profanity/pattern': pattern, '/profanity/ml': ml, '/privacy': privacy, '/call-metrics': call_metrics}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so clients can reuse connections
+        disable_nagle_algorithm = True  # headers and body go out in separate sends; don't wait ~40 ms for the ACK
+
+        def _send(self, code, data, ctype='application/json'):
+            if not isinstance(data, bytes): data = json.dumps(data, default=_jsonable).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', ctype); self.send_header('Content-Length', str(len(data)))
+            self.end_headers(); self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                mv = model_version(model_name)
+                self._send(200, {'status': 'ok', 'model': list(mv) if mv else None})
+            elif self.path == '/metrics':
+                self._send(200, instrument.prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4')
+            else:
+                self._send(404, {'error': f"no route {self.path}"})
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            route = routes.get(self.path)
+            if route is None: return self._send(404, {'error': f"no route {self.path}"})
+
+            t = time.perf_counter()
+            try:
+                out = route(json.loads(raw or b'{}'))
+            except (ValueError, AttributeError) as e:
+                instrument.observe('service.request', time.perf_counter()-t, error=True)
+                return self._send(400, {'error': str(e)})
+            except Exception as e:
+                instrument.observe('service.request', time.perf_counter()-t, error=True)
+                return self._send(500, {'error': f"{type(e).__name__}: {e}"})
+            instrument.observe('service.request', time.perf_counter()-t, 1)
+            self._send(200, out)
+
+        def log_message(self, *args): pass
+
+    return Handler
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default 5 resets connections when many clients connect at once
+
+def serve(port=8080, host='127.0.0.1', model_name='profanity_baseline', max_batch=64, max_wait=0.005):
+    try:
+        get_model(model_name)  # load before the first request
+    except FileNotFoundError as e:
+        print("ML model not found, /profanity/ml will fail:", e)
+    default_profanity_matcher()
+
+    batcher = MicroBatcher(_ml_batch(model_name), max_batch, max_wait, 'service.ml_batch')
+    srv = Server((host, port), make_handler(batcher, model_name))
+    print(f"detection service on http://{host}:{srv.server_port}")
+    return srv
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--port',type=int,default=8080); p.add_argument('--host',default='127.0.0.1'); p.add_argument('--model',default='profanity_baseline')
+    p.add_argument('--max-batch',type=int,default=64); p.add_argument('--max-wait-ms',type=float,default=5.0); p.add_argument('--no-metrics',action='store_true',help='disable instrumentation'); args=p.parse_args()
+    if not args.no_metrics: instrument.enable()
+    serve(args.port, args.host, args.model, args.max_batch, args.max_wait_ms/1000).serve_forever()
@@ -0,0 +1,70 @@
+"""Load test for the detection service: p50/p99 latency and throughput.
+
+    python -m src.service.loadtest --clients 32 --requests 200 --texts 4
+    python -m src.service.loadtest --url http://127.0.0.1:8080 --route /profanity/ml
+
+Without --url a service is started in-process on a free port. Each client thread keeps one
+HTTP/1.1 connection open and sends --requests requests of --texts synthetic utterances.
+/privacy and /call-metrics get a whole call per request, so texts_per_sec counts its utterances.
+"""
+import argparse, http.client, json, random, threading, time
+from urllib.parse import urlparse
+import numpy as np
+from src.bench.synth import make_call
+
+CALL_ROUTES = ('/privacy', '/call-metrics')
+
+def _payloads(route, n, texts_per_request, seed):
+    """[(body, n_texts)]: call routes send every utterance of the call, the others --texts of them."""
+    rng = random.Random(seed); out = []
+    for _ in range(n):
+        call = make_call(rng, n_utts=max(texts_per_request, 2))
+        body = {'utterances': call} if route in CALL_ROUTES else {'texts': [u['text'] for u in call[:texts_per_request]]}
+        out.append((json.dumps(body).encode('utf-8'), len(body.get('utterances') or body['texts'])))
+    return out
+
+def _client(url, route, payloads, latencies, texts, errors):
+    u = urlparse(url)
+    conn = http.client.HTTPConnection(u.hostname, u.port, timeout=60)
+    for body, n in payloads:
+        t = time.perf_counter()
+        try:
+            conn.request('POST', route, body, {'Content-Type': 'application/json'})
+            r = conn.getresponse(); r.read()
+            if r.status != 200: errors.append(r.status); continue
+        except Exception as e:
+            errors.append(type(e).__name__); conn.close()
+            conn = http.client.HTTPConnection(u.hostname, u.port, timeout=60); continue
+        latencies.append(time.perf_counter()-t); texts.append(n)
+    conn.close()
+
+def run(url, route='/profanity/ml', clients=32, requests=200, texts_per_request=4, seed=0):
+    payloads = _payloads(route, requests, texts_per_request, seed)
+    latencies, texts, errors = [], [], []
+    threads = [threading.Thread(target=_client, args=(url, route, payloads, latencies, texts, errors)) for _ in range(clients)]
+
+    t = time.perf_counter()
+    for th in threads: th.start()
+    for th in threads: th.join()
+    wall = time.perf_counter()-t
+
+    lat = np.array(latencies) * 1000
+    ok = len(latencies)
+    return {'route': route, 'clients': clients, 'requests': ok, 'errors': len(errors), 'seconds': wall,
+            'req_per_sec': ok/wall, 'texts_per_sec': sum(texts)/wall,
+            'p50_ms': float(np.percentile(lat, 50)) if ok else None, 'p99_ms': float(np.percentile(lat, 99)) if ok else None}
+
+if __name__=='__main__':
+    p=argparse.ArgumentParser(); p.add_argument('--url'); p.add_argument('--route',default='/profanity/ml'); p.add_argument('--clients',type=int,default=32)
+    p.add_argument('--requests',type=int,default=200,help='per client'); p.add_argument('--texts',type=int,default=4,help='texts per request; utterances per call for /privacy and /call-metrics')
+    p.add_argument('--max-batch',type=int,default=64); p.add_argument('--max-wait-ms',type=float,default=5.0); args=p.parse_args()
+
+    url = args.url
+    if not url:
+        from src.service.api import serve
+        srv = serve(0, max_batch=args.max_batch, max_wait=args.max_wait_ms/1000)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{srv.server_port}"
+
+    res = run(url, args.route, args.clients, args.requests, args.texts)
+    for k, v in res.items(): print(f"{k:>12}: {v:.2f}" if isinstance(v, float) else f"{k:>12}: {v}")
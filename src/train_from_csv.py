@@ -1,20 +1,38 @@
-import pandas as pd, argparse
-from src.detectors.ml_detector import train_baseline
+import argparse
+from src.data.columnar import load_table, iter_table, table_columns
+from src.detectors.ml_detector import train_baseline, train_streaming
 
 def main(csv='dataset_seed.csv'):
-    df=pd.read_csv(csv)
+    """csv may also be a Parquet dataset directory (see src.data.columnar)."""
+    missing=[c for c in ('text','label') if c not in table_columns(csv)]
+    if missing:
+        raise SystemExit(f"{csv}: missing column(s) {', '.join(missing)}")
+    df=load_table(csv, columns=['text','label'])
     
     if df.empty: 
         raise SystemExit("empty")
     
-    if 'text' not in df.columns or 'label' not in df.columns: 
-        raise SystemExit("missing cols")
-    
     df2=df[['text','label']].dropna(subset=['text'])
     
     path=train_baseline(df2, text_col='text', label_col='label', model_name='profanity_baseline')
     
     print("model ->",path)
+
+def csv_chunks(csv, chunksize=100000):
+    def make():
+        for chunk in iter_table(csv, columns=['text','label'], chunksize=chunksize):
+            chunk = chunk.dropna(subset=['text'])
+            if not chunk.empty: yield chunk['text'].tolist(), chunk['label'].astype(int).to_numpy()
+    return make
+
+def main_stream(csv='dataset_seed.csv', chunksize=100000, epochs=3, workers=1):
+    path, _ = train_streaming(csv_chunks(csv, chunksize), model_name='profanity_baseline', epochs=epochs, workers=workers)
+    
+    print("model ->",path)
     
 if __name__=='__main__':
-    p=argparse.ArgumentParser(); p.add_argument('--csv',default='dataset_seed.csv'); args=p.parse_args(); main(args.csv)
+    p=argparse.ArgumentParser(); p.add_argument('--csv',default='dataset_seed.csv')
+    p.add_argument('--stream',action='store_true',help='out-of-core hashing + SGD training'); p.add_argument('--chunksize',type=int,default=100000); p.add_argument('--epochs',type=int,default=3); p.add_argument('--workers',type=int,default=1)
+    args=p.parse_args()
+    if args.stream: main_stream(args.csv,args.chunksize,args.epochs,args.workers)
+    else: main(args.csv)
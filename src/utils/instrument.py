@@ -0,0 +1,151 @@
+"""Per-stage timing for the pipeline: wall time, item counts, throughput and latency histograms.
+
+Off by default; set COMPLIANCE_METRICS=1 or call enable(). While disabled, `timed` wrappers
+make one flag check and `stage()` returns a shared no-op context, so instrumented code runs
+at essentially full speed.
+
+    with stage('export.write', items=len(rows)): ...
+    @timed('ml.predict', items=lambda args, out: len(args[0]))
+
+report() gives a JSON-able dict, prometheus_text() the text exposition format; both can be
+written to files or served with serve_prometheus(port). Stages recorded inside worker
+processes are shipped back with snapshot(clear=True) and added to the parent's with merge().
+"""
+import functools, inspect, json, os, threading, time
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+_enabled = os.getenv('COMPLIANCE_METRICS', '').lower() in ('1', 'true', 'yes')
+_stages = {}
+_lock = threading.Lock()
+
+def enable(): global _enabled; _enabled = True
+def disable(): global _enabled; _enabled = False
+def enabled(): return _enabled
+
+def reset():
+    with _lock: _stages.clear()
+
+def _new():
+    return {'calls': 0, 'errors': 0, 'items': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'buckets': [0]*len(BUCKETS)}
+
+def observe(name, seconds, items=0, error=False):
+    """Record one execution of a stage (items=None: the count is unknown)."""
+    if not _enabled: return
+    with _lock:
+        s = _stages.get(name)
+        if s is None: s = _stages[name] = _new()
+        s['calls'] += 1; s['errors'] += int(error); s['items'] += items or 0
+        s['seconds'] += seconds; s['max_seconds'] = max(s['max_seconds'], seconds)
+        s['buckets'][next(i for i, b in enumerate(BUCKETS) if seconds <= b)] += 1
+
+class _Stage:
+    __slots__ = ('name', 'items', 't')
+
+    def __init__(self, name, items): self.name = name; self.items = items
+
+    def __enter__(self):
+        self.t = time.perf_counter(); return self
+
+    def __exit__(self, exc_type, *_):
+        observe(self.name, time.perf_counter()-self.t, self.items, exc_type is not None)
+
+class _NoStage:
+    items = 0
+    def __enter__(self): return self
+    def __exit__(self, *_): pass
+
+_NOOP = _NoStage()
+
+def stage(name, items=0):
+    """Context manager timing a block; set `.items` on it inside the block if the count is known late."""
+    return _Stage(name, items) if _enabled else _NOOP
+
+def timed(name, items=None):
+    """Decorator; items(args, result) -> number of items the call processed, where args are
+    all of fn's arguments in signature order however they were passed (defaults filled in)."""
+    def deco(fn):
+        sig = inspect.signature(fn)
+
+        def count(args, kwargs, out):
+            try:
+                bound = sig.bind(*args, **kwargs); bound.apply_defaults()
+                return items(tuple(bound.arguments.values()), out)
+            except Exception:
+                return None  # a miscounting lambda must not fail a call that succeeded
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled: return fn(*args, **kwargs)
+            t = time.perf_counter()
+            try:
+                out = fn(*args, **kwargs)
+            except Exception:
+                observe(name, time.perf_counter()-t, 0, True); raise
+            observe(name, time.perf_counter()-t, count(args, kwargs, out) if items else 0)
+            return out
+        return wrapper
+    return deco
+
+def snapshot(clear=False):
+    """Raw stage stats for merge() in another process; clear=True also resets them here."""
+    with _lock:
+        out = {n: dict(s, buckets=list(s['buckets'])) for n, s in _stages.items()}
+        if clear: _stages.clear()
+    return out
+
+def merge(stages):
+    """Add snapshot() stats recorded elsewhere (e.g. in a worker process) to this process's."""
+    if not _enabled: return
+    with _lock:
+        for n, o in stages.items():
+            s = _stages.get(n)
+            if s is None: s = _stages[n] = _new()
+            for k in ('calls', 'errors', 'items', 'seconds'): s[k] += o[k]
+            s['max_seconds'] = max(s['max_seconds'], o['max_seconds'])
+            s['buckets'] = [a+b for a, b in zip(s['buckets'], o['buckets'])]
+
+def report():
+    with _lock:
+        stages = {n: dict(s, buckets=dict(zip([str(b) for b in BUCKETS], s['buckets'])),
+                          items_per_sec=s['items']/s['seconds'] if s['seconds'] else None,
+                          mean_seconds=s['seconds']/s['calls'] if s['calls'] else None)
+                  for n, s in sorted(_stages.items())}
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pid': os.getpid(), 'stages': stages}
+
+def write_report(path):
+    with open(path, 'w', encoding='utf-8') as f: json.dump(report(), f, indent=1)
+
+def prometheus_text(prefix='compliance'):
+    lines = [f"# TYPE {prefix}_stage_seconds histogram", f"# TYPE {prefix}_stage_items_total counter", f"# TYPE {prefix}_stage_errors_total counter"]
+    with _lock:
+        for n, s in sorted(_stages.items()):
+            cum = 0
+            for b, c in zip(BUCKETS, s['buckets']):
+                cum += c
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{n}",le="{"+Inf" if b == float("inf") else b}"}} {cum}')
+            lines += [f'{prefix}_stage_seconds_sum{{stage="{n}"}} {s["seconds"]}', f'{prefix}_stage_seconds_count{{stage="{n}"}} {s["calls"]}',
+                      f'{prefix}_stage_items_total{{stage="{n}"}} {s["items"]}', f'{prefix}_stage_errors_total{{stage="{n}"}} {s["errors"]}']
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f: f.write(prometheus_text())
+    os.replace(tmp, path)  # node_exporter textfile collectors must never see a partial file
+
+def serve_prometheus(port=9108, host='127.0.0.1'):
+    """Serve prometheus_text() on http://host:port/metrics from a daemon thread; pass
+    host='0.0.0.0' to let other machines scrape it."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            data = prometheus_text().encode('utf-8')
+            self.send_response(200); self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data))); self.end_headers(); self.wfile.write(data)
+
+        def log_message(self, *args): pass
+
+    srv = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
@@ -12,3 +12,26 @@ def normalize_text(s: str) -> str:
     s = s.replace('0','o').replace('4','a').replace('3','e').replace('1','i').replace('5','s')
     
     return re.sub(r'\s+',' ',s).strip()
+
+KEEP_RE = re.compile(r'[a-z0-9\s@#\$\.\-\/]')
+LEET = {'0':'o','4':'a','3':'e','1':'i','5':'s'}
+
+def normalize_with_offsets(s: str):
+    """Same normalization as normalize_text, plus the index in `s` of every output char. A char
+    whose lowercase is longer (e.g. 'İ' -> 'i̇') maps all of its output chars to its own index."""
+    if not s: return '', []
+    out=[]; offs=[]
+    low = s.lower()
+    pairs = enumerate(low) if len(low) == len(s) else ((i, c) for i, ch in enumerate(s) for c in ch.lower())
+    
+    for i,c in pairs:
+        if not KEEP_RE.match(c) or c.isspace(): c = ' '
+        if c == ' ':
+            if out and out[-1] != ' ': out.append(' '); offs.append(i)
+            continue
+        if len(out)>=2 and out[-1]==c and out[-2]==c: continue
+        out.append(c); offs.append(i)
+        
+    if out and out[-1]==' ': out.pop(); offs.pop()
+    
+    return ''.join(LEET.get(c,c) for c in out), offs
@@ -0,0 +1,55 @@
+import random
+import numpy as np, pandas as pd
+import pytest
+from src.data.callbatch import CallBatch
+from src.metrics.call_metrics import compute_call_metrics_batch, compute_silence_overtalk
+
+def _frame(n_calls=40, seed=0):
+    rng = random.Random(seed); rows = []
+    for c in range(n_calls):
+        t = 0.0
+        for u in range(rng.randint(1, 25)):
+            t = max(0.0, t + rng.choice([-2.0, -0.5, 0.0, 0.0, 1.5, 4.0]))  # overlaps, touching ends and gaps
+            d = rng.choice([0.0, 0.5, 2.0, 6.0])
+            rows.append({'call_id': f"c{c:03d}", 'utterance_id': u, 'speaker': rng.choice(['Agent', 'Customer', 'Customer 2']),
+                         'text': 'x', 'stime': t, 'etime': t+d, 'duration': d})
+            t += d
+    return pd.DataFrame(rows)
+
+def _union(iv):
+    tot = 0.0; cs = ce = None
+    for s, e in sorted(iv):
+        if ce is None or s > ce:
+            if ce is not None: tot += ce-cs
+            cs, ce = s, e
+        else: ce = max(ce, e)
+    return tot + (ce-cs if ce is not None else 0.0)
+
+@pytest.mark.parametrize('as_batch', [False, True])
+def test_batch_matches_per_call(as_batch):
+    df = _frame()
+    out = compute_call_metrics_batch(CallBatch.from_frame(df) if as_batch else df).set_index('call_id')
+    assert list(out.index) == sorted(df['call_id'].unique())
+    for cid, g in df.groupby('call_id'):
+        ref = compute_silence_overtalk(g.sort_values('stime'))
+        for k, v in ref.items(): assert out.loc[cid, k] == pytest.approx(v, abs=1e-9), (cid, k)
+
+def test_talk_time_per_role_and_speaker():
+    df = _frame(seed=1)
+    out = compute_call_metrics_batch(df).set_index('call_id')
+    for cid, g in df.groupby('call_id'):
+        agent = g['speaker'].str.lower().str.contains('agent')
+        assert out.loc[cid, 'agent_talk_seconds'] == pytest.approx(_union(zip(g.stime[agent], g.etime[agent])))
+        assert out.loc[cid, 'borrower_talk_seconds'] == pytest.approx(_union(zip(g.stime[~agent], g.etime[~agent])))
+        per = out.loc[cid, 'speaker_talk_seconds']
+        assert set(per) == set(g['speaker'])
+        for sp, h in g.groupby('speaker'): assert per[sp] == pytest.approx(_union(zip(h.stime, h.etime)))
+
+def test_longest_silence():
+    df = pd.DataFrame({'call_id': ['a']*3, 'speaker': ['Agent', 'Customer', 'Agent'],
+                       'stime': [0.0, 5.0, 6.0], 'etime': [2.0, 5.5, 9.0]})
+    r = compute_call_metrics_batch(df).iloc[0]
+    assert r['longest_silence_seconds'] == pytest.approx(3.0) and r['silence_seconds'] == pytest.approx(3.5)
+
+def test_empty():
+    assert compute_call_metrics_batch(_frame().iloc[:0]).empty
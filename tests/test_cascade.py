@@ -0,0 +1,31 @@
+from src.detectors.cascade import cascade_classify
+
+TEXTS = ['thanks for calling, have a nice day',
+         'you can reach me at jane.doe@example.com',
+         'my number is 415-555-2671',
+         'can you verify your date of birth',
+         'your balance is $250']
+
+def _llm(answer):
+    seen = []
+    def llm(texts, entity, **kw):
+        seen.extend(texts); return [answer(t) for t in texts]
+    return llm, seen
+
+def test_pii_and_verification_reach_llm():
+    llm, seen = _llm(lambda t: (1, None))
+    df, stats = cascade_classify(TEXTS, entity='privacy', llm=llm)
+    assert seen == TEXTS[1:]
+    assert df['label'].tolist() == [0, 1, 1, 1, 1]
+    assert df['tier'].tolist() == ['pattern'] + ['llm']*4 and stats['llm']['count'] == 4
+
+def test_failed_llm_keeps_local_verdict():
+    llm, _ = _llm(lambda t: (None, 'RuntimeError: down'))
+    df, _ = cascade_classify(TEXTS, entity='privacy', llm=llm)
+    assert df['label'].tolist() == [0, 1, 1, 0, 1]  # verification-only is not pre-flagged
+    assert (df['tier'] == 'pattern').all()
+
+def test_llm_can_clear_a_hit():
+    llm, _ = _llm(lambda t: (0, None))
+    df, _ = cascade_classify(TEXTS, entity='privacy', llm=llm)
+    assert df['label'].tolist() == [0]*5
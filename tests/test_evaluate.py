@@ -0,0 +1,33 @@
+import json
+import pytest
+from src.metrics import evaluate
+
+class FailingBackend:
+    name = 'always-fails'
+    async def generate(self, prompt): raise RuntimeError('backend down')
+
+@pytest.fixture
+def dataset(tmp_path):
+    p = tmp_path / 'seed.csv'
+    p.write_text('text,label\nhello there,0\nyou are a damn fool,1\nthanks for calling,0\nwhat the hell,1\n', encoding='utf-8')
+    return str(p)
+
+def _run(dataset, tmp_path, detectors, **kw):
+    return evaluate.run(dataset, detectors, n_boot=50, report_path=tmp_path / 'report.json',
+                        preds_path=tmp_path / 'preds.sqlite', **kw)
+
+def test_failed_llm_gets_no_entry(dataset, tmp_path):
+    report = _run(dataset, tmp_path, ['pattern', 'llm'], backend=FailingBackend(), retries=0, cache=False)
+    assert 'llm' not in report['detectors'] and 'pattern' in report['detectors']
+    assert [r['Approach'] for r in evaluate.table(report)] == ['Pattern Matching']
+    assert 'llm' not in json.loads((tmp_path / 'report.json').read_text())['detectors']
+
+def test_table_skips_empty_metrics(dataset, tmp_path):
+    report = _run(dataset, tmp_path, ['pattern'])
+    report['detectors']['llm'] = {'rows': 0, 'metrics': evaluate.bootstrap_metrics([], [])}
+    assert list(evaluate.scored(report)) == ['pattern']
+    assert len(evaluate.table(report)) == 1
+
+def test_missing_label_column(tmp_path):
+    p = tmp_path / 'nolabel.csv'; p.write_text('text\nhello\n', encoding='utf-8')
+    with pytest.raises(evaluate.LabelColumnMissing): _run(str(p), tmp_path, ['pattern'])
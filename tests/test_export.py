@@ -0,0 +1,92 @@
+import json, os
+import pandas as pd
+import pytest
+from src import export_results
+from src.bench.synth import write_corpus
+from src.data.parser import check_parity, load_folder
+from src.detectors.regex_detectors import build_profanity_matcher, detect_privacy_violations, load_profanity_list
+from src.metrics.call_metrics import compute_silence_overtalk
+
+@pytest.fixture(scope='module')
+def corpus(tmp_path_factory):
+    d = tmp_path_factory.mktemp('calls')
+    write_corpus(str(d), calls=40, seed=3, profanity_rate=0.1, pii_rate=0.3, verify_rate=0.1)
+    return str(d)
+
+def reference(folder):
+    """The original per-call export loop over a pandas frame."""
+    df = load_folder(folder); pat = build_profanity_matcher(load_profanity_list())
+    flagged = []; calls = []
+    for call_id, g in df.groupby('call_id'):
+        g = g.sort_values('stime', kind='stable')
+        for _, r in g.iterrows():
+            role = 'agent' if 'agent' in str(r.speaker).lower() else 'borrower'
+            if pat.search(str(r.text)):
+                flagged.append({'call_id': call_id, 'utterance_id': int(r.utterance_id), 'speaker': r.speaker, 'role': role, 'text': r.text, 'issue': 'profanity'})
+        for v in detect_privacy_violations(g):
+            flagged.append({'call_id': call_id, 'utterance_id': v['utterance_id'], 'speaker': v['speaker'], 'role': 'agent', 'text': v['text'], 'issue': 'privacy'})
+        m = compute_silence_overtalk(g)
+        calls.append({'call_id': call_id, 'call_duration': m['call_duration'], 'overtalk_pct': m['overtalk_pct'], 'silence_pct': m['silence_pct']})
+    return pd.DataFrame(flagged, columns=export_results.FLAG_COLS), pd.DataFrame(calls, columns=export_results.CALL_COLS)
+
+def _read(path, sort=False):
+    df = pd.read_csv(path)
+    return df.sort_values(list(df.columns[:2])).reset_index(drop=True) if sort else df
+
+def _export(folder, tmp_path, tag, workers):
+    out, met = tmp_path / f"r{tag}.csv", tmp_path / f"c{tag}.csv"
+    export_results.run(folder, str(out), workers, metrics_out=str(met), quiet=True)
+    return out, met
+
+def test_run_matches_reference(corpus, tmp_path):
+    flags, calls = reference(corpus)
+    assert (flags['issue'] == 'privacy').any() and (flags['issue'] == 'profanity').any()
+    flags.to_csv(tmp_path / 'ref.csv', index=False); calls.to_csv(tmp_path / 'refc.csv', index=False)
+    out, met = _export(corpus, tmp_path, 1, 1)
+    pd.testing.assert_frame_equal(_read(out), _read(tmp_path / 'ref.csv'))
+    pd.testing.assert_frame_equal(_read(met), _read(tmp_path / 'refc.csv'))
+
+def test_workers_and_stream_are_byte_identical(corpus, tmp_path):
+    out1, met1 = _export(corpus, tmp_path, 1, 1)
+    out3, met3 = _export(corpus, tmp_path, 3, 3)
+    assert out1.read_bytes() == out3.read_bytes() and met1.read_bytes() == met3.read_bytes()
+
+    outs, mets = tmp_path / 's.csv', tmp_path / 'sc.csv'
+    export_results.run_stream(corpus, str(outs), str(mets))
+    assert outs.read_bytes() == out1.read_bytes() and mets.read_bytes() == met1.read_bytes()
+
+def _stream(folder, tmp_path):
+    out, met = tmp_path / 's.csv', tmp_path / 'sc.csv'
+    export_results.run_stream(folder, str(out), str(met))
+    return out, met, str(out) + '.manifest.jsonl'
+
+def test_stream_resumes_after_torn_manifest(corpus, tmp_path):
+    out, met, manifest = _stream(corpus, tmp_path)
+    full, full_m = _read(out, True), _read(met, True)
+
+    lines = open(manifest, encoding='utf-8').read().splitlines(keepends=True)
+    with open(manifest, 'w', encoding='utf-8') as f: f.write(''.join(lines[:10]) + lines[10][:25])  # killed mid-write
+    _stream(corpus, tmp_path)
+
+    pd.testing.assert_frame_equal(_read(out, True), full); pd.testing.assert_frame_equal(_read(met, True), full_m)
+    recs = [json.loads(ln) for ln in open(manifest, encoding='utf-8')]  # every line parses
+    assert {r['path'] for r in recs} == set(export_results.list_folder(corpus))
+
+def test_stream_picks_up_changed_and_deleted_files(corpus, tmp_path):
+    import shutil
+    folder = tmp_path / 'calls'; shutil.copytree(corpus, folder)
+    _stream(str(folder), tmp_path)
+
+    files = sorted(os.listdir(folder))
+    os.remove(folder / files[0])
+    data = json.loads((folder / files[1]).read_text(encoding='utf-8'))
+    (folder / files[1]).write_text(json.dumps(data, indent=1), encoding='utf-8')  # new size and hash: re-analyzed
+    shutil.copy(folder / files[2], folder / 'zz_new.json')
+    out, met, _ = _stream(str(folder), tmp_path)
+
+    ref_out, ref_met = _export(str(folder), tmp_path, 'ref', 1)
+    pd.testing.assert_frame_equal(_read(out, True), _read(ref_out, True))
+    pd.testing.assert_frame_equal(_read(met, True), _read(ref_met, True))
+
+def test_parser_fast_path_parity():
+    assert check_parity() == []
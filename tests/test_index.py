@@ -0,0 +1,76 @@
+import random
+import pandas as pd
+import pytest
+from src.bench.synth import make_call
+from src.search.index import Index, role_of, tokenize
+
+def _frame(n_calls=30, seed=0, prefix='c'):
+    rng = random.Random(seed); rows = []
+    for c in range(n_calls):
+        for u, utt in enumerate(make_call(rng, n_utts=rng.randint(3, 15), pii_rate=0.3, verify_rate=0.2)):
+            rows.append({'call_id': f"{prefix}{c:03d}", 'utterance_id': u, **utt})
+    return pd.DataFrame(rows)
+
+def _has(text, phrase):
+    t, p = tokenize(text), tokenize(phrase)
+    return any(t[i:i+len(p)] == p for i in range(len(t)-len(p)+1))
+
+def _docs(df):
+    """Rows in index doc order: by call, then stime."""
+    return df.sort_values(['call_id', 'stime'], kind='stable').reset_index(drop=True)
+
+def _keys(index, docs):
+    return set(map(tuple, index.docs(docs)[['call_id', 'utterance_id']].to_numpy().tolist()))
+
+def _brute(df, pred):
+    d = _docs(df)
+    return {(r.call_id, r.utterance_id) for r in d.itertuples() if pred(r)}
+
+@pytest.fixture
+def indexed(tmp_path):
+    df = _frame()
+    with Index(str(tmp_path / 'x.idx')) as index:
+        first = df.call_id < 'c015'
+        index.add_frame(df[first]); index.add_frame(df[~first])  # two segments
+        yield index, df
+
+QUERIES = {
+    'account': lambda t: _has(t, 'account'),
+    '"routing number"': lambda t: _has(t, 'routing number'),
+    'payment AND NOT verify': lambda t: _has(t, 'payment') and not _has(t, 'verify'),
+    'balance OR "date of birth"': lambda t: _has(t, 'balance') or _has(t, 'date of birth'),
+    'NOT (account OR payment) thank': lambda t: _has(t, 'thank') and not (_has(t, 'account') or _has(t, 'payment')),
+}
+
+@pytest.mark.parametrize('q', list(QUERIES))
+def test_search_matches_brute_force(indexed, q):
+    index, df = indexed
+    assert _keys(index, index.search(q)) == _brute(df, lambda r: QUERIES[q](r.text))
+    assert _keys(index, index.search(q, role='agent')) == _brute(df, lambda r: QUERIES[q](r.text) and role_of(r.speaker) == 'agent')
+
+def test_before_and_without_prior(indexed):
+    index, df = indexed
+    d = _docs(df); a = [_has(t, 'account') for t in d.text]; b = [_has(t, 'verify') for t in d.text]
+    same = lambda i, j: d.call_id[i] == d.call_id[j]
+
+    pairs = index.before('account', 'verify', within=3)
+    want = {(i, j) for i in range(len(d)) if a[i] for j in range(i+1, i+4) if j < len(d) and b[j] and same(i, j)}
+    assert set(zip(pairs.doc_a.tolist(), pairs.doc_b.tolist())) == want
+
+    for within in (None, 2):
+        got = set(index.without_prior('account', 'verify', within=within).tolist())
+        lo = lambda i: 0 if within is None else i-within
+        assert got == {i for i in range(len(d)) if a[i] and not any(b[j] and same(i, j) for j in range(max(0, lo(i)), i))}
+
+def test_readd_replaces_call_and_optimize_keeps_results(indexed):
+    index, df = indexed
+    cid = df.call_id.iloc[0]
+    new = pd.DataFrame([{'call_id': cid, 'utterance_id': 0, 'speaker': 'Agent', 'text': 'zebra routing number', 'stime': 0.0, 'etime': 1.0}])
+    index.add_frame(new)
+    df2 = pd.concat([df[df.call_id != cid], new], ignore_index=True)
+    for q in ('zebra', '"routing number"', 'account'):
+        assert _keys(index, index.search(q)) == _brute(df2, lambda r: _has(r.text, q.strip('"')))
+    before = {q: _keys(index, index.search(q)) for q in QUERIES}
+    index.optimize()
+    assert {q: _keys(index, index.search(q)) for q in QUERIES} == before
+    assert index.stats()['segments'] == 1
@@ -0,0 +1,34 @@
+import json
+import numpy as np
+import pytest
+from src.bench.synth import FILLER, PROFANITY
+from src.detectors.linear_scorer import LinearScorer, compile_pipeline
+
+sklearn = pytest.importorskip('sklearn')
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+def _texts(n, seed):
+    rng = np.random.default_rng(seed); words = FILLER + PROFANITY
+    texts = [' '.join(rng.choice(words, size=rng.integers(1, 15))) for _ in range(n)]
+    return texts + ['', 'UPPER Case words', 'unseen tokens only', 'a', 'x y z']
+
+@pytest.mark.parametrize('opts', [{}, {'ngram_range': (1, 2), 'sublinear_tf': True}, {'binary': True, 'norm': None}, {'use_idf': False, 'ngram_range': (2, 3)}])
+def test_matches_pipeline(opts, tmp_path):
+    train = _texts(400, 0); y = [int(any(p in t.split() for p in PROFANITY)) for t in train]
+    model = Pipeline([('tfidf', TfidfVectorizer(**opts)), ('clf', LogisticRegression(max_iter=1000))]).fit(train, y)
+    test = _texts(300, 1)
+
+    meta, terms, weight, idf = compile_pipeline(model)
+    path = tmp_path / 'm.npz'  # the layout export() writes
+    np.savez(path, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+             terms=np.frombuffer('\n'.join(terms).encode(), dtype=np.uint8), weight=weight, idf=idf)
+    scorer = LinearScorer.load(path)
+
+    assert np.abs(scorer.predict_proba(test) - model.predict_proba(test)).max() < 1e-12
+    assert (scorer.predict(test) == model.predict(test)).all()
+
+def test_rejects_unsupported_pipeline():
+    model = Pipeline([('tfidf', TfidfVectorizer(analyzer='char')), ('clf', LogisticRegression())]).fit(['ab', 'cd'], [0, 1])
+    with pytest.raises(ValueError): compile_pipeline(model)
@@ -0,0 +1,40 @@
+import time
+from src.detectors.llm_cache import LLMCache, cache_key
+from src.detectors.llm_detector import classify_texts_with_llm, parse_batch_response
+
+class CountingBackend:
+    name = 'counting'
+    def __init__(self): self.prompts = 0
+    async def generate(self, prompt):
+        self.prompts += 1
+        n = prompt.count('\n[')
+        return '[' + ','.join(f'{{"id": {i}, "label": {int("damn" in line)}}}' for i, line in enumerate(prompt.split('\n[')[1:n+1])) + ']'
+
+def test_cache_key_normalizes_text_only():
+    assert cache_key('Hello  World', 'profanity', 'v1', 'm') == cache_key(' hello world ', 'profanity', 'v1', 'm')
+    assert cache_key('hello', 'profanity', 'v1', 'm') != cache_key('hello', 'profanity', 'v2', 'm')
+    assert cache_key('hello', 'profanity', 'v1', 'm') != cache_key('hello', 'privacy', 'v1', 'm')
+
+def test_eviction(tmp_path):
+    c = LLMCache(tmp_path / 'c.sqlite', max_entries=2)
+    c.put_many([('a', 1), ('b', 0)]); time.sleep(0.01)
+    assert c.get_many(['a']) == {'a': 1}; time.sleep(0.01)  # b is now least recently used
+    c.put_many([('c', 1)])
+    assert c.get_many(['a', 'b', 'c']) == {'a': 1, 'c': 1} and c.stats()['entries'] == 2
+
+    old = LLMCache(tmp_path / 'o.sqlite', max_age=0.05)
+    old.put_many([('x', 1)]); time.sleep(0.1)
+    assert old.get_many(['x']) == {}
+
+def test_classify_uses_cache_and_dedups(tmp_path):
+    cache = LLMCache(tmp_path / 'c.sqlite'); backend = CountingBackend()
+    texts = ['oh damn', 'Oh  DAMN', 'hello', 'hello']
+    assert classify_texts_with_llm(texts, backend=backend, cache=cache, rpm=6000) == [(1, None), (1, None), (0, None), (0, None)]
+    assert backend.prompts == 1 and cache.stats()['entries'] == 2
+    assert classify_texts_with_llm(texts + ['new'], backend=backend, cache=cache, rpm=6000)[-1] == (0, None)
+    assert backend.prompts == 2 and cache.hits == 2  # per distinct key
+
+def test_parse_batch_response_rejects_bad_ids():
+    assert parse_batch_response('[{"id": -1, "label": 1}, {"id": 0, "label": 1}, {"id": 0, "label": 0}, {"id": 5, "label": 1}]', 3) == [1, None, None]
+    assert parse_batch_response('x [1, 0, "1"] y', 3) == [1, 0, 1]
+    assert parse_batch_response('[1, 0]', 3) == [None, None, None]
@@ -0,0 +1,48 @@
+import random, re
+import pytest
+from src.detectors.privacy_rules import VALIDATORS, RuleEngine, load_rule_pack, parse_rule_pack
+
+def reference_scan(rules, text):
+    """Each rule on its own, finditer-style: at every start its longest whole-word term (or its
+    validated regex match), skipping starts inside the rule's previous hit."""
+    hits = []
+    for r in rules:
+        flags = re.I if r.ignore_case else 0; end = 0
+        pats = [re.compile(r.regex, flags)] if r.regex else [re.compile(r'\b' + re.escape(t) + r'\b', flags) for t in r.terms]
+        for s in range(len(text)):
+            if s < end: continue
+            ms = [m for m in (p.match(text, s) for p in pats) if m and (r.validate is None or VALIDATORS[r.validate](m.group()))]
+            if ms:
+                end = max(m.end() for m in ms); hits.append((s, end, r.id, r.category))
+    return sorted(hits)
+
+def _fuzz(rules, n, seed=0):
+    rng = random.Random(seed)
+    frags = [t for r in rules for t in r.terms] + ['4111 1111 1111 1111', '4111 1111 1111 1112', '123-45-6789', '000-12-3456',
+             'jane.doe+x@mail.example.com', '(415) 555-2671', '+1 212.555.0199', '$ 20', '$5', '1234567', 'Balance', 'VERIFY',
+             'DoB', 'İ', 'ß', 'é', ' ', '  ', '.', '-', '@', 'x', '9']
+    for _ in range(n):
+        yield ''.join(rng.choice(frags) + rng.choice(['', ' ', ',', 'a', '1']) for _ in range(rng.randint(1, 6)))
+
+def test_default_pack_matches_reference():
+    rules = load_rule_pack(); engine = RuleEngine(rules)
+    for t in _fuzz(rules, 5000): assert sorted(engine.scan(t)) == reference_scan(rules, t), t
+
+def test_overlapping_terms_across_rules():
+    rules = parse_rule_pack([{'id': 'r', 'category': 'c', 'terms': ['a', 'a b']}, {'id': 'q', 'category': 'd', 'terms': ['a b c', 'B']},
+                             {'id': 'cs', 'category': 'c', 'terms': ['A B'], 'ignore_case': False}])
+    engine = RuleEngine(rules)
+    for t in ['a b c', 'a b', 'A B C', 'a bc', 'b a b c a']: assert sorted(engine.scan(t)) == reference_scan(rules, t), t
+    for t in _fuzz(rules, 2000, seed=1): assert sorted(engine.scan(t)) == reference_scan(rules, t), t
+
+def test_validators_and_categories():
+    engine = RuleEngine(load_rule_pack())
+    assert engine.categories('card 4111 1111 1111 1111') >= {'card_number'}
+    assert 'card_number' not in engine.categories('card 4111 1111 1111 1112')
+    assert engine.categories('mail jane@example.com') == {'email'}
+    assert engine.only(['email']).categories('verify jane@example.com') == {'email'}
+
+def test_bad_packs():
+    with pytest.raises(ValueError): parse_rule_pack([{'id': 'x', 'terms': ['a'], 'regex': 'a'}])
+    with pytest.raises(ValueError): parse_rule_pack([{'id': 'x', 'regex': '(a)\\1'}])
+    with pytest.raises(ValueError): RuleEngine(parse_rule_pack([{'id': 'x', 'terms': ['a']}, {'id': 'x', 'terms': ['b']}]))
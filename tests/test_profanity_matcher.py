@@ -0,0 +1,34 @@
+import random
+import pytest
+from src.detectors.profanity_matcher import ProfanityMatcher
+from src.detectors.regex_detectors import load_profanity_list
+
+WORDS = load_profanity_list()
+
+def _texts(n=20000, seed=0):
+    rng = random.Random(seed); alpha = 'abcdefghijklmnopqrstuvwxyz 013458@#$.-/_*!İKé\t'
+    leet = {'o': '0', 'a': '4', 'e': '3', 'i': '1', 's': '5', 'l': '1'}
+    def obf(t):
+        out = []
+        for c in t:
+            r = rng.random()
+            if r < 0.1: c = leet.get(c, c)
+            elif r < 0.2: c = c*rng.randint(2, 4)
+            elif r < 0.25: c = c.upper()
+            elif r < 0.28: c = c + rng.choice(' *._-é')
+            out.append(c)
+        return ''.join(out)
+    noise = lambda k: ''.join(rng.choice(alpha) for _ in range(rng.randint(0, k)))
+    return [noise(6) + obf(rng.choice(WORDS)) + noise(4) if rng.random() < 0.6 else noise(30) for _ in range(n)]
+
+@pytest.mark.parametrize('normalize', [True, False])
+def test_prefilter_does_not_change_matches(normalize):
+    fast = ProfanityMatcher(WORDS, normalize=normalize); slow = ProfanityMatcher(WORDS, normalize=normalize); slow._pre = None
+    assert fast._pre is not None
+    for t in _texts(): assert fast.finditer(t) == slow.finditer(t), t
+
+def test_obfuscations():
+    m = ProfanityMatcher(['shit', 'asshole'])
+    assert m.search('oh sh1t') and m.search('SHIIIT!') and m.search('you a55hole')
+    assert m.search('ashole') is None and m.search('shitake') is None
+    assert m.search('well, shit') == (6, 10, 'shit')
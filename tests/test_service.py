@@ -0,0 +1,52 @@
+import http.client, json, threading, time
+import pytest
+from src.service.api import MicroBatcher, Server, make_handler
+
+@pytest.fixture
+def service():
+    calls = []
+    def fn(texts):
+        calls.append(len(texts)); time.sleep(0.01)
+        return [(int('damn' in t), 0.9 if 'damn' in t else 0.1) for t in texts]
+    srv = Server(('127.0.0.1', 0), make_handler(MicroBatcher(fn, max_batch=64, max_wait=0.02)))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv.server_port, calls
+    srv.shutdown(); srv.server_close()
+
+def _post(conn, route, body):
+    conn.request('POST', route, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+    r = conn.getresponse(); return r.status, json.loads(r.read())
+
+def test_routes(service):
+    port, _ = service
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)  # one keep-alive connection for every request
+    assert _post(conn, '/profanity/pattern', {'texts': ['oh damn', 'hello']})[1]['labels'] == [1, 0]
+    assert _post(conn, '/profanity/ml', {'texts': ['oh damn', 'hello']})[1] == {'labels': [1, 0], 'probs': [0.9, 0.1]}
+    utts = [{'speaker': 'Agent', 'text': 'your balance is $500', 'stime': 0, 'etime': 2},
+            {'speaker': 'Customer', 'text': 'ok', 'stime': 1, 'etime': 4}]
+    assert len(_post(conn, '/privacy', {'utterances': utts})[1]['violations']) == 1
+    assert _post(conn, '/call-metrics', {'utterances': utts})[1]['overtalk_seconds'] == 1.0
+    assert _post(conn, '/profanity/ml', {'texts': 'not a list'})[0] == 400
+    assert _post(conn, '/nope', {})[0] == 404
+
+def test_ml_requests_are_coalesced(service):
+    port, calls = service
+    out = [None]*16
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        out[i] = _post(conn, '/profanity/ml', {'texts': ['damn'] * (i % 3 + 1)})[1]['labels']
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(16)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert out == [[1] * (i % 3 + 1) for i in range(16)]
+    assert len(calls) < 16 and sum(calls) == sum(i % 3 + 1 for i in range(16))
+
+def test_no_nagle_stall(service):
+    """Headers and body are separate sends; without TCP_NODELAY each keep-alive response waits ~40 ms."""
+    port, _ = service
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    _post(conn, '/profanity/pattern', {'texts': ['x']})
+    lat = []
+    for _ in range(20):
+        t = time.perf_counter(); _post(conn, '/profanity/pattern', {'texts': ['hello']}); lat.append(time.perf_counter()-t)
+    assert sorted(lat)[10] < 0.03